@@ -1,12 +1,19 @@
 import json
 import argparse
+import contextlib
 import io
+import multiprocessing
 import os.path
+import sys
 import typing
 import plugin_loader
+import scripts.artifacts.artGlobals
+import scripts.ccl_android_fcm_queued_messages as ccl_android_fcm_queued_messages
 import scripts.report as report
+import scripts.protobuf_decoding as protobuf_decoding
 import traceback
 
+from scripts.artifact_report import ArtifactHtmlReport
 from scripts.search_files import *
 from scripts.ilapfuncs import *
 from scripts.version_info import aleapp_version
@@ -40,6 +47,9 @@ def validate_args(args):
         timezone = pytz.timezone(args.timezone)
     except pytz.UnknownTimeZoneError:
       raise argparse.ArgumentError(None, 'Unknown timezone! Run the program again.')
+
+    if args.workers < 1:
+        raise argparse.ArgumentError(None, 'WORKERS must be at least 1! Run the program again.')
         
 
 def create_profile(plugins, path):
@@ -152,6 +162,15 @@ def main():
     parser.add_argument('-p', '--artifact_paths', required=False, action="store_true",
                         help=("Generate a text file list of artifact paths. "
                               "This argument is meant to be used alone, without any other arguments."))
+    parser.add_argument('--workers', required=False, action="store", default=1, type=int,
+                        help="Number of worker processes to run artifact modules in parallel (default 1)")
+    parser.add_argument('--no_listing_cache', required=False, action="store_true",
+                        help=("Do not use or update the cache of evidence file listings kept in the output folder. "
+                              "By default the listing of the input is saved there and reused by later runs on the same input."))
+    parser.add_argument('--compress_tsv', required=False, action="store_true",
+                        help="Write the TSV exports gzip compressed (.tsv.gz)")
+    parser.add_argument('--csv', required=False, action="store_true",
+                        help="Also export the report tables as CSV files (_CSV Exports)")
 
     loader = plugin_loader.PluginLoader()
     available_plugins = list(loader.plugins)
@@ -276,6 +295,8 @@ def main():
     wrap_text = args.wrap_text
     output_path = os.path.abspath(args.output_path)
     time_offset = args.timezone
+    TsvWriter.compress = args.compress_tsv
+    ArtifactHtmlReport.csv_export = args.csv
 
     # Android file system extractions contain paths > 260 char, which causes problems
     # This fixes the problem by prefixing \\?\ on each windows path.
@@ -287,12 +308,104 @@ def main():
 
     selected_plugins = plugins_parsed_first + selected_plugins
     
-    crunch_artifacts(selected_plugins, extracttype, input_path, out_params, wrap_text, loader, casedata, time_offset, profile_filename)
+    crunch_artifacts(selected_plugins, extracttype, input_path, out_params, wrap_text, loader, casedata, time_offset, profile_filename,
+                     args.workers, not args.no_listing_cache)
+
+
+def run_plugin(plugin, files_found, report_folder_base, seeker, wrap_text, time_offset):
+    '''Creates the category folder of a plugin and runs it, logging the outcome'''
+    logfunc()
+    logfunc('{} [{}] artifact started'.format(plugin.name, plugin.module_name))
+    category_folder = os.path.join(report_folder_base, plugin.category)
+    if not os.path.exists(category_folder):
+        try:
+            os.makedirs(category_folder, exist_ok=True) # may be created concurrently by another worker
+        except (FileExistsError, FileNotFoundError) as ex:
+            logfunc('Error creating {} report directory at path {}'.format(plugin.name, category_folder))
+            logfunc('Error was {}'.format(str(ex)))
+            return  # cannot do work
+    try:
+        plugin.method(files_found, category_folder, seeker, wrap_text, time_offset)
+    except Exception as ex:
+        logfunc('Reading {} artifact had errors!'.format(plugin.name))
+        logfunc('Error was {}'.format(str(ex)))
+        logfunc('Exception Traceback: {}'.format(traceback.format_exc()))
+        return  # nope
+    finally:
+        # the files of a module are flushed when it's done, and not kept open for the run
+        tsv_writer.close()
+
+    logfunc('{} [{}] artifact completed'.format(plugin.name, plugin.module_name))
+
+
+# State of a worker process, set once by init_plugin_worker
+_worker = {}
+
+def init_plugin_worker(plugin_path, seeker, report_folder_base, log_folder, wrap_text, time_offset, versionf,
+                       shared_output_lock, compress_tsv, csv_export):
+    _worker['loader'] = plugin_loader.PluginLoader(plugin_path)
+    _worker['seeker'] = seeker
+    _worker['report_folder_base'] = report_folder_base
+    _worker['log_folder'] = log_folder
+    _worker['wrap_text'] = wrap_text
+    _worker['time_offset'] = time_offset
+    scripts.artifacts.artGlobals.versionf = versionf
+    OutputParameters.shared_output_lock = shared_output_lock
+    TsvWriter.compress = compress_tsv
+    ArtifactHtmlReport.csv_export = csv_export
+    GuiWindow.window_handle = None
+
+
+def run_plugin_in_worker(job):
+    '''Runs a plugin in a worker process, returns its logs (screen output,
+       device info, console text) for the main process to replay and its
+       timeline counters'''
+    index, plugin_name, files_found = job
+    OutputParameters.screen_output_file_path = os.path.join(_worker['log_folder'], f'{index} Screen Output.html')
+    OutputParameters.screen_output_file_path_devinfo = os.path.join(_worker['log_folder'], f'{index} DeviceInfo.html')
+    console = io.StringIO()
+    with contextlib.redirect_stdout(console):
+        run_plugin(_worker['loader'][plugin_name], files_found, _worker['report_folder_base'], _worker['seeker'],
+                   _worker['wrap_text'], _worker['time_offset'])
+    log_writer.close()
+    timeline_writer.close()
+    timeline_stats = timeline_writer.stats()
+    timeline_writer.reset_stats()
+    logs = []
+    for log_path in (OutputParameters.screen_output_file_path, OutputParameters.screen_output_file_path_devinfo):
+        if os.path.exists(log_path):
+            with open(log_path, 'r', encoding='utf8') as log_file:
+                logs.append(log_file.read())
+            os.remove(log_path)
+        else:
+            logs.append('')
+    return logs[0], logs[1], console.getvalue(), timeline_stats
+
+
+def run_plugins_in_parallel(plugin_jobs, workers, out_params, seeker, wrap_text, time_offset, loader):
+    '''Runs (plugin, files_found) jobs in a pool of worker processes. Logs of each
+       plugin are replayed in plugin order, so they read as in a sequential run.
+    '''
+    log_folder = os.path.join(out_params.temp_folder, '_worker_logs')
+    os.makedirs(log_folder, exist_ok=True)
+    jobs = [(index, plugin.name, files_found) for index, (plugin, files_found) in enumerate(plugin_jobs)]
+    initargs = (loader.plugin_path, seeker, out_params.report_folder_base, log_folder, wrap_text, time_offset,
+                scripts.artifacts.artGlobals.versionf, multiprocessing.Lock(), TsvWriter.compress,
+                ArtifactHtmlReport.csv_export)
+    with multiprocessing.Pool(workers, initializer=init_plugin_worker, initargs=initargs) as pool:
+        for screen_output, devinfo_output, console, timeline_stats in pool.imap(run_plugin_in_worker, jobs):
+            sys.stdout.write(console)
+            timeline_writer.add_stats(timeline_stats)
+            log_writer.write(OutputParameters.screen_output_file_path, screen_output)
+            if devinfo_output:
+                log_writer.write(OutputParameters.screen_output_file_path_devinfo, devinfo_output)
+    os.rmdir(log_folder)
 
 
 def crunch_artifacts(
         plugins: typing.Sequence[plugin_loader.PluginSpec], extracttype, input_path, out_params, wrap_text,
-        loader: plugin_loader.PluginLoader, casedata, time_offset, profile_filename):
+        loader: plugin_loader.PluginLoader, casedata, time_offset, profile_filename, workers=1,
+        use_listing_cache=True):
     start = process_time()
     start_wall = perf_counter()
  
@@ -305,13 +418,17 @@ def crunch_artifacts(
     logfunc('By: Yogesh Khatri   | @SwiftForensics | swiftforensics.com\n')
     logdevinfo()
     
+    timeline_writer.reset_stats()
     seeker = None
+    listing_cache = None
+    if use_listing_cache:
+        listing_cache = ListingCache(os.path.dirname(out_params.report_folder_base))
     try:
         if extracttype == 'fs':
-            seeker = FileSeekerDir(input_path)
+            seeker = FileSeekerDir(input_path, listing_cache)
 
         elif extracttype in ('tar', 'gz'):
-            seeker = FileSeekerTar(input_path, out_params.temp_folder)
+            seeker = FileSeekerTar(input_path, out_params.temp_folder, listing_cache)
 
         elif extracttype == 'zip':
             seeker = FileSeekerZip(input_path, out_params.temp_folder)
@@ -340,19 +457,26 @@ def crunch_artifacts(
     log.write(f'Timezone selected: {time_offset}<br><br>')
     
     parsed_modules = 0
+    parallel_jobs = []
 
-    # Search for the files per the arguments
+    # Search for the files of all plugins in a single pass over the file listing
+    plugin_search_regexes = []
     for plugin in plugins:
         if isinstance(plugin.search, list) or isinstance(plugin.search, tuple):
-            search_regexes = plugin.search
+            plugin_search_regexes.append(plugin.search)
         else:
-            search_regexes = [plugin.search]
+            plugin_search_regexes.append([plugin.search])
+    # Archive members are only written out for the plugins that need them on disk
+    found_by_regex = seeker.search_many(
+        [regex for search_regexes in plugin_search_regexes for regex in search_regexes], extract=False)
+
+    for plugin, search_regexes in zip(plugins, plugin_search_regexes):
         parsed_modules += 1
         GuiWindow.SetProgressBar(parsed_modules, len(plugins))
         files_found = []
         log.write(f'<b>For {plugin.name} module</b>')
         for artifact_search_regex in search_regexes:
-            found = seeker.search(artifact_search_regex)
+            found = found_by_regex[artifact_search_regex]
             if not found:
                 log.write(f'<ul><li>No file found for regex <i>{artifact_search_regex}</i></li></ul>')
             else:
@@ -363,29 +487,27 @@ def crunch_artifacts(
                     log.write(f'<ul><li>{pathh}</li></ul>')
                 log.write(f'</li></ul>')
                 files_found.extend(found)
+        if files_found and not plugin.virtual_files:
+            files_found = seeker.materialize(files_found)
         if files_found:
-            logfunc()
-            logfunc('{} [{}] artifact started'.format(plugin.name, plugin.module_name))
-            category_folder = os.path.join(out_params.report_folder_base, plugin.category)
-            if not os.path.exists(category_folder):
-                try:
-                    os.mkdir(category_folder)
-                except (FileExistsError, FileNotFoundError) as ex:
-                    logfunc('Error creating {} report directory at path {}'.format(plugin.name, category_folder))
-                    logfunc('Error was {}'.format(str(ex)))
-                    continue  # cannot do work
-            try:
-                plugin.method(files_found, category_folder, seeker, wrap_text, time_offset)
-            except Exception as ex:
-                logfunc('Reading {} artifact had errors!'.format(plugin.name))
-                logfunc('Error was {}'.format(str(ex)))
-                logfunc('Exception Traceback: {}'.format(traceback.format_exc()))
-                continue  # nope
-
-            logfunc('{} [{}] artifact completed'.format(plugin.name, plugin.module_name))
+            if workers > 1 and plugin.name != 'usagestatsVersion': # usagestatsVersion must complete before the others
+                parallel_jobs.append((plugin, files_found))
+            else:
+                run_plugin(plugin, files_found, out_params.report_folder_base, seeker, wrap_text, time_offset)
 
     log.close()
 
+    if parallel_jobs:
+        logfunc(f'Running {len(parallel_jobs)} artifact modules in {workers} worker processes')
+        run_plugins_in_parallel(parallel_jobs, workers, out_params, seeker, wrap_text, time_offset, loader)
+
+    tsv_writer.close()
+    ccl_android_fcm_queued_messages.clear_fcm_stores()
+    timeline_writer.finish(out_params.report_folder_base)
+    timeline_stats = timeline_writer.stats()
+    if timeline_stats['rows']:
+        logfunc(f"Timeline: {timeline_stats['rows']} rows ({timeline_stats['bytes']} bytes) written "
+                f"at {timeline_stats['rows_per_second']:.0f} rows/s")
     logfunc('')
     logfunc('Processes completed.')
     end = process_time()
@@ -408,11 +530,17 @@ def crunch_artifacts(
     
         
     report.generate_report(out_params.report_folder_base, run_time_secs, run_time_HMS, extracttype, input_path, casedata)
+    if ArtifactHtmlReport.csv_export:
+        # tables written by the artifacts are already exported, this only picks up the others
+        html2csv(out_params.report_folder_base)
     logfunc('Report generation Completed.')
     logfunc('')
     logfunc(f'Report location: {out_params.report_folder_base}')
     return True
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    # this entry point is guarded, so pool processes can import it again
+    protobuf_decoding.process_pool_allowed = True
     main()
     
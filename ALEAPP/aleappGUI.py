@@ -194,6 +194,7 @@ def process(casedata):
             open_report_button = ttk.Button(main_window, text='Open Report & Close', command=lambda: open_report(report_path))
             open_report_button.grid(ipadx=8)
         else:
+            log_writer.flush()
             log_path = out_params.screen_output_file_path
             if log_path.startswith('\\\\?\\'): # windows
                 log_path = log_path[4:]
@@ -15,6 +15,7 @@ class PluginSpec:
     category: str
     search: str
     method: typing.Callable  # todo define callable signature
+    virtual_files: bool = False  # reads found files through seeker.open(), so they need not be extracted
 
 
 class PluginLoader:
@@ -47,9 +48,14 @@ class PluginLoader:
                 func = getattr(mod, func_name) if version == 2 and isinstance(func_name, str) else func_name
                 if name in self._plugins:
                     raise KeyError(f"Duplicate plugin {name}")
-                self._plugins[name] = PluginSpec(name, py_file.stem, category, search, func)
+                virtual_files = artifact.get('virtual_files', False) if version == 2 else False
+                self._plugins[name] = PluginSpec(name, py_file.stem, category, search, func, virtual_files)
 
 
+    @property
+    def plugin_path(self) -> pathlib.Path:
+        return self._plugin_path
+
     @property
     def plugins(self) -> typing.Iterable[PluginSpec]:
         yield from self._plugins.values()
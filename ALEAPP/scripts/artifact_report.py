@@ -1,10 +1,28 @@
+import csv
 import html
+import json
 import os
+import re
+from itertools import chain, islice
+from urllib.parse import quote
 from scripts.html_parts import *
 from scripts.ilapfuncs import is_platform_windows
 from scripts.version_info import aleapp_version
 
+tag_re = re.compile('<[^>]*>')
+
+def html_cell_text(cell):
+    '''Returns the text of a table cell's html, as a browser would show it'''
+    if '<' in cell or '&' in cell:
+        return html.unescape(tag_re.sub('', cell))
+    return cell
+
 class ArtifactHtmlReport:
+    # Tables with more rows are not written inline, their rows go to data shards
+    # loaded by the page (see write_artifact_data_table)
+    inline_row_limit = 5000
+    shard_rows = 10000
+    csv_export = False # set by the --csv option, tables are then also written to _CSV Exports
 
     def __init__(self, artifact_name, artifact_category=''):
         self.report_file = None
@@ -12,6 +30,13 @@ class ArtifactHtmlReport:
         self.script_code = ''
         self.artifact_name = artifact_name
         self.artifact_category = artifact_category # unused
+        self.report_folder_path = ''
+        self.report_folder_base = ''
+        self.artifact_file_name = ''
+        self._shard_files = {} # shards key -> shard paths, relative to report_folder_base
+        self._shard_count = 0
+        self._sharded_tables = 0
+        self.uses_table_shards = False
 
     def __del__(self):
         if self.report_file:
@@ -20,6 +45,10 @@ class ArtifactHtmlReport:
     def start_artifact_report(self, report_folder, artifact_file_name, artifact_description=''):
         '''Creates the report HTML file and writes the artifact name as a heading'''
         self.report_file = open(os.path.join(report_folder, f'{artifact_file_name}.temphtml'), 'w', encoding='utf8')
+        # the final page is written to the base report folder, shard paths are relative to it
+        self.report_folder_path = report_folder.rstrip('/\\')
+        self.report_folder_base = os.path.dirname(self.report_folder_path)
+        self.artifact_file_name = artifact_file_name
         self.report_file.write(page_header.format(f'ALEAPP - {self.artifact_name} report'))
         self.report_file.write(body_start.format(f'ALEAPP {aleapp_version}'))
         self.report_file.write(body_sidebar_setup)
@@ -56,7 +85,11 @@ class ArtifactHtmlReport:
             ----------
             data_headers   : List/Tuple of table column names
 
-            data_list      : List/Tuple of lists/tuples which contain rows of data
+            data_list      : List/Tuple of lists/tuples which contain rows of data, or an
+                             iterable of rows (see export_rows). Tables of more than
+                             inline_row_limit rows are written as data shards loaded by
+                             the page; for an iterable the total is then written below
+                             the table, as it is only known once all rows are written
 
             source_path    : Source path of data
 
@@ -79,8 +112,33 @@ class ArtifactHtmlReport:
         if (not self.report_file):
             raise ValueError('Output report file is closed/unavailable!')
 
-        num_entries = len(data_list)
-        if write_total:
+        if html_escape:
+            if html_no_escape:
+                def render_cells(row):
+                    return [html.escape(str(x) if x not in [None, 'N/A'] else '') if h not in html_no_escape else
+                            str(x) if x not in [None, 'N/A'] else '' for x, h in zip(row, data_headers)]
+            else:
+                def render_cells(row):
+                    return [html.escape(str(x) if x not in [None, 'N/A'] else '') for x in row]
+        else:
+            def render_cells(row):
+                return [str(x) if x != None else '' for x in row]
+
+        csv_file = None
+        if self.csv_export:
+            csv_file, render_cells = self._csv_export(data_headers, render_cells)
+
+        # Large tables are written as data shards instead of inline rows, see _write_table_shards
+        if hasattr(data_list, '__len__'):
+            num_entries = len(data_list)
+        else:
+            data_list = iter(data_list)
+            first_rows = list(islice(data_list, self.inline_row_limit + 1))
+            num_entries = len(first_rows) if len(first_rows) <= self.inline_row_limit else None
+            data_list = chain(first_rows, data_list)
+        use_shards = num_entries is None or num_entries > self.inline_row_limit
+
+        if write_total and num_entries is not None:
             self.write_minor_header(f'Total number of entries: {num_entries}', 'h6')
         if write_location:
             if is_platform_windows():
@@ -94,27 +152,24 @@ class ArtifactHtmlReport:
         if table_responsive:
             self.report_file.write("<div class='table-responsive'>")
 
+        table_attributes = (f'style="{table_style}"') if table_style else ''
+        if use_shards:
+            # the table ids of a page are often the same, the shards of each table get their own key
+            shards_key = f'{table_id}-{self._sharded_tables}'
+            self._sharded_tables += 1
+            table_attributes += ' data-leapp-shards="{}"'.format(html.escape(shards_key))
         table_head = '<table id="{}" class="table table-striped table-bordered table-xsm" cellspacing="0" {}>' \
-                     '<thead>'.format(table_id, (f'style="{table_style}"') if table_style else '')
+                     '<thead>'.format(table_id, table_attributes.lstrip())
         self.report_file.write(table_head)
         self.report_file.write(
             '<tr>' + ''.join(('<th class="th-sm">{}</th>'.format(html.escape(str(x))) for x in data_headers)) + '</tr>')
         self.report_file.write('</thead><tbody>')
 
-        if html_escape:
-            for row in data_list:
-                if html_no_escape:
-                    self.report_file.write('<tr>' + ''.join(('<td>{}</td>'.format(html.escape(
-                        str(x) if x not in [None, 'N/A'] else '')) if h not in html_no_escape else '<td>{}</td>'.format(
-                        str(x) if x not in [None, 'N/A'] else '') for x, h in zip(row, data_headers))) + '</tr>')
-                else:
-                    self.report_file.write('<tr>' + ''.join(
-                        ('<td>{}</td>'.format(html.escape(str(x) if x not in [None, 'N/A'] else '')) for x in
-                         row)) + '</tr>')
+        if use_shards:
+            row_count = self._write_table_shards(shards_key, map(render_cells, data_list))
         else:
             for row in data_list:
-                self.report_file.write(
-                    '<tr>' + ''.join(('<td>{}</td>'.format(str(x) if x != None else '') for x in row)) + '</tr>')
+                self.report_file.write('<tr>' + ''.join(['<td>' + cell + '</td>' for cell in render_cells(row)]) + '</tr>')
 
         self.report_file.write('</tbody>')
         if cols_repeated_at_bottom:
@@ -123,6 +178,67 @@ class ArtifactHtmlReport:
         self.report_file.write('</table>')
         if table_responsive:
             self.report_file.write("</div>")
+        if use_shards:
+            self._write_table_shard_scripts(shards_key)
+            if write_total and num_entries is None:
+                self.write_minor_header(f'Total number of entries: {row_count}', 'h6')
+        if csv_file is not None:
+            csv_file.close()
+
+    def _csv_export(self, data_headers, render_cells):
+        '''Opens the CSV export of the page and returns it, with a render_cells function
+           that also writes the text of the rendered cells to it. The tables of a page
+           go to the same file, each starting with its headers.
+        '''
+        csv_folder = os.path.join(self.report_folder_base, '_CSV Exports')
+        os.makedirs(csv_folder, exist_ok=True)
+        csv_path = os.path.join(csv_folder, self.artifact_file_name + '.csv')
+        # the byte order mark only goes at the start of the file
+        csv_file = open(csv_path, 'a', encoding='utf-8' if os.path.exists(csv_path) else 'utf-8-sig', newline='')
+        writer = csv.writer(csv_file, quotechar='"', quoting=csv.QUOTE_ALL)
+        writer.writerow([str(x) for x in data_headers])
+
+        def render_and_export_cells(row):
+            cells = render_cells(row)
+            writer.writerow([html_cell_text(cell) for cell in cells])
+            return cells
+        return csv_file, render_and_export_cells
+
+    def _write_table_shards(self, shards_key, rows):
+        '''Writes rendered rows (lists of cell html) to script files of shard_rows rows
+           in the _Table Data folder, returns the number of rows. Each file adds its rows
+           to leappTableData[shards_key], shards_key being the data-leapp-shards attribute
+           of the table, DataTables then gets them as its data source
+           and only builds the rows of the displayed page (deferred rendering).
+        '''
+        shard_folder = os.path.join(self.report_folder_base, '_Table Data',
+                                    os.path.relpath(self.report_folder_path, self.report_folder_base),
+                                    self.artifact_file_name)
+        os.makedirs(shard_folder, exist_ok=True)
+        row_count = 0
+        self._shard_files.setdefault(shards_key, [])
+        while True:
+            shard_rows = list(islice(rows, self.shard_rows))
+            if not shard_rows:
+                break
+            shard_path = os.path.join(shard_folder, f'{shards_key}_{self._shard_count:04}.js')
+            with open(shard_path, 'w', encoding='ascii') as shard_file:
+                # ensure_ascii keeps the files valid whatever the page encoding
+                shard_file.write(f'Array.prototype.push.apply(leappTableData[{json.dumps(shards_key)}], '
+                                 f'{json.dumps(shard_rows, separators=(",", ":"))});\n')
+            self._shard_files[shards_key].append(os.path.relpath(shard_path, self.report_folder_base))
+            row_count += len(shard_rows)
+            self._shard_count += 1
+        return row_count
+
+    def _write_table_shard_scripts(self, shards_key):
+        '''Writes the script tags loading the data shards of a table'''
+        self.report_file.write(f'<script>var leappTableData = window.leappTableData || {{}}; '
+                               f'leappTableData[{json.dumps(shards_key)}] = [];</script>')
+        for shard_path in self._shard_files.pop(shards_key, []):
+            shard_url = quote(shard_path.replace(os.sep, '/'))
+            self.report_file.write(f'<script src="{shard_url}"></script>')
+        self.uses_table_shards = True
 
     def add_section_heading(self, heading, size='h2'):
         heading = html.escape(heading)
@@ -146,7 +262,9 @@ class ArtifactHtmlReport:
 
     def end_artifact_report(self):
         if self.report_file:
-            self.report_file.write(body_main_trailer + body_end + self.script_code + page_footer)
+            self.report_file.write(body_main_trailer + body_end +
+                                   (table_shards_script if self.uses_table_shards else '') +
+                                   self.script_code + page_footer)
             self.report_file.close()
             self.report_file = None
 
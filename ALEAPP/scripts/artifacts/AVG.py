@@ -3,20 +3,20 @@ import base64
 from os.path import isfile, join, basename, dirname, getsize, abspath
 from os import makedirs
 import xml.etree.ElementTree as ET
-from hashlib import sha256, sha1
+from hashlib import sha256
 from Crypto.Protocol.KDF import PBKDF2
 from Crypto.Hash import SHA1
 from binascii import unhexlify
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import unpad
 import scripts.filetype as filetype
-from itertools import permutations
 from pathlib import Path
 import json
 import datetime
 
 ### Import ALEAPP Modules
 from scripts.artifact_report import ArtifactHtmlReport
+from scripts.credential_recovery import pin_for_hash, pattern_for_hash, find_pbkdf2_password
 from scripts.ilapfuncs import logfunc, tsv, timeline, is_platform_windows, media_to_html
 
 ### Function to reduce code (slightly) to be used with log function
@@ -43,6 +43,13 @@ def identifyMasterKey(PIN,masterIV):
     masterKey = cipher.decrypt(interpretKeyFile.secondEncryptedValue)
     return(masterKey,derivedKey, firstDecryptedValue)
 
+### Check a PBKDF2 key derived from a PIN: the first encrypted value is the SHA256 of the master key
+def derivedKeyMatches(password, derivedKey):
+    cipher = AES.new(derivedKey, AES.MODE_CBC, interpretKeyFile.masterIV)
+    firstDecryptedValue = cipher.decrypt(interpretKeyFile.firstEncryptedValue)
+    masterKey = cipher.decrypt(interpretKeyFile.secondEncryptedValue)
+    return sha256(masterKey).digest() == firstDecryptedValue
+
 ### Read relevant files from keyFile
 def interpretKeyFile(_keyFile):
     with open(_keyFile, 'rb') as keyFile:
@@ -77,6 +84,7 @@ def get_AVG(files_found, report_folder, seeker, wrap_text, time_offset):
     keyFileFound = False
     fileList = []
     metaDataFile = ''
+    masterKey = None
     encryption_details_data_list = []
     media_data_list = []
 
@@ -160,16 +168,11 @@ def get_AVG(files_found, report_folder, seeker, wrap_text, time_offset):
         printFunc('Will attempt brute force of PIN...', True, False, True)
         
         ### Bruteforce PIN
-        ### Range 0000 - 9999
-        for i in range(0,10000):
-            currentPIN = ('{0:04}'.format(i)).encode('utf-8')
-            ## Section of code to try the hash process and assign PasscodFound if correct
-            ## Compare the current PIN SHA1 and the provided AVG PIN
-            if sha1(currentPIN).hexdigest() == userPIN:
-                encryption_details_data_list.append(('User PIN' ,currentPIN.decode("utf-8")))
-                break
-            else:
-                continue
+        ### Range 0000 - 9999, looked up in a table of the SHA1 of every PIN
+        currentPIN = pin_for_hash(userPIN, 'sha1', 4, 4)
+        if currentPIN is not None:
+            encryption_details_data_list.append(('User PIN' ,currentPIN))
+            currentPIN = currentPIN.encode('utf-8')
 
         ### If it exists assign to variable
         try:
@@ -177,20 +180,17 @@ def get_AVG(files_found, report_folder, seeker, wrap_text, time_offset):
                 ### If pattern present will need to be bruteforced
                 encryption_details_data_list.append(('User Pattern Hash' ,userPattern))
                 printFunc('Will attempt brute force of Pattern... ', True, False, True)
-                for patternLength in range(4,10):
-                    currentPermutation = permutations(range(0,9),patternLength)     
-                    for x in currentPermutation:
-                        currentPattern = ''.join(str(v) for v in x)
-                        currentPatternHex = (unhexlify(''.join([f'0{x}' for x in currentPattern])))
-                        if sha1(currentPatternHex).hexdigest() == userPattern:
-                            encryption_details_data_list.append(('User Pattern' ,currentPattern))
-                            break   
+                currentPattern = pattern_for_hash(userPattern, 'sha1')
+                if currentPattern is not None:
+                    encryption_details_data_list.append(('User Pattern' ,currentPattern))
         ### If it doesn't log it
         except IndexError:
             printFunc(f'*****\t\t\tNo user Pattern found in file', True, False, True) 
 
         ### If the keyfile is present continue with the decryption using the identified PIN        
-        if keyFileFound:         
+        if keyFileFound and currentPIN is None:
+            printFunc('PIN not found, no decryption possible.', True, False, True)
+        elif keyFileFound:
             javaPIN = pinDict[currentPIN]
             encryption_details_data_list.append(('Java Equivilant',javaPIN.decode("utf-8")))
             printFunc(f'*****\t\t\tDeriving PBKDF2 key', True, False, True)
@@ -208,22 +208,14 @@ def get_AVG(files_found, report_folder, seeker, wrap_text, time_offset):
         ### If the file doesn't exist the PIN will require bruteforce against the key file.
         printFunc('*****\t\t\tCould not find settings file, will require bruteforce', False, False, True)
         printFunc('*****\t\t\tBruteforce requied and will take some time', True, False, True)
-        ### For each PIN in the dictionary
-        for pin in pinDict:
-        ### Assign masterKey based on current PIN   
-            keyData = identifyMasterKey(pinDict[pin], interpretKeyFile.masterIV)
-            masterKey = keyData[0]
-            derivedKey = keyData[1]
-            firstDecryptedValue =  keyData[2]
-            ### New sha256 instance
-            masterKeyHash = sha256()
-            ### Hash the final decrypted output
-            masterKeyHash.update(masterKey)
-            ### Check whether the decrypted data mataches the expected string
-            if masterKeyHash.hexdigest() == firstDecryptedValue.hex():
-                encryption_details_data_list.append(('User PIN' ,pin.decode("utf-8")))
-                encryption_details_data_list.append(('Derived Key',derivedKey))
-                break      
+        ### Derive the key of each PIN in the dictionary (across processes) until one decrypts the master key
+        pinsByPassword = {unhexlify(pinDict[pin]): pin for pin in pinDict}
+        found = find_pbkdf2_password(pinsByPassword, interpretKeyFile.masterIV, 100, 16, derivedKeyMatches)
+        if found:
+            pin = pinsByPassword[found[0]]
+            masterKey, derivedKey, _ = identifyMasterKey(pinDict[pin], interpretKeyFile.masterIV)
+            encryption_details_data_list.append(('User PIN' ,pin.decode("utf-8")))
+            encryption_details_data_list.append(('Derived Key',derivedKey))
 
     if encryption_details_data_list:
         report = ArtifactHtmlReport("AVG - Encryption Details")
@@ -257,7 +249,7 @@ def get_AVG(files_found, report_folder, seeker, wrap_text, time_offset):
     ### If media file listing not empty
     ## Go through list and decrypt each file
     ## Files will be identifiable by 'mid', 'thumb' and full name for full picture    
-    if fileList:
+    if fileList and masterKey is not None:
         ### Create the directory for the files to be written to
         makedirs(join(report_folder, "AVGDecryptedFiles"))
         ### Create report for media files
@@ -316,6 +308,8 @@ def get_AVG(files_found, report_folder, seeker, wrap_text, time_offset):
             
         tsvname = f'AVG - Media Files'
         tsv(report_folder, data_headers, media_data_list, tsvname)                  
+    elif fileList:
+        logfunc('Master key not found, files not decrypted')
     else:
         logfunc('No files found to decrypt')
         
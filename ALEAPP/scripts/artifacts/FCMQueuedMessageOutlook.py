@@ -38,7 +38,7 @@ def get_fcm_outlook(files_found, report_folder, seeker, wrap_text, time_offset):
     in_dirs = set(pathlib.Path(x).parent for x in files_found)
     rows = []
     for in_db_path in in_dirs:
-        with FcmIterator(in_db_path) as record_iterator:
+        with FcmIterator(in_db_path, "com.microsoft.office.outlook") as record_iterator:
             for rec in record_iterator:
                 if rec.package == "com.microsoft.office.outlook":
                     if rec.key_values["type"] == "OutlookPushNotification":
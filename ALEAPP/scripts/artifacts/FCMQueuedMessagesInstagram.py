@@ -38,7 +38,7 @@ def get_fcm_instagram(files_found, report_folder, seeker, wrap_text, time_offset
     rows = []
 
     for in_db_path in in_dirs:
-        with FcmIterator(in_db_path) as record_iterator:
+        with FcmIterator(in_db_path, "com.instagram.android") as record_iterator:
             for rec in record_iterator:
                 if rec.package == "com.instagram.android":
                     if "data" in rec.key_values:
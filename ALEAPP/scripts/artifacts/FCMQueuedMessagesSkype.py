@@ -226,7 +226,7 @@ def get_fcm_skype(files_found, report_folder, seeker, wrap_text, mode, time_offs
     # we only need the input data dirs not every matching file
     in_dirs = set(pathlib.Path(x).parent for x in files_found)
     for in_db_path in in_dirs:
-        with FcmIterator(in_db_path) as record_iterator:
+        with FcmIterator(in_db_path, app_id) as record_iterator:
             for rec in record_iterator:
                 if rec.package == app_id:
                     if rec.key_values["eventType"] not in KNOWN_TYPES:
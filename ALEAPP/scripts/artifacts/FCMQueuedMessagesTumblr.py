@@ -48,7 +48,7 @@ def get_fcm_instagram(files_found, report_folder, seeker, wrap_text, time_offset
     # blog_names = set()
 
     for in_db_path in in_dirs:
-        with FcmIterator(in_db_path) as record_iterator:
+        with FcmIterator(in_db_path, "com.tumblr") as record_iterator:
             for rec in record_iterator:
                 if rec.package == "com.tumblr":
                     for key, value in rec.key_values.items():
@@ -105,7 +105,7 @@ def get_fcm_twitter(files_found, report_folder, seeker, wrap_text, time_offset):
     ]
 
     for in_db_path in in_dirs:
-        with FcmIterator(in_db_path) as record_iterator:
+        with FcmIterator(in_db_path, "com.twitter.android") as record_iterator:
             for rec in record_iterator:
                 if rec.package == "com.twitter.android":
                     if "channel" not in rec.key_values:
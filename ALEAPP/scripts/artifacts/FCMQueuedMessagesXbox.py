@@ -78,7 +78,7 @@ def get_fcm_xbox(files_found, report_folder, seeker, wrap_text, time_offset):
     presence_rows = []
 
     for in_db_path in in_dirs:
-        with FcmIterator(in_db_path) as record_iterator:
+        with FcmIterator(in_db_path, "com.microsoft.xboxone.smartglass") as record_iterator:
             for rec in record_iterator:
                 if rec.package == "com.microsoft.xboxone.smartglass":
                     notification_type = rec.key_values["type"]
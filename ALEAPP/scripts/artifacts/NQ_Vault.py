@@ -1,10 +1,12 @@
-import itertools
-import string
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from os.path import join
 
 from scripts.artifact_report import ArtifactHtmlReport
-from scripts.ilapfuncs import logfunc, tsv, timeline, is_platform_windows, media_to_html, open_sqlite_db_readonly
+from scripts import credential_recovery
+from scripts.credential_recovery import java_string_hashcode, recover_java_hashcode_pin
+from scripts.ilapfuncs import logfunc, tsv, timeline, is_platform_windows, media_to_html, open_sqlite_db_readonly, \
+    copy_file_rest
 
 
 '''def extract_PIN_from_db(file_found):
@@ -68,45 +70,14 @@ def extract_data_from_db(file_found):
 
 
 def brute_force_pin(encoded_PIN):
-    decoded_PIN = None
-
-    pin_len = 3
-    logfunc('PIN Hash Identified!\nAttempting PINs from 3 - 15 digits. If PIN len > 8/9 it could take some time.\n')
-    # earlier PINs that have been identified
-    if encoded_PIN == '1509442':
-        pin = 1234
-        return pin
-    elif encoded_PIN == '1477632':
-        pin = 0000
-        return pin
-    elif encoded_PIN == '-1867378635':
-        pin = 123456789
-        return pin
-    elif encoded_PIN == '-1812067894':
-        pin = 25101988
-        return pin
-    else:
-        while pin_len <= 15:
-            for numbers in itertools.product(string.digits, repeat=pin_len):
-
-                pin = ''.join(numbers)
-                decoded_test_value_string = str(java_string_hashcode(pin))
-
-                if decoded_test_value_string == encoded_PIN:
-                    #logfunc(f'Decrypted PIN is: {pin}')
-                    return pin
-            else:
-                pin_len += 1
-
-        if decoded_PIN is None:
-            print('Sorry. No PIN found.')
-
-
-def java_string_hashcode(pin):
-    hashcode_init = 0
-    for iters in pin:
-        hashcode_init = (31 * hashcode_init + ord(iters)) & 0xFFFFFFFF
-    return ((hashcode_init + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+    logfunc('PIN Hash Identified!\nAttempting PINs from 3 - 15 digits.\n')
+    if credential_recovery.numpy is None:
+        logfunc('NumPy is not installed, PINs of more than 12 digits can take minutes to find.\n')
+    # any PIN with the same hash gives the same XOR key, the shortest one is reported
+    decoded_PIN = recover_java_hashcode_pin(encoded_PIN, 3, 15)
+    if decoded_PIN is None:
+        print('Sorry. No PIN found.')
+    return decoded_PIN
 
 
 def raw_pin_to_XOR_key(pin):
@@ -144,77 +115,74 @@ def raw_pin_to_XOR_key(pin):
     return file_match_dict'''
 
 
+def decrypt_file(file_found, decrypted_path, key_to_int):
+    # only the first 128 bytes are XORed with the key, the rest is copied as is
+    xor_table = bytes(value ^ key_to_int for value in range(256))
+    with open(file_found, 'rb') as file_to_decrypt, open(decrypted_path, 'wb') as decryptedFile:
+        decryptedFile.write(bytearray(file_to_decrypt.read(128)).translate(xor_table))
+        copy_file_rest(file_to_decrypt, decryptedFile)
+
+
 def file_decryption(files_found, dict_of_file_info, dict_of_pin_dicts, report_folder):
     data_list = []
     logfunc('Encrypted files found! File Decryption in progress...')
 
+    file_infos_by_name = {}
+    for enc_filename, file_info in dict_of_file_info.items():
+        file_infos_by_name.setdefault(enc_filename.split('.')[0], []).append(file_info)
+
+    decryptions = []
     for file_found in files_found:
         file_found = str(file_found)
         # the parent folder of the files is base 64 encoded password hash
         # could do further validation is required.
         if file_found.endswith('.bin') and ('.image' in file_found or '.video' in file_found):
+            for file_info in file_infos_by_name.get(Path(file_found).stem, ()):
+                # find xor pin from dictionary
+                encoded_pin_info = dict_of_pin_dicts.get(file_info['password_id'])
+                if encoded_pin_info is None:
+                    logfunc(f'No XOR key for {file_found}, not decrypted.')
+                    continue
+                decryptions.append((file_found, file_info, encoded_pin_info))
+
+    # files decrypted to the same name are written one after the other, in order, the last one is kept
+    decryptions_by_path = {}
+    for decryption in decryptions:
+        decryptions_by_path.setdefault(join(report_folder, decryption[1]['old_filename']), []).append(decryption)
+
+    def decrypt_files(pathdec):
+        for file_found, file_info, encoded_pin_info in decryptions_by_path[pathdec]:
+            decrypt_file(file_found, pathdec, int(encoded_pin_info['xor_key'], 16))
+
+    with ThreadPoolExecutor() as executor:
+        for _ in executor.map(decrypt_files, decryptions_by_path):
+            pass
+
+    for file_found, file_info, encoded_pin_info in decryptions:
+        encrypted_file_name = Path(file_info['vault_filepath']).stem + '.bin'
+        pathdec = join(report_folder, file_info['old_filename'])
+        thumb = media_to_html(pathdec, [pathdec], report_folder)
+
+        data_list.append((thumb, file_info['old_filename'], file_info['old_filepath'],
+                          encrypted_file_name,file_found, file_info['timestamp'],
+                          file_info['vid_length'],file_info['resolution'],file_info['alb_name'],
+                          file_info['prev_alb_name'],encoded_pin_info['pin_for_XOR_key'], file_info['password_id']))
+        logfunc(f'{encrypted_file_name} decrypted.')
+
+    if data_list:
+        report = ArtifactHtmlReport('NQ Vault Decrypted Media')
+        report.start_artifact_report(report_folder, 'NQ Vault Decrypted Media')
+        report.add_script()
+        data_headers = ('Media', 'Original Filename', 'Original Filepath', 'Encrypted Filename',
+                        'Full Path','Timestamp','Video Length','File Resolution','Album Name',
+                        'Previous Album Name','Password','Password Hash')
+        maindirectory = str(Path(decryptions[-1][0]).parents[1])
+        report.write_artifact_data_table(data_headers, data_list, maindirectory,
+                                         html_no_escape=['Media'])
+        report.end_artifact_report()
 
-            filename_without_ext = Path(file_found).stem
-            xor_key = ''
-            pin_code = None
-            for enc_filename, file_info in dict_of_file_info.items():
-                if enc_filename.split('.')[0] == filename_without_ext:
-                    file_enc_pin = file_info['password_id']
-
-                    # find xor pin from dictionary
-                    for encoded_pin, encoded_pin_info in dict_of_pin_dicts.items():
-                        if encoded_pin == file_enc_pin:
-                            xor_key = encoded_pin_info['xor_key']
-                            pin_code = encoded_pin_info['pin_for_XOR_key']
-
-                    if xor_key != 0:
-                        key_to_int = int(xor_key, 16)
-                        xor_list = []
-                        iter_through_initial_bytes = 0
-                        decrypted_file_name = file_info['old_filename']
-                        encrypted_file_name = Path(file_info['vault_filepath']).stem + '.bin'
-                        with open(file_found, 'rb') as file_to_decrypt:
-                            byte = file_to_decrypt.read(1)
-
-                            while byte:
-                                if iter_through_initial_bytes < 128:
-                                    xord_bytes = int(byte.hex(), 16) ^ key_to_int
-                                    xor_list.append(xord_bytes)
-                                else:
-                                    xor_list.append(int(byte.hex(), 16))
-
-                                iter_through_initial_bytes = iter_through_initial_bytes + 1
-                                byte = file_to_decrypt.read(1)
-
-                            xord_bytes_decrypted = bytes(xor_list)
-                            with open(join(report_folder, decrypted_file_name), 'wb') as decryptedFile:
-                                decryptedFile.write(xord_bytes_decrypted)
-                                decryptedFile.close()
-
-                                tolink = []
-                                pathdec = join(report_folder, decrypted_file_name)
-                                tolink.append(pathdec)
-                                thumb = media_to_html(pathdec, tolink, report_folder)
-
-                                data_list.append((thumb, file_info['old_filename'], file_info['old_filepath'],
-                                                  encrypted_file_name,file_found, file_info['timestamp'],
-                                                  file_info['vid_length'],file_info['resolution'],file_info['alb_name'],
-                                                  file_info['prev_alb_name'],pin_code, file_info['password_id']))
-                        logfunc(f'{encrypted_file_name} decrypted.')
-                        if data_list:
-                            report = ArtifactHtmlReport('NQ Vault Decrypted Media')
-                            report.start_artifact_report(report_folder, 'NQ Vault Decrypted Media')
-                            report.add_script()
-                            data_headers = ('Media', 'Original Filename', 'Original Filepath', 'Encrypted Filename',
-                                            'Full Path','Timestamp','Video Length','File Resolution','Album Name',
-                                            'Previous Album Name','Password','Password Hash')
-                            maindirectory = str(Path(file_found).parents[1])
-                            report.write_artifact_data_table(data_headers, data_list, maindirectory,
-                                                             html_no_escape=['Media'])
-                            report.end_artifact_report()
-
-                            tsvname = f'NQVault'
-                            tsv(report_folder, data_headers, data_list, tsvname)
+        tsvname = f'NQVault'
+        tsv(report_folder, data_headers, data_list, tsvname)
 
 
 # MAIN #
@@ -9,7 +9,8 @@ __artifacts_v2__ = {
         "category": "Device Health Services",
         "notes": "",
         "paths": ('*/com.google.android.apps.turbo/shared_prefs/app_usage_stats.xml'),
-        "function": "get_Turbo_AppUsage"
+        "function": "get_Turbo_AppUsage",
+        "virtual_files": True
     }
 }
 
@@ -29,7 +30,8 @@ def get_Turbo_AppUsage(files_found, report_folder, seeker, wrap_text, time_offse
     
     for file_found in files_found:
         file_name = str(file_found)
-        tree = ET.parse(file_found)
+        with seeker.open(file_found) as f:
+            tree = ET.parse(f)
         
         for elem in tree.iter(tag='string'):
             splits = elem.text.split('#')
@@ -1,7 +1,7 @@
 import sqlite3
 import os
 import textwrap
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 import datetime
 
 from packaging import version
@@ -70,10 +70,10 @@ def get_airtagAndroid(files_found, report_folder, seeker, wrap_text, time_offset
             data_headers = ('Timestamp','Last Updated Timestamp','MAC Address','State','Possible RSSI','Latitude','Longitude')
             data_list = []
             for row in all_rows:
-                blescanproto, types = blackboxprotobuf.decode_message(row[4])
+                blescanproto, types = decode_message(row[4])
                 posrssi = (blescanproto['2'])
                 
-                locationscanproto, types = blackboxprotobuf.decode_message(row[5])
+                locationscanproto, types = decode_message(row[5])
                 latitude = (locationscanproto['4']/1e7)
                 longitude = (locationscanproto['5']/1e7)
                 
@@ -104,7 +104,7 @@ def get_airtagAndroid(files_found, report_folder, seeker, wrap_text, time_offset
         with open(file_found, 'rb') as f:
             protodata = f.read()
             
-        lastscan, types = blackboxprotobuf.decode_message(protodata)
+        lastscan, types = decode_message(protodata)
         lastscan = (lastscan['1'])
         lastscan = (datetime.datetime.utcfromtimestamp(int(lastscan)/1000).strftime('%Y-%m-%d %H:%M:%S'))
         
@@ -133,7 +133,7 @@ def get_airtagAndroid(files_found, report_folder, seeker, wrap_text, time_offset
         with open(file_found, 'rb') as f:
             protodata = f.read()
             
-        passscan, types = blackboxprotobuf.decode_message(protodata)
+        passscan, types = decode_message(protodata)
         passscan = (passscan['1'])
         
         if passscan == 1:
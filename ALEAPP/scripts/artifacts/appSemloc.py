@@ -16,7 +16,7 @@ __artifacts_v2__ = {
 }
 import pathlib
 import json
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 from datetime import *
 import scripts.ccl_leveldb
 
@@ -43,7 +43,7 @@ def get_appSemloc(files_found, report_folder, seeker, wrap_text, timezone_offset
             pf = f'{p}/{f}'
             
             value = record_value
-            value, types = blackboxprotobuf.decode_message(value)
+            value, types = decode_message(value)
             
             check = value.get('1')
             if check is not None:
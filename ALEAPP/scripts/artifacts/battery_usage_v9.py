@@ -38,7 +38,7 @@ __artifacts_v2__ = {
 }
 
 import re
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 import base64
 
 from scripts.artifact_report import ArtifactHtmlReport
@@ -74,7 +74,7 @@ def get_battery_usage_v9(files_found, report_folder, seeker, wrap_text, time_off
                 
                 for row in all_rows:
                     # we need to parse the column batteryInformationDebug - a lot of data is in here
-                    battery_info_proto, types = blackboxprotobuf.decode_message(base64.b64decode(row[5]))
+                    battery_info_proto, types = decode_message(base64.b64decode(row[5]))
                     app_label = battery_info_proto['7']
                     is_hidden = battery_info_proto['2']
                     boot_timestamp = battery_info_proto['3'] / 1000
@@ -16,7 +16,7 @@ import sqlite3
 import os
 import shutil
 import textwrap
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 
 from packaging import version
 from scripts.artifact_report import ArtifactHtmlReport
@@ -59,7 +59,7 @@ def get_bumble(files_found, report_folder, seeker, wrap_text, time_offset):
         with open(settings_file, 'rb') as f:
 
             pb = f.read()
-            message = blackboxprotobuf.decode_message(pb)
+            message = decode_message(pb)
             types = {'0': {'name': '', 'type': 'int'},
           '1': {'name': '', 'type': 'int'},
           '2': {'message_typedef': {'1': {'message_typedef': {'1': {'message_typedef': {'1': {'name': '',
@@ -530,7 +530,7 @@ def get_bumble(files_found, report_folder, seeker, wrap_text, time_offset):
                 'type': 'message'},
           '482': {'name': '', 'type': 'fixed64'}}
             
-            values, types = blackboxprotobuf.decode_message(pb, types)
+            values, types = decode_message(pb, types)
             
             user_name = values['2']['1'][2]['2-1']['2']['user_name']
             user_email = values['2']['1'][2]['2-1']['2']['user_email']
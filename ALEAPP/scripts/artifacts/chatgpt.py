@@ -20,7 +20,7 @@ __artifacts_v2__ = {
 import xml.etree.ElementTree as ET
 from datetime import *
 import os
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 import json
 from pathlib import Path
 from PIL import Image
@@ -175,7 +175,7 @@ def get_chatgpt(files_found, report_folder, seeker, wrap_text, time_offset):
             if file_name.endswith("_user.preferences_pb"):
                 with open(file_found, 'rb') as file:
                     data = file.read()
-                    values, types = blackboxprotobuf.decode_message(data)
+                    values, types = decode_message(data)
                     data_list = []
                     if isinstance(values, dict):
                         try:
@@ -212,7 +212,7 @@ def get_chatgpt(files_found, report_folder, seeker, wrap_text, time_offset):
             if file_name.endswith("_accountstatus.preferences_pb"):
                 with open(file_found, 'rb') as file:
                     data = file.read()
-                    values, types = blackboxprotobuf.decode_message(data)
+                    values, types = decode_message(data)
                     data_list = []
                     if isinstance(values, dict):
                         try:
@@ -253,7 +253,7 @@ def get_chatgpt(files_found, report_folder, seeker, wrap_text, time_offset):
             if file_name.endswith("_accountuser_state.preferences_pb"):
                 with open(file_found, 'rb') as file:
                     data = file.read()
-                    values, types = blackboxprotobuf.decode_message(data)
+                    values, types = decode_message(data)
                     data_list = []
                     if isinstance(values, dict):
                         try:
@@ -304,7 +304,7 @@ def get_chatgpt(files_found, report_folder, seeker, wrap_text, time_offset):
             if file_name.endswith("_custom_instructions.preferences_pb"):
                 with open(file_found, 'rb') as file:
                     data = file.read()
-                    values, types = blackboxprotobuf.decode_message(data)
+                    values, types = decode_message(data)
                     data_list = []
                     if isinstance(values, dict):
                         try:
@@ -336,7 +336,7 @@ def get_chatgpt(files_found, report_folder, seeker, wrap_text, time_offset):
             if file_name.endswith("_user_settings.preferences_pb"):
                 with open(file_found, 'rb') as file:
                     data = file.read()
-                    values, types = blackboxprotobuf.decode_message(data)
+                    values, types = decode_message(data)
                     data_list = []
                     if isinstance(values, dict):
                         try:
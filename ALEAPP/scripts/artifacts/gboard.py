@@ -1,7 +1,7 @@
 # Update 2023-05-01 from @KevinPagano3 (https://startme.stark4n6.com)
 # Added support for parsing gboard_clipboard.db database
 
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 import os
 import shutil
 import sqlite3
@@ -124,7 +124,7 @@ def read_trainingcache2(file_found, report_folder, seeker):
             all_rows = cursor.fetchall()
             for row in all_rows:
                 pb = row['_payload']
-                data, actual_types = blackboxprotobuf.decode_message(pb, pb_types)
+                data, actual_types = decode_message(pb, pb_types)
                 texts = data.get('7', {}).get('2', [])
                 text_typed = ''
                 if texts:
@@ -212,7 +212,7 @@ def read_trainingcachev2(file_found, report_folder, seeker):
                 ke = keyboard_event(row['id'], '', '', '', '', row['ts2'], row['ts1'], row['ts1'])
                 desc_proto = row['desc_proto']
                 if desc_proto:
-                    desc, actual_types = blackboxprotobuf.decode_message(desc_proto, None)
+                    desc, actual_types = decode_message(desc_proto, None)
                     try:
                         ke.textbox_name = desc.get('6', b'').decode('utf8', 'ignore')
                     except AttributeError:
@@ -224,7 +224,7 @@ def read_trainingcachev2(file_found, report_folder, seeker):
             ke.end_date = row['ts1']
             data_proto = row['data_proto']
             if data_proto:
-                data, actual_types = blackboxprotobuf.decode_message(data_proto, None)
+                data, actual_types = decode_message(data_proto, None)
                 input_dict = data.get('6', None) # It's either an input or an output (suggested words) proto type
                 if input_dict:
                     index = input_dict.get('1', {}).get('1', -1)
@@ -1,6 +1,6 @@
 import zlib
 import sqlite3
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 import os
 from datetime import datetime
 
@@ -63,7 +63,7 @@ def get_gmailEmails(files_found, report_folder, seeker, wrap_text, time_offset):
                 arreglo = bytearray(data)
                 arreglo = arreglo[1:]
                 decompressed_data = zlib.decompress(arreglo)
-                message,typedef = blackboxprotobuf.decode_message(decompressed_data)
+                message,typedef = decode_message(decompressed_data)
                 
                 timestamp = (datetime.utcfromtimestamp(message['17']/1000))
                 
@@ -1,4 +1,4 @@
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 import os
 import shutil
 import sqlite3
@@ -64,7 +64,7 @@ def get_googleCallScreen(files_found, report_folder, seeker, wrap_text, time_off
                 audio_clip = ''
                 conversation = ''
                 
-                data, actual_types = blackboxprotobuf.decode_message(pb, pb_types)
+                data, actual_types = decode_message(pb, pb_types)
                 
                 for x in data['1']:
     
@@ -9,7 +9,7 @@
 import os
 import sqlite3
 import textwrap
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_messages
 
 from scripts.artifact_report import ArtifactHtmlReport
 from scripts.ilapfuncs import logfunc, tsv, timeline, is_platform_windows, open_sqlite_db_readonly
@@ -46,8 +46,7 @@ def get_googleChat(files_found, report_folder, seeker, wrap_text, time_offset):
             usageentries = len(all_rows)
             data_list = []
             if usageentries > 0:
-                for x in all_rows:
-                    values = blackboxprotobuf.decode_message(x[4])
+                for x, values in zip(all_rows, decode_messages(x[4] for x in all_rows)):
                     if x[4] == b'':
                         data_list.append((x[0], x[1], x[2], x[3], '', '', '', '','','','',''))
                     else:
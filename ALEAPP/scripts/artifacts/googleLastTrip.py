@@ -1,4 +1,4 @@
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 from datetime import *
 from scripts.artifact_report import ArtifactHtmlReport
 from scripts.ilapfuncs import logfunc, tsv, is_platform_windows, convert_utc_human_to_timezone, kmlgen, timeline
@@ -13,7 +13,7 @@ def get_googleLastTrip(files_found, report_folder, seeker, wrap_text, time_offse
             data = f.read()
             arreglo = (data)
             pb = arreglo[8:]
-            values, types = blackboxprotobuf.decode_message(pb, typess)
+            values, types = decode_message(pb, typess)
         for x, y in values.items():
             #print(x, y)
             if x == '2':
@@ -17,7 +17,7 @@ import os
 import sqlite3
 import struct
 from datetime import *
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 from scripts.artifact_report import ArtifactHtmlReport
 from scripts.ilapfuncs import logfunc, tsv, timeline, kmlgen, is_platform_windows, open_sqlite_db_readonly, convert_utc_human_to_timezone
 
@@ -104,7 +104,7 @@ def get_googleMapsGmm(files_found, report_folder, seeker, wrap_text, time_offset
                 longitude = row[3]
                 syncitem = row[4]
                 timestamp = row[5]
-                pb = blackboxprotobuf.decode_message(syncitem, 'None')
+                pb = decode_message(syncitem, 'None')
 
                 if keystring == "0:0":
                     label = "Home"
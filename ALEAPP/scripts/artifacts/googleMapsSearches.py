@@ -1,4 +1,4 @@
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 from datetime import *
 from scripts.artifact_report import ArtifactHtmlReport
 from scripts.ilapfuncs import logfunc, tsv, is_platform_windows, convert_utc_human_to_timezone, kmlgen, timeline
@@ -14,7 +14,7 @@ def get_googleMapsSearches(files_found, report_folder, seeker, wrap_text, time_o
             data = f.read()
             arreglo = (data)
             pb = arreglo[8:]
-            values, types = blackboxprotobuf.decode_message(pb, typess)
+            values, types = decode_message(pb, typess)
         latitude = ''
         longitude = ''
         for x, y in values.items():
@@ -1,4 +1,4 @@
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 import json
 import sqlite3
 import time
@@ -88,7 +88,7 @@ def get_googleNowPlaying(files_found, report_folder, seeker, wrap_text, time_off
                 timestamp = row[0]
                 pb = row[1]
 
-                data, actual_types = blackboxprotobuf.decode_message(pb, pb_types)
+                data, actual_types = decode_message(pb, pb_types)
                 data = recursive_convert_bytes_to_str(data)
                 
                 try:             timezones = FilterInvalidValue(data["7"])
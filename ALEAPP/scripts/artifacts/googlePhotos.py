@@ -7,7 +7,7 @@ import shutil
 from scripts.filetype import guess_extension
 from packaging import version
 from scripts.artifact_report import ArtifactHtmlReport
-from scripts.ilapfuncs import logfunc, tsv, timeline, kmlgen, is_platform_windows, open_sqlite_db_readonly, media_to_html
+from scripts.ilapfuncs import logfunc, tsv, timeline, kmlgen, is_platform_windows, open_sqlite_db_readonly, media_to_html, media_resolver
 
 def get_googlePhotos(files_found, report_folder, seeker, wrap_text, time_offset):
     
@@ -315,11 +315,10 @@ def get_googlePhotos(files_found, report_folder, seeker, wrap_text, time_offset)
                 for row in all_rows:
                     fileNameKey = row[1]
                     
-                    for match in files_found:
-                        if fileNameKey in match:
-                            ext = guess_extension(match)
-                            newname = os.path.join(report_folder, f'{fileNameKey}.{ext}')
-                            shutil.copy2(match, newname)
+                    for match in media_resolver(files_found).matches(fileNameKey):
+                        ext = guess_extension(match)
+                        newname = os.path.join(report_folder, f'{fileNameKey}.{ext}')
+                        shutil.copy2(match, newname)
                     
                     thumb = media_to_html(fileNameKey, files_found, report_folder)
                         
@@ -371,11 +370,10 @@ def get_googlePhotos(files_found, report_folder, seeker, wrap_text, time_offset)
                     fileNameKey = row[3]
                     thumb = ''
                     
-                    for match in files_found:
-                        if fileNameKey in match:
-                            ext = guess_extension(match)
-                            newname = os.path.join(report_folder, f'{fileNameKey}.{ext}')
-                            shutil.copy2(match, newname)
+                    for match in media_resolver(files_found).matches(fileNameKey):
+                        ext = guess_extension(match)
+                        newname = os.path.join(report_folder, f'{fileNameKey}.{ext}')
+                        shutil.copy2(match, newname)
                             
                     thumb = media_to_html(fileNameKey, files_found, report_folder)
                         
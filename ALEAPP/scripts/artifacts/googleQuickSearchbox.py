@@ -1,4 +1,4 @@
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 import datetime
 import os
 import struct
@@ -121,7 +121,7 @@ def get_quicksearch(files_found, report_folder, seeker, wrap_text, time_offset):
         file_name = os.path.basename(file_found)
         with open(file_found, 'rb') as f:
             pb = f.read()
-            values, types = blackboxprotobuf.decode_message(pb)
+            values, types = decode_message(pb)
             file_last_mod_date = str(ReadUnixTime(os.path.getmtime(file_found)))
             s = parse_session_data(values, file_name, file_last_mod_date, report_folder)
             sessions.append(s)
@@ -1,4 +1,4 @@
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 import datetime
 import json
 import os
@@ -88,7 +88,7 @@ def get_quicksearch_recent(files_found, report_folder, seeker, wrap_text, time_o
                     '9': {'type': 'int', 'name': 'screenshot-id'},
                     '17': {'type': 'uint', 'name': 'timestamp2'},
                 }, 'name': ''} }
-            values, types = blackboxprotobuf.decode_message(pb, types)
+            values, types = decode_message(pb, types)
             items = values.get('1', None)
             
             if items:
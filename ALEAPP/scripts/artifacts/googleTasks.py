@@ -1,7 +1,7 @@
 import os
 import textwrap
 from datetime import datetime
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 
 from scripts.artifact_report import ArtifactHtmlReport
 from scripts.ilapfuncs import logfunc, tsv, timeline, is_platform_windows, open_sqlite_db_readonly
@@ -13,7 +13,7 @@ def b2s(a):
     return "".join(list(map(chr, a))) 
 
 def protobuf_parse_not_completed(data):
-    pb = blackboxprotobuf.decode_message(data, 'None')
+    pb = decode_message(data, 'None')
     completed = pb[0].get('2',{}).get('5',{}).get('1','')
     created = datetime.utcfromtimestamp(pb[0].get('11',{}).get('1','')).strftime('%Y-%m-%d %H:%M:%S')
     modified = datetime.utcfromtimestamp(pb[0].get('3',{}).get('1','')).strftime('%Y-%m-%d %H:%M:%S')
@@ -25,7 +25,7 @@ def protobuf_parse_not_completed(data):
     return task, task_details, created, completed, modified, timezone
 
 def protobuf_parse_completed(data):
-    pb = blackboxprotobuf.decode_message(data, None)
+    pb = decode_message(data, None)
     task = pb[0].get('2',{}).get('2','').decode()
     task_details = b2s(pb[0].get('2',{}).get('3',''))
     completed = datetime.utcfromtimestamp(pb[0].get('2',{}).get('5',{}).get('1','')).strftime('%Y-%m-%d %H:%M:%S')
@@ -1,8 +1,9 @@
 import sqlite3
 import textwrap
 
+from itertools import chain
 from scripts.artifact_report import ArtifactHtmlReport
-from scripts.ilapfuncs import logfunc, tsv, timeline, is_platform_windows, open_sqlite_db_readonly
+from scripts.ilapfuncs import logfunc, export_rows, is_platform_windows, open_sqlite_db_readonly
 
 def get_scontextLog(files_found, report_folder, seeker, wrap_text, time_offset):
     
@@ -25,25 +26,20 @@ def get_scontextLog(files_found, report_folder, seeker, wrap_text, time_offset):
     from use_app
     ''')
 
-    all_rows = cursor.fetchall()
-    usageentries = len(all_rows)
-    if usageentries > 0:
+    # the log can hold years of app usage, rows are streamed from the cursor to all outputs
+    first_row = cursor.fetchone()
+    if first_row:
         report = ArtifactHtmlReport('Samsung Context Log')
         report.start_artifact_report(report_folder, 'Samsung Context Log')
         report.add_script()
         data_headers = ('Start Time', 'Stop Time','Timezone', 'App ID', 'APP Sub ID', 'Duration', 'Duration in Secs')
-        data_list = []
-        for row in all_rows:
-            data_list.append((row[0],row[1],row[2],row[3],row[4],row[5],row[6]))
 
-        report.write_artifact_data_table(data_headers, data_list, file_found)
-        report.end_artifact_report()
-        
         tsvname = f'samsung contextlog'
-        tsv(report_folder, data_headers, data_list, tsvname)
-        
         tlactivity = f'Samsung Context Log'
-        timeline(report_folder, tlactivity, data_list, data_headers) 
+        data_list = export_rows(chain([first_row], cursor), report_folder, data_headers, tsvname, tlactivity)
+
+        report.write_artifact_data_table(data_headers, data_list, file_found)
+        report.end_artifact_report()
     else:
         logfunc('No Samsung Context Log data available')
     
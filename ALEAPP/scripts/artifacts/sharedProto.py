@@ -15,7 +15,7 @@ __artifacts_v2__ = {
 import pathlib
 import sqlite3
 import textwrap
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 import traceback
 import scripts.ccl_leveldb
 from datetime import datetime, timedelta
@@ -44,7 +44,7 @@ def get_sharedProto(files_found, report_folder, seeker, wrap_text, time_offset):
         
             recordkey = record_key.decode()
             #print(record_value)
-            protostuff, types = blackboxprotobuf.decode_message(record_value)
+            protostuff, types = decode_message(record_value)
             
             data = (protostuff.get('1','nodata'))
             if data == 'nodata':
@@ -11,7 +11,8 @@ __artifacts_v2__ = {
         "paths": (
             '*/com.google.android.gms/shared_prefs/ULR_USER_PREFS.xml'
         ),
-        "function": "get_urluser"
+        "function": "get_urluser",
+        "virtual_files": True
     }
 }
 import json
@@ -28,7 +29,8 @@ def get_urluser(files_found, report_folder, seeker, wrap_text, timezone_offset):
         if file_found.endswith('ULR_USER_PREFS.xml'):
         
             data_list = []
-            tree = ET.parse(file_found)
+            with seeker.open(file_found) as f:
+                tree = ET.parse(f)
             root = tree.getroot()
             #print('Processed: '+filename)
             
@@ -1,4 +1,4 @@
-import blackboxprotobuf
+from scripts.protobuf_decoding import decode_message
 import json
 import sqlite3
 import time
@@ -85,7 +85,7 @@ def get_usageapps(files_found, report_folder, seeker, wrap_text, time_offset):
                 else:
                     idb = ''
                 
-                values, actual_types = blackboxprotobuf.decode_message(pb, types)
+                values, actual_types = decode_message(pb, types)
                 values = recursive_convert_bytes_to_str(values)
 
                 for key, val in values.items():
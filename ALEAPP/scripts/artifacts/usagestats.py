@@ -231,7 +231,7 @@ def get_usagestats(files_found, report_folder, seeker, wrap_text, time_offset):
     for file_found in files_found:
         file_found = str(file_found)
         parts = file_found.split(slash)
-        if os.path.isdir(file_found): # filter for directory only. 
+        if seeker.stat(file_found).is_dir: # filter for directory only. 
             # Target = .../system/usagestats/0  <-- Android <= 10
             # Target = .../system_ce/0/usagestats  <-- Android = 11
             if len(parts) > 2 and parts[-2] == 'usagestats' and parts[-3] == 'system':
@@ -2,7 +2,6 @@ import os
 import re
 import string
 
-from pathlib import Path
 from scripts.artifact_report import ArtifactHtmlReport
 from scripts.ilapfuncs import logfunc, is_platform_windows
 
@@ -16,7 +15,7 @@ def get_walStrings(files_found, report_folder, seeker, wrap_text, time_offset):
     x = 1
     data_list = []
     for file_found in files_found:
-        filesize = Path(file_found).stat().st_size
+        filesize = seeker.stat(file_found).size
         if filesize == 0:
             continue
 
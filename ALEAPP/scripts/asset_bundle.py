@@ -0,0 +1,120 @@
+# Static files of the HTML report (styles, scripts) concatenated into a few bundle
+# files, named after a hash of their content. A bundle is built once in a store
+# folder shared by the reports of an output folder, each report then gets hard
+# links to it in its _elements folder, instead of copies of every library file.
+
+import base64
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+from functools import lru_cache
+from scripts.version_info import aleapp_version
+
+__location__ = os.path.dirname(os.path.abspath(__file__))
+
+# In the order the pages loaded them
+css_files = [
+    'dark-mode.css',
+    'MDB-Free_4.13.0/css/bootstrap.min.css',
+    'MDB-Free_4.13.0/css/mdb.min.css',
+    'highlight.min.css',
+    'cal-heatmap.css',
+    'dashboard.css',
+    'chat.css',
+    'MDB-Free_4.13.0/css/addons/datatables.min.css',
+    'timeline/css/timeline.min.css',
+]
+head_js_files = [
+    'highlight.min.js',
+    'd3.v7.min.js',
+    'cal-heatmap.min.js',
+    'popper.min.js',
+    'Tooltip.min.js',
+    'feather.min.js',
+]
+body_js_files = [
+    'MDB-Free_4.13.0/js/jquery.min.js',
+    'MDB-Free_4.13.0/js/popper.min.js',
+    'MDB-Free_4.13.0/js/bootstrap.js',
+    'MDB-Free_4.13.0/js/mdb.min.js',
+    'MDB-Free_4.13.0/js/addons/datatables.min.js',
+    'chart.umd.min.js',
+    'moment.min.js',
+    'timeline/js/timeline.min.js',
+    'garmin-functions.js',
+    'chat.js',
+]
+# Not bundled: the dark mode switch runs where the page includes it, the logo is an image
+plain_files = ['dark-mode-switch.js', 'logo.jpg']
+
+image_types = {'.png': 'image/png', '.svg': 'image/svg+xml', '.jpg': 'image/jpeg', '.gif': 'image/gif'}
+css_url_re = re.compile(rb'url\((["\']?)([^)"\':]+)\1\)')
+
+def read_asset(name):
+    with open(os.path.join(__location__, name), 'rb') as asset:
+        return asset.read()
+
+@lru_cache(maxsize=None)
+def bundle_hash():
+    '''Hash of the ALEAPP version and of all bundled files'''
+    digest = hashlib.sha256(aleapp_version.encode('utf8'))
+    for name in css_files + head_js_files + body_js_files + plain_files:
+        digest.update(name.encode('utf8'))
+        digest.update(read_asset(name))
+    return digest.hexdigest()[:16]
+
+def bundle_file_names():
+    '''Returns the names of the bundle files (css, head js, body js), as linked from the pages'''
+    asset_hash = bundle_hash()
+    return f'aleapp-{asset_hash}.css', f'aleapp-head-{asset_hash}.js', f'aleapp-body-{asset_hash}.js'
+
+def inline_css_urls(name, css):
+    '''Replaces the relative url()s of a style sheet (small images) by data: urls,
+       as the style sheet no longer sits next to them once bundled'''
+    css_folder = os.path.dirname(name)
+    def to_data_url(match):
+        path = os.path.normpath(os.path.join(css_folder, match.group(2).decode('utf8')))
+        media_type = image_types.get(os.path.splitext(path)[1].lower())
+        if media_type is None or not os.path.exists(os.path.join(__location__, path)):
+            return match.group(0)
+        return b'url(data:' + media_type.encode('ascii') + b';base64,' + base64.b64encode(read_asset(path)) + b')'
+    return css_url_re.sub(to_data_url, css)
+
+def build_bundle(store_folder):
+    '''Builds the bundle in store_folder, unless it is already there. Returns its folder'''
+    bundle_folder = os.path.join(store_folder, bundle_hash())
+    css_name, head_js_name, body_js_name = bundle_file_names()
+    contents = {
+        css_name: lambda: b'\n'.join(inline_css_urls(name, read_asset(name)) for name in css_files),
+        # a script can end with a comment or without a semicolon
+        head_js_name: lambda: b'\n;\n'.join(read_asset(name) for name in head_js_files),
+        body_js_name: lambda: b'\n;\n'.join(read_asset(name) for name in body_js_files),
+    }
+    contents.update({name: (lambda name=name: read_asset(name)) for name in plain_files})
+    os.makedirs(bundle_folder, exist_ok=True)
+    for name, content in contents.items():
+        path = os.path.join(bundle_folder, name)
+        if os.path.exists(path):
+            continue
+        # written under a temporary name first, another run may be building the same bundle
+        handle, temp_path = tempfile.mkstemp(dir=bundle_folder)
+        with os.fdopen(handle, 'wb') as bundle_file:
+            bundle_file.write(content())
+        os.chmod(temp_path, 0o644) # mkstemp makes it private
+        os.replace(temp_path, path)
+    return bundle_folder
+
+def install_bundle(elements_folder, store_folder):
+    '''Puts the bundle files in elements_folder, as hard links to the store when
+       possible, otherwise as copies'''
+    bundle_folder = build_bundle(store_folder)
+    os.makedirs(elements_folder, exist_ok=True)
+    for name in bundle_file_names() + tuple(plain_files):
+        source, target = os.path.join(bundle_folder, name), os.path.join(elements_folder, name)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
@@ -0,0 +1,344 @@
+"""
+Copyright 2021-2022, CCL Forensics
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import base64
+import enum
+import mmap
+import os
+import struct
+import sys
+import typing
+import xml.etree.ElementTree as etree
+
+__version__ = "0.3.0"
+__description__ = "Python module to convert Android ABX binary XML files"
+__contact__ = "Alex Caithness"
+
+# See: base/core/java/com/android/internal/util/BinaryXmlSerializer.java
+
+MAGIC = b"ABX\x00"
+
+
+class AbxDecodeError(Exception):
+    pass
+
+
+class XmlType(enum.IntEnum):
+    # These first constants are from: libcore/xml/src/main/java/org/xmlpull/v1/XmlPullParser.java
+    # most of them are unused, but here for completeness
+    START_DOCUMENT = 0
+    END_DOCUMENT = 1
+    START_TAG = 2
+    END_TAG = 3
+    TEXT = 4
+    CDSECT = 5
+    ENTITY_REF = 6
+    IGNORABLE_WHITESPACE = 7
+    PROCESSING_INSTRUCTION = 8
+    COMMENT = 9
+    DOCDECL = 10
+
+    ATTRIBUTE = 15
+
+
+class DataType(enum.IntEnum):
+    TYPE_NULL = 1 << 4
+    TYPE_STRING = 2 << 4
+    TYPE_STRING_INTERNED = 3 << 4
+    TYPE_BYTES_HEX = 4 << 4
+    TYPE_BYTES_BASE64 = 5 << 4
+    TYPE_INT = 6 << 4
+    TYPE_INT_HEX = 7 << 4
+    TYPE_LONG = 8 << 4
+    TYPE_LONG_HEX = 9 << 4
+    TYPE_FLOAT = 10 << 4
+    TYPE_DOUBLE = 11 << 4
+    TYPE_BOOLEAN_TRUE = 12 << 4
+    TYPE_BOOLEAN_FALSE = 13 << 4
+
+
+# Events of iter_events: (event, name, value)
+START = "start"  # (START, tag name, None)
+ATTRIBUTE = "attr"  # (ATTRIBUTE, attribute name, value)
+TEXT = "text"  # (TEXT, None, text)
+END = "end"  # (END, tag name, None)
+
+_SHORT = struct.Struct(">h")
+_INT = struct.Struct(">i")
+_LONG = struct.Struct(">q")
+_FLOAT = struct.Struct(">f")
+_DOUBLE = struct.Struct(">d")
+
+# plain ints for the decoding loop
+_START_DOCUMENT, _END_DOCUMENT, _START_TAG, _END_TAG, _TEXT, _ATTRIBUTE = (
+    XmlType.START_DOCUMENT.value, XmlType.END_DOCUMENT.value, XmlType.START_TAG.value, XmlType.END_TAG.value,
+    XmlType.TEXT.value, XmlType.ATTRIBUTE.value)
+_TYPE_NULL, _TYPE_STRING, _TYPE_STRING_INTERNED, _TYPE_BYTES_HEX, _TYPE_BYTES_BASE64, _TYPE_INT, _TYPE_INT_HEX, \
+    _TYPE_LONG, _TYPE_LONG_HEX, _TYPE_FLOAT, _TYPE_DOUBLE, _TYPE_BOOLEAN_TRUE, _TYPE_BOOLEAN_FALSE = (
+        data_type.value for data_type in DataType)
+
+
+def iter_events(data: typing.Union[bytes, bytearray, memoryview, mmap.mmap], *,
+                is_multi_root=False) -> typing.Iterator[typing.Tuple[str, typing.Optional[str], typing.Any]]:
+    """
+    Decodes ABX data into a stream of (event, name, value) tuples: (START, tag, None), (ATTRIBUTE, name, value),
+    (TEXT, None, text) and (END, tag, None), without building a document.
+    Attribute values are str, int, float or None as encoded; booleans are "true" / "false", bytes are hex or base64
+    strings.
+    :param data: the whole ABX file (bytes, or a memory map of the file)
+    :param is_multi_root: allow more than one root element
+    """
+    data_length = len(data)
+    if data_length < len(MAGIC):
+        raise ValueError("couldn't read enough data at offset: 0")
+    if data[0:len(MAGIC)] != MAGIC:
+        raise ValueError(f"Invalid magic. Expected {MAGIC.hex()}; got: {bytes(data[0:len(MAGIC)]).hex()}")
+
+    short_from = _SHORT.unpack_from
+    interned_strings = []
+
+    def read_string_raw(pos):
+        length, = short_from(data, pos)
+        if length < 0:
+            raise ValueError(f"Negative string length at offset {pos}")
+        end = pos + 2 + length
+        if end > data_length:
+            raise ValueError(f"couldn't read enough data at offset: {pos + 2}")
+        return str(data[pos + 2:end], "utf-8"), end
+
+    def read_interned_string(pos):
+        reference, = short_from(data, pos)
+        if reference == -1:
+            value, pos = read_string_raw(pos + 2)
+            interned_strings.append(value)
+            return value, pos
+        return interned_strings[reference], pos + 2
+
+    # open elements: [tag name, names of its attributes (or None)]
+    element_stack = []
+    root_closed = False
+    pos = len(MAGIC)
+
+    try:
+        while pos < data_length:
+            # Read the token. This gives us the XML data type and the raw data type.
+            token = data[pos]
+            pos += 1
+            data_start_offset = pos
+
+            # The lower nibble gives us the XML type. This is mostly defined in XmlPullParser.java, other than
+            # ATTRIBUTE which is from BinaryXmlSerializer
+            xml_type = token & 0x0f
+            if xml_type == _ATTRIBUTE:
+                if not element_stack:
+                    raise AbxDecodeError(f"ATTRIBUTE without any elements left at offset {data_start_offset}")
+
+                attribute_name, pos = read_interned_string(pos)
+
+                element = element_stack[-1]
+                if element[1] is None:
+                    element[1] = {attribute_name}
+                elif attribute_name in element[1]:
+                    raise AbxDecodeError(f"ATTRIBUTE name already in target element at offset {data_start_offset}")
+                else:
+                    element[1].add(attribute_name)
+
+                data_type = token & 0xf0
+
+                if data_type == _TYPE_STRING_INTERNED:
+                    value, pos = read_interned_string(pos)
+                elif data_type == _TYPE_STRING:
+                    value, pos = read_string_raw(pos)
+                elif data_type == _TYPE_INT:
+                    value, = _INT.unpack_from(data, pos)
+                    pos += 4
+                elif data_type == _TYPE_BOOLEAN_TRUE:
+                    value = "true"
+                elif data_type == _TYPE_BOOLEAN_FALSE:
+                    value = "false"
+                elif data_type == _TYPE_LONG:
+                    value, = _LONG.unpack_from(data, pos)
+                    pos += 8
+                elif data_type == _TYPE_NULL:
+                    value = None
+                elif data_type == _TYPE_INT_HEX:
+                    value = f"{_INT.unpack_from(data, pos)[0]:x}"
+                    pos += 4
+                elif data_type == _TYPE_LONG_HEX:
+                    value = f"{_LONG.unpack_from(data, pos)[0]:x}"
+                    pos += 8
+                elif data_type == _TYPE_FLOAT:
+                    value, = _FLOAT.unpack_from(data, pos)
+                    pos += 4
+                elif data_type == _TYPE_DOUBLE:
+                    value, = _DOUBLE.unpack_from(data, pos)
+                    pos += 8
+                elif data_type == _TYPE_BYTES_HEX or data_type == _TYPE_BYTES_BASE64:
+                    length, = short_from(data, pos)  # is this safe?
+                    end = pos + 2 + length
+                    if end > data_length:
+                        raise ValueError(f"couldn't read enough data at offset: {pos + 2}")
+                    raw = bytes(data[pos + 2:end])
+                    pos = end
+                    if data_type == _TYPE_BYTES_HEX:
+                        value = raw.hex()
+                    else:
+                        value = base64.encodebytes(raw).decode().strip()
+                else:
+                    raise AbxDecodeError(f"Unexpected attribute datatype at offset: {data_start_offset}")
+
+                yield ATTRIBUTE, attribute_name, value
+
+            elif xml_type == _START_TAG:
+                if token & 0xf0 != _TYPE_STRING_INTERNED:
+                    raise AbxDecodeError(f"START_TAG with an invalid data type at offset {data_start_offset - 1}")
+                if root_closed:
+                    raise AbxDecodeError(
+                        f"START_TAG after root was closed started at offset {data_start_offset - 1}")
+
+                tag_name, pos = read_interned_string(pos)
+                element_stack.append([tag_name, None])
+                yield START, tag_name, None
+
+            elif xml_type == _END_TAG:
+                if token & 0xf0 != _TYPE_STRING_INTERNED:
+                    raise AbxDecodeError(f"END_TAG with an invalid data type at offset {data_start_offset}")
+                if not element_stack:
+                    raise AbxDecodeError(f"END_TAG without any elements left at offset {data_start_offset}")
+
+                tag_name, pos = read_interned_string(pos)
+                if element_stack[-1][0] != tag_name:
+                    raise AbxDecodeError(
+                        f"Unexpected END_TAG name at {data_start_offset}. "
+                        f"Expected: {element_stack[-1][0]}; got: {tag_name}")
+
+                element_stack.pop()
+                if not element_stack and not is_multi_root:
+                    root_closed = True
+                yield END, tag_name, None
+
+            elif xml_type == _TEXT:
+                value, pos = read_string_raw(pos)
+                yield TEXT, None, value
+
+            elif xml_type == _START_DOCUMENT:
+                # Since Android 13, START_DOCUMENT can essentially be considered no-op as it's implied by the reader to
+                # always be present (regardless of whether it is).
+                if token & 0xf0 != _TYPE_NULL:
+                    raise AbxDecodeError(
+                        f"START_DOCUMENT with an invalid data type at offset {data_start_offset - 1}")
+
+            elif xml_type == _END_DOCUMENT:
+                if token & 0xf0 != _TYPE_NULL:
+                    raise AbxDecodeError(
+                        f"END_DOCUMENT with an invalid data type at offset {data_start_offset - 1}")
+                if element_stack:
+                    raise AbxDecodeError(f"END_DOCUMENT with unclosed elements at offset {data_start_offset - 1}")
+                break
+
+            else:
+                raise NotImplementedError(f"unexpected XML type: {xml_type}")
+    except struct.error:
+        raise ValueError(f"couldn't read enough data at offset: {pos}")
+
+    if element_stack or not (root_closed or is_multi_root):
+        raise AbxDecodeError("Elements still in the stack when completing the document")
+
+
+def build_tree(data: typing.Union[bytes, bytearray, memoryview, mmap.mmap], *,
+               is_multi_root=False) -> etree.ElementTree:
+    """
+    Read ABX data into an ElementTree
+    :param data: the whole ABX file (bytes, or a memory map of the file)
+    :param is_multi_root: some xml files on Android contain multiple root elements making reading them using a
+    document model problematic. For these files, set is_multi_root to True and the output ElementTree will wrap
+    the elements in a single "root" element.
+    :return: ElementTree representation of the data.
+    """
+    root = None
+    element_stack = []  # because ElementTree doesn't support parents we maintain a stack
+    if is_multi_root:
+        root = etree.Element("root")
+        element_stack.append(root)
+
+    for event, name, value in iter_events(data, is_multi_root=is_multi_root):
+        if event is ATTRIBUTE:
+            element_stack[-1].set(name, str(value))
+        elif event is START:
+            if element_stack:
+                element_stack.append(etree.SubElement(element_stack[-1], name))
+            else:
+                root = etree.Element(name)
+                element_stack.append(root)
+        elif event is END:
+            element_stack.pop()
+        else:
+            element = element_stack[-1]
+            if len(element):
+                if len(value.strip()) == 0:  # layout whitespace can be safely discarded
+                    continue
+                raise NotImplementedError("Can't deal with elements with mixed text and element contents")
+
+            if element.text is None:
+                element.text = value
+            else:
+                element.text += value
+
+    if root is None:
+        raise AbxDecodeError("Document was never assigned a root element")
+
+    return etree.ElementTree(root)
+
+
+class AbxReader:
+    MAGIC = MAGIC
+
+    def __init__(self, stream: typing.BinaryIO):
+        self._stream = stream
+
+    def read(self, *, is_multi_root=False) -> etree.ElementTree:
+        """
+        Read the ABX file (see build_tree)
+        """
+        return build_tree(self._stream.read(), is_multi_root=is_multi_root)
+
+
+def read_file(path: typing.Union[str, os.PathLike], *, is_multi_root=False) -> etree.ElementTree:
+    """
+    Read an ABX file into an ElementTree, decoding it from a memory map of the file
+    """
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):  # empty, or can't be mapped
+            return build_tree(f.read(), is_multi_root=is_multi_root)
+        with data:
+            return build_tree(data, is_multi_root=is_multi_root)
+
+
+def main(args):
+    tree = read_file(args[0], is_multi_root=len(args) > 1 and args[1] == "-mr")
+    print(etree.tostring(tree.getroot()).decode())
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
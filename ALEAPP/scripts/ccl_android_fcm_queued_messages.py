@@ -29,6 +29,7 @@ import typing
 import dataclasses
 import scripts.ccl_leveldb as ccl_leveldb
 import scripts.ccl_protobuff as ccl_protobuff
+from scripts.ilapfuncs import logfunc
 
 
 __version__ = "1.0"
@@ -71,35 +72,116 @@ class FcmRecord:
     is_deleted: bool
 
 
-class FcmIterator:
+class FcmStore:
+    """
+    The decoded records of a fcm_queued_messages.ldb leveldb, indexed by package. The leveldb is read and decoded
+    once per run (see load_fcm_store), every FCM artifact then takes its slice of the records. Records that can't be
+    decoded are left out, their keys and errors are in skipped_records.
+    """
     EPOCH = datetime.datetime(1970, 1, 1)
 
     def __init__(self, db_path: os.PathLike):
-        self._db = ccl_leveldb.RawLevelDb(db_path)
-        # Pre-populate a list of deleted keys, although that's likely to be all of them really...
-        self._deleted_keys = frozenset(
-            rec.key for rec in self._db.iterate_records_raw() if rec.state == ccl_leveldb.KeyState.Deleted)
+        self.records = []
+        self.packages = {}
+        self.skipped_records = []
+        with ccl_leveldb.RawLevelDb(db_path) as db:
+            # Deleted keys are collected in the same pass, although that's likely to be all of them really...
+            deleted_keys = set()
+            live_records = []
+            for rec in db.iterate_records_raw():
+                if rec.state == ccl_leveldb.KeyState.Deleted:
+                    deleted_keys.add(rec.key)
+                else:
+                    live_records.append(rec)
+
+            for rec in live_records:
+                try:
+                    record = self._decode(rec, rec.key in deleted_keys)
+                except Exception as ex:
+                    # one corrupt record shouldn't lose the others, for any of the FCM artifacts
+                    self.skipped_records.append((rec.key, ex))
+                    continue
+                self.records.append(record)
+                self.packages.setdefault(record.package, []).append(record)
+
+    @staticmethod
+    def _decode(rec: ccl_leveldb.Record, is_deleted: bool) -> FcmRecord:
+        with io.BytesIO(rec.value) as value_f:
+            # Todo: go back to ccl_protobuff and have it return objects at the top level?
+            value_obj = ccl_protobuff.ProtoObject(
+                0x02, None, ccl_protobuff.read_protobuff(value_f, FCM_PROTOBUFF_STRUCTURE))
+
+        package = value_obj[0x12][0][0x2A][0].value
+        key_values = {x[0x0A][0].value: x[0x12][0].value for x in value_obj[0x12][0][0x3A]}
+        key = rec.key[0:-8].decode("utf-8")
+
+        timestamp_raw = int(key.split(":", 1)[1].split("%", 1)[0])
+        timestamp = FcmStore.EPOCH + datetime.timedelta(microseconds=timestamp_raw)
+
+        return FcmRecord(key, timestamp, package, key_values, rec.origin_file, is_deleted)
+
+    def records_for_package(self, package: str) -> typing.List[FcmRecord]:
+        """Records of a package, in leveldb order"""
+        return self.packages.get(package, [])
+
+
+# Stores of this run, by leveldb folder, with the names, sizes and modification times of its files when decoded.
+# A leveldb that couldn't be read has the exception instead of the store, so that it's only tried once.
+_fcm_stores = {}
+
+
+def load_fcm_store(db_path: os.PathLike) -> FcmStore:
+    """Returns the FcmStore of the leveldb in db_path, decoding it only if it wasn't already (or changed since)"""
+    db_path = pathlib.Path(db_path).resolve()
+    state = tuple(sorted((entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+                         for entry in os.scandir(db_path) if entry.is_file()))
+    cached = _fcm_stores.get(db_path)
+    if cached is not None and cached[0] == state:
+        if isinstance(cached[1], Exception):
+            raise cached[1]
+        return cached[1]
+    try:
+        store = FcmStore(db_path)
+    except Exception as ex:
+        _fcm_stores[db_path] = (state, ex)
+        raise
+    _fcm_stores[db_path] = (state, store)
+    if store.skipped_records:
+        key, ex = store.skipped_records[0]
+        logfunc(f'{len(store.skipped_records)} records of {db_path} could not be decoded and were skipped, '
+                f'the first ({key!r}) with error: {ex}')
+    return store
+
+
+def clear_fcm_stores():
+    """Drops the stores decoded during the run, called when the artifacts are done"""
+    _fcm_stores.clear()
 
-    def __iter__(self) -> typing.Iterable[FcmRecord]:
-        for rec in self._db.iterate_records_raw():
-            if rec.state == ccl_leveldb.KeyState.Deleted:
-                continue
-            with io.BytesIO(rec.value) as value_f:
-                # Todo: go back to ccl_protobuff and have it return objects at the top level?
-                value_obj = ccl_protobuff.ProtoObject(
-                    0x02, None, ccl_protobuff.read_protobuff(value_f, FCM_PROTOBUFF_STRUCTURE))
 
-            package = value_obj[0x12][0][0x2A][0].value
-            key_values = {x[0x0A][0].value: x[0x12][0].value for x in value_obj[0x12][0][0x3A]}
-            key = rec.key[0:-8].decode("utf-8")
+class FcmIterator:
+    EPOCH = FcmStore.EPOCH
 
-            timestamp_raw = int(key.split(":", 1)[1].split("%", 1)[0])
-            timestamp = FcmIterator.EPOCH + datetime.timedelta(microseconds=timestamp_raw)
+    def __init__(self, db_path: os.PathLike, package: typing.Optional[str] = None):
+        """Iterates the records of the leveldb in db_path, or only those of package, from its FcmStore"""
+        self._store = load_fcm_store(db_path)
+        self._package = package
 
-            yield FcmRecord(key, timestamp, package, key_values, rec.origin_file, rec.key in self._deleted_keys)
+    def __iter__(self) -> typing.Iterable[FcmRecord]:
+        if self._store is None:
+            raise ValueError("Iterating a closed FcmIterator")
+        if self._package is None:
+            yield from self._store.records
+        else:
+            yield from self._store.records_for_package(self._package)
+
+    @property
+    def skipped_records(self) -> typing.List[typing.Tuple[bytes, Exception]]:
+        """Keys of the records that couldn't be decoded, with their errors"""
+        return self._store.skipped_records
 
     def close(self):
-        self._db.close()
+        """Releases the store, the leveldb itself is closed once it's decoded"""
+        self._store = None
 
     def __enter__(self):
         return self
@@ -25,10 +25,12 @@ import struct
 import re
 import os
 import io
+import mmap
+import bisect
 import pathlib
 import dataclasses
 import enum
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 from types import MappingProxyType
 
 import scripts.ccl_simplesnappy as ccl_simplesnappy
@@ -70,6 +72,35 @@ def read_le_varint(stream: typing.BinaryIO, *, is_google_32bit=False) -> typing.
         return x[0]
 
 
+def _decode_le_varint(data: bytes, pos: int, *, is_google_32bit=False) -> typing.Tuple[int, int]:
+    """Decode a varint at pos in data, returns the (unsigned) value and the position after the varint.
+    Can be switched to limit the varint to 32 bit."""
+    tmp = data[pos]
+    if tmp < 0x80:
+        return tmp, pos + 1
+    result = 0
+    limit = 5 if is_google_32bit else 10
+    for i in range(limit):
+        tmp = data[pos + i]
+        result |= ((tmp & 0x7f) << (i * 7))
+        if (tmp & 0x80) == 0:
+            return result, pos + i + 1
+    return result, pos + limit
+
+
+def _key_range_end(prefix: bytes) -> typing.Optional[bytes]:
+    """Returns the first key after all the keys starting with prefix (None if there is no such key)"""
+    prefix = prefix.rstrip(b"\xff")
+    if not prefix:
+        return None
+    return prefix[:-1] + bytes([prefix[-1] + 1])
+
+
+def _user_key(key: bytes) -> bytes:
+    """User key of an internal key from a table file (see Record.user_key)"""
+    return key if len(key) < 8 else key[0:-8]
+
+
 def read_length_prefixed_blob(stream: typing.BinaryIO):
     length = read_le_varint(stream)
     data = stream.read(length)
@@ -174,35 +205,41 @@ class Block:
         return self.get_restart_offset(0)
 
     def __iter__(self) -> typing.Iterable[RawBlockEntry]:
+        raw = self._raw
+        restart_array_offset = self._restart_array_offset
         offset = self.get_first_entry_offset()
-        with io.BytesIO(self._raw) as buff:
-            buff.seek(offset)
+        pos = offset
 
-            key = b""
+        key = b""
 
-            while buff.tell() < self._restart_array_offset:
-                start_offset = buff.tell()
-                shared_length = read_le_varint(buff, is_google_32bit=True)
-                non_shared_length = read_le_varint(buff, is_google_32bit=True)
-                value_length = read_le_varint(buff, is_google_32bit=True)
+        while pos < restart_array_offset:
+            start_offset = pos
+            shared_length, pos = _decode_le_varint(raw, pos, is_google_32bit=True)
+            non_shared_length, pos = _decode_le_varint(raw, pos, is_google_32bit=True)
+            value_length, pos = _decode_le_varint(raw, pos, is_google_32bit=True)
 
-                # sense check
-                if offset >= self._restart_array_offset:
-                    raise ValueError("Reading start of entry past the start of restart array")
-                if shared_length > len(key):
-                    raise ValueError("Shared key length is larger than the previous key")
+            # sense check
+            if offset >= restart_array_offset:
+                raise ValueError("Reading start of entry past the start of restart array")
+            if shared_length > len(key):
+                raise ValueError("Shared key length is larger than the previous key")
 
-                key = key[:shared_length] + buff.read(non_shared_length)
-                value = buff.read(value_length)
+            key = key[:shared_length] + raw[pos:pos + non_shared_length]
+            pos += non_shared_length
+            value = raw[pos:pos + value_length]
+            pos += value_length
 
-                yield RawBlockEntry(key, value, start_offset)
+            yield RawBlockEntry(key, value, start_offset)
 
 
 class LdbFile:
-    """A leveldb table (.ldb or .sst) file."""
+    """A leveldb table (.ldb or .sst) file.
+    The file is memory mapped; the index block is only read when records are first needed. Blocks read for key range
+    queries are kept in a small LRU cache."""
     BLOCK_TRAILER_SIZE = 5
     FOOTER_SIZE = 48
     MAGIC = 0xdb4775248b80fb57
+    BLOCK_CACHE_SIZE = 64
 
     def __init__(self, file: pathlib.Path):
         if not file.exists():
@@ -212,6 +249,10 @@ class LdbFile:
         self.file_no = int(file.stem, 16)
 
         self._f = file.open("rb")
+        try:
+            self._map = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):  # empty, or can't be mapped: read it instead
+            self._map = None
         self._f.seek(-LdbFile.FOOTER_SIZE, os.SEEK_END)
 
         self._meta_index_handle = BlockHandle.from_stream(self._f)
@@ -221,7 +262,15 @@ class LdbFile:
         if magic != LdbFile.MAGIC:
             raise ValueError(f"Invalid magic number in {file}")
 
-        self._index = self._read_index()
+        self._index = None
+        self._index_user_keys = None
+        self._block_cache = OrderedDict()
+
+    def _read(self, offset: int, length: int) -> bytes:
+        if self._map is not None:
+            return self._map[offset:offset + length]
+        self._f.seek(offset)
+        return self._f.read(length)
 
     def _read_block(self, handle: BlockHandle):
         # block is the size in the blockhandle plus the trailer
@@ -230,29 +279,45 @@ class LdbFile:
         # 0    1     CompressionType (0 = none, 1 = snappy)
         # 1    4     CRC32
 
-        self._f.seek(handle.offset)
-        raw_block = self._f.read(handle.length)
-        trailer = self._f.read(LdbFile.BLOCK_TRAILER_SIZE)
+        raw_block = self._read(handle.offset, handle.length)
+        trailer = self._read(handle.offset + handle.length, LdbFile.BLOCK_TRAILER_SIZE)
 
         if len(raw_block) != handle.length or len(trailer) != LdbFile.BLOCK_TRAILER_SIZE:
             raise ValueError(f"Could not read all of the block at offset {handle.offset} in file {self.path}")
 
         is_compressed = trailer[0] != 0
         if is_compressed:
-            with io.BytesIO(raw_block) as buff:
-                raw_block = ccl_simplesnappy.decompress(buff)
+            raw_block = ccl_simplesnappy.decompress_bytes(raw_block)
 
         return Block(raw_block, is_compressed, self, handle.offset)
 
+    def _get_block(self, handle: BlockHandle) -> Block:
+        """_read_block, through the block cache"""
+        block = self._block_cache.get(handle.offset)
+        if block is not None:
+            self._block_cache.move_to_end(handle.offset)
+            return block
+        block = self._block_cache[handle.offset] = self._read_block(handle)
+        if len(self._block_cache) > LdbFile.BLOCK_CACHE_SIZE:
+            self._block_cache.popitem(last=False)
+        return block
+
+    def _get_index(self) -> typing.Tuple[typing.Tuple[bytes, BlockHandle], ...]:
+        if self._index is None:
+            self._index = self._read_index()
+            self._index_user_keys = [_user_key(key) for key, handle in self._index]
+        return self._index
+
     def _read_index(self) -> typing.Tuple[typing.Tuple[bytes, BlockHandle], ...]:
         index_block = self._read_block(self._index_handle)
-        # key is earliest key, value is BlockHandle to that data block
+        # key is at least the last key of the block (and before the first key of the next one),
+        # value is BlockHandle to that data block
         return tuple((entry.key, BlockHandle.from_bytes(entry.value))
                      for entry in index_block)
 
     def __iter__(self) -> typing.Iterable[Record]:
         """Iterate Records in this Table file"""
-        for block_key, handle in self._index:
+        for block_key, handle in self._get_index():
             block = self._read_block(handle)
             for entry in block:
                 yield Record.ldb_record(
@@ -260,7 +325,37 @@ class LdbFile:
                     block.offset if block.was_compressed else block.offset + entry.block_offset,
                     block.was_compressed)
 
+    def iterate_range(self, start: bytes, end: typing.Optional[bytes] = None, *,
+                      ordered=True) -> typing.Iterable[Record]:
+        """Iterate Records in this Table file with a user key from start up to (not including) end.
+        If the keys are ordered bytewise (the default comparator) only the blocks which can hold these keys are
+        read, found by a binary search of the index; otherwise (ordered=False) every block is read."""
+        if not ordered:
+            for record in self:
+                if start <= record.user_key and (end is None or record.user_key < end):
+                    yield record
+            return
+
+        index = self._get_index()
+        # the keys of a block are at most its index key, so the first block with an index key from start on is the
+        # first block that can hold keys from start on.
+        first_block = bisect.bisect_left(self._index_user_keys, start)
+        for block_key, handle in index[first_block:]:
+            block = self._get_block(handle)
+            for entry in block:
+                user_key = _user_key(entry.key)
+                if end is not None and user_key >= end:
+                    return
+                if user_key >= start:
+                    yield Record.ldb_record(
+                        entry.key, entry.value, self.path,
+                        block.offset if block.was_compressed else block.offset + entry.block_offset,
+                        block.was_compressed)
+
     def close(self):
+        self._block_cache.clear()
+        if self._map is not None:
+            self._map.close()
         self._f.close()
 
 
@@ -285,6 +380,8 @@ class LogFile:
         self.file_no = int(file.stem, 16)
 
         self._f = file.open("rb")
+        self._records_by_key = None
+        self._record_keys = None
 
     def _get_raw_blocks(self) -> typing.Iterable[bytes]:
         self._f.seek(0)
@@ -366,6 +463,17 @@ class LogFile:
 
                     yield Record.log_record(key, value, seq + i, state, self.path, start_offset)
 
+    def iterate_range(self, start: bytes, end: typing.Optional[bytes] = None, *,
+                      ordered=True) -> typing.Iterable[Record]:
+        """Iterate Records in this Log file with a key from start up to (not including) end, in key order.
+        Log files aren't ordered: the records are read and sorted by key once, on the first query."""
+        if self._records_by_key is None:
+            self._records_by_key = sorted(self, key=lambda record: record.key)
+            self._record_keys = [record.key for record in self._records_by_key]
+        first = bisect.bisect_left(self._record_keys, start)
+        last = len(self._record_keys) if end is None else bisect.bisect_left(self._record_keys, end)
+        yield from self._records_by_key[first:last]
+
     def close(self):
         self._f.close()
 
@@ -474,8 +582,11 @@ class ManifestFile:
         self._f = path.open("rb")
         self.path = path
 
+        self.comparator = None
         self.file_to_level = {}
         for edit in self:
+            if edit.comparator is not None:
+                self.comparator = edit.comparator
             if edit.new_files:
                 for nf in edit.new_files:
                     self.file_to_level[nf.file_no] = nf.level
@@ -538,6 +649,7 @@ class ManifestFile:
 
 class RawLevelDb:
     DATA_FILE_PATTERN = r"[0-9]{6}\.(ldb|log|sst)"
+    BYTEWISE_COMPARATOR = "leveldb.BytewiseComparator"
 
     def __init__(self, in_dir: os.PathLike):
 
@@ -570,10 +682,47 @@ class RawLevelDb:
     def in_dir_path(self) -> pathlib.Path:
         return self._in_dir
 
+    @property
+    def is_bytewise(self) -> bool:
+        """True if the manifest shows that keys are ordered by the default (bytewise) comparator, which key range
+        queries rely on to only read the table blocks they need"""
+        return self.manifest is not None and self.manifest.comparator in (None, RawLevelDb.BYTEWISE_COMPARATOR)
+
     def iterate_records_raw(self, *, reverse=False) -> typing.Iterable[Record]:
         for file_containing_records in sorted(self._files, reverse=reverse, key=lambda x: x.file_no):
             yield from file_containing_records
 
+    def iterate_records_range(self, start: bytes, end: typing.Optional[bytes] = None, *,
+                              reverse=False) -> typing.Iterable[Record]:
+        """As iterate_records_raw, for the records with a user key from start up to (not including) end"""
+        ordered = self.is_bytewise
+        for file_containing_records in sorted(self._files, reverse=reverse, key=lambda x: x.file_no):
+            yield from file_containing_records.iterate_range(start, end, ordered=ordered)
+
+    def _resolve(self, records: typing.Iterable[Record], include_deleted: bool) -> typing.Iterable[Record]:
+        """Keeps the newest record (highest sequence number) of each user key, in user key order. Keys whose newest
+        record is a deletion are left out, unless include_deleted is set."""
+        newest = {}
+        for record in records:
+            current = newest.get(record.user_key)
+            if current is None or record.seq > current.seq:
+                newest[record.user_key] = record
+        for user_key in sorted(newest):
+            record = newest[user_key]
+            if include_deleted or record.state != KeyState.Deleted:
+                yield record
+
+    def iterate_prefix(self, prefix: bytes, *, include_deleted=False) -> typing.Iterable[Record]:
+        """Iterate the current record of each user key starting with prefix, across all the log and table files
+        (so all levels), in user key order"""
+        return self._resolve(self.iterate_records_range(prefix, _key_range_end(prefix)), include_deleted)
+
+    def get(self, key: bytes) -> typing.Optional[Record]:
+        """Returns the current record of a user key, or None if there is none or it was deleted"""
+        for record in self._resolve(self.iterate_records_range(key, key + b"\x00"), False):
+            return record
+        return None
+
     def close(self):
         for file in self._files:
             file.close()
@@ -24,6 +24,8 @@ import sys
 import struct
 import io
 
+from scripts.protobuf_wire import read_varint
+
 __version__ = "0.6"
 __description__ = "Module for naive parsing of Protocol Buffers"
 __contact__ = "Alex Caithness"
@@ -130,17 +132,34 @@ def read_tag(stream, tag_mappings, log_out=sys.stderr):
     return ProtoObject(tag_id, name, tag_value)  # tag_id, tag_value
 
 
-def read_protobuff(stream, tag_mappings):
+def _read_protobuff_data(data, tag_mappings, log_out=sys.stderr):
+    # read_tag() over data (bytes) until it ends, fields are located by their offsets
+    # and only copied to a stream when they have a decoder
     result = []
+    pos = 0
     while True:
-        tag = read_tag(stream, tag_mappings)
-        if tag is None:
+        tag_id, pos = read_varint(data, pos, max_length=10)
+        if tag_id is None:
             break
-        result.append(tag)
+        decoder = tag_mappings.get(tag_id)
+        name = None
+        if isinstance(decoder, ProtoDecoder):
+            name = decoder.object_name
+
+        end = _get_end_for_wiretype(tag_id, data, pos)
+        tag_value = decoder(io.BytesIO(data[pos:end])) if decoder else _fallback_decode_data(
+            tag_id, data, pos, end, log_out)
+        pos = end
+
+        result.append(ProtoObject(tag_id, name, tag_value))
 
     return result
 
 
+def read_protobuff(stream, tag_mappings):
+    return _read_protobuff_data(stream.read(), tag_mappings)
+
+
 def read_blob(stream):
     blob_length = read_le_varint(stream)
     blob = stream.read(blob_length)
@@ -167,8 +186,7 @@ def read_int(stream):
 
 def read_embedded_protobuf(stream, mappings):
     blob_blob = read_blob(stream)
-    blob_stream = io.BytesIO(blob_blob)
-    return read_protobuff(blob_stream, mappings)
+    return _read_protobuff_data(blob_blob, mappings)
 
 
 def read_fixed_blob(stream, length):
@@ -219,6 +237,48 @@ def _get_bytes_for_wiretype(tag_id, stream):
     return buffer
 
 
+def _get_end_for_wiretype(tag_id, data, pos):
+    # end of the bytes _get_bytes_for_wiretype() reads from data at pos
+    wire_type = tag_id & 0x07
+    if wire_type == 0:
+        value, end = read_varint(data, pos, max_length=10)
+        if value is None:
+            raise IndexError("index out of range")
+    elif wire_type == 1:
+        end = min(pos + 8, len(data))
+    elif wire_type == 2:
+        l, pos = read_varint(data, pos, max_length=10)
+        if l is None:
+            raise TypeError("cannot unpack non-iterable NoneType object")
+        end = pos + l
+        if end > len(data):
+            if l > sys.maxsize:
+                raise OverflowError("cannot fit 'int' into an index-sized integer")
+            raise ValueError("Stream too short")
+    elif wire_type == 5:
+        end = min(pos + 4, len(data))
+    else:
+        raise ValueError("Invalid wiretype")
+
+    return end
+
+
+def _fallback_decode_data(tag_id, data, pos, end, log):
+    # _fallback_decode() of data[pos:end]
+    wire_type = tag_id & 0x07
+    if DEBUG:
+        log.write("Tag {0} ({1}) not defined, using fallback decoding.\n".format(
+            tag_id if tag_id > 0x7f else hex(tag_id), _wire_type_friendly_names[wire_type]))
+    if wire_type == 0:
+        return read_varint(data, pos, end, max_length=10)[0]
+    elif wire_type == 2:
+        pos = read_varint(data, pos, end, max_length=10)[1]
+        return data[pos:end]
+    elif end - pos != (8 if wire_type == 1 else 4):
+        raise ValueError("Couldn't read enough data")
+    return data[pos:end]
+
+
 def _fallback_decode(tag_id, stream, log):
     fallback_func = _fallback_wire_types.get(tag_id & 0x07)
     if not fallback_func:
@@ -22,7 +22,6 @@ SOFTWARE.
 
 import sys
 import struct
-import io
 import typing
 import enum
 
@@ -101,92 +100,138 @@ def read_byte(stream: typing.BinaryIO) -> typing.Optional[int]:
     return None
 
 
-def decompress(data: typing.BinaryIO) -> bytes:
-    """Decompresses the snappy compressed data stream"""
-    uncompressed_length = read_le_varint(data)
-    log(f"Uncompressed length: {uncompressed_length}")
+def _read_le_varint_bytes(data: bytes, pos: int) -> typing.Tuple[int, int]:
+    """Reads a varint at pos in data, returns its value and the position after it"""
+    result = 0
+    for i in range(10):
+        tmp = data[pos + i]
+        result |= ((tmp & 0x7f) << (i * 7))
+        if (tmp & 0x80) == 0:
+            return result, pos + i + 1
+    return result, pos + 10
 
-    out = io.BytesIO()
 
-    while True:
-        start_offset = data.tell()
-        log(f"Reading tag at offset {start_offset}")
-        type_byte = read_byte(data)
-        if type_byte is None:
-            break
+# The most an element can expand to: a 3 byte copy of 64 bytes
+MAX_EXPANSION_NUMERATOR, MAX_EXPANSION_DENOMINATOR = 64, 3
+
+
+def _decompress_python(data: typing.Union[bytes, bytearray, memoryview]) -> bytes:
+    """Pure Python decompression of snappy compressed bytes, into an output buffer allocated
+    at the uncompressed length"""
+    try:
+        uncompressed_length, pos = _read_le_varint_bytes(data, 0)
+    except IndexError:
+        raise ValueError("Couldn't read the uncompressed length")
+    if DEBUG:
+        log(f"Uncompressed length: {uncompressed_length}")
+
+    # the length comes from the data, it's not allocated if the elements can't add up to it
+    if uncompressed_length > (len(data) - pos) * MAX_EXPANSION_NUMERATOR // MAX_EXPANSION_DENOMINATOR:
+        raise ValueError(f"Uncompressed length {uncompressed_length} is too large for {len(data)} bytes of data")
+
+    out = bytearray(uncompressed_length)
+    out_pos = 0
+    data_length = len(data)
+
+    try:
+        while pos < data_length:
+            type_byte = data[pos]
+            tag = type_byte & 0x03
+            if DEBUG:
+                log(f"Reading tag at offset {pos}")
+                log(f"Type Byte is {type_byte:02x}")
+                log(f"Element Type is: {ElementType(tag)}")
+            pos += 1
+
+            if tag == ElementType.Literal:
+                length = type_byte >> 2
+                if length < 60:  # embedded in tag
+                    length += 1
+                else:  # 8, 16, 24 or 32 bit
+                    length_size = length - 59
+                    length = 1 + int.from_bytes(data[pos:pos + length_size], "little")
+                    pos += length_size
+                if DEBUG:
+                    log(f"Literal length is {length}")
+
+                if pos + length > data_length:
+                    raise ValueError("Couldn't read enough literal data")
+                out[out_pos:out_pos + length] = data[pos:pos + length]
+                pos += length
+                out_pos += length
 
-        log(f"Type Byte is {type_byte:02x}")
-
-        tag = type_byte & 0x03
-
-        log(f"Element Type is: {ElementType(tag)}")
-
-        if tag == ElementType.Literal:
-            if ((type_byte & 0xFC) >> 2) < 60:  # embedded in tag
-                length = 1 + ((type_byte & 0xFC) >> 2)
-                log(f"Literal length is embedded in type byte and is {length}")
-            elif ((type_byte & 0xFC) >> 2) == 60:  # 8 bit
-                length = 1 + read_byte(data)
-                log(f"Literal length is 8bit and is {length}")
-            elif ((type_byte & 0xFC) >> 2) == 61:  # 16 bit
-                length = 1 + read_uint16(data)
-                log(f"Literal length is 16bit and is {length}")
-            elif ((type_byte & 0xFC) >> 2) == 62:  # 16 bit
-                length = 1 + read_uint24(data)
-                log(f"Literal length is 24bit and is {length}")
-            elif ((type_byte & 0xFC) >> 2) == 63:  # 16 bit
-                length = 1 + read_uint32(data)
-                log(f"Literal length is 32bit and is {length}")
-            else:
-                raise ValueError()  # cannot ever happen
-
-            literal_data = data.read(length)
-            if len(literal_data) < length:
-                raise ValueError("Couldn't read enough literal data")
-
-            out.write(literal_data)
-
-        else:
-            if tag == ElementType.CopyOneByte:
-                length = ((type_byte & 0x1C) >> 2) + 4
-                offset = ((type_byte & 0xE0) << 3) | read_byte(data)
-            elif tag == ElementType.CopyTwoByte:
-                length = 1 + ((type_byte & 0xFC) >> 2)
-                offset = read_uint16(data)
-            elif tag == ElementType.CopyFourByte:
-                length = 1 + ((type_byte & 0xFC) >> 2)
-                offset = read_uint32(data)
             else:
-                raise ValueError()  # cannot ever happen
-
-            if offset == 0:
-                raise ValueError("Offset cannot be 0")
-
-            actual_offset = out.tell() - offset
-            log(f"Current Outstream Length: {out.tell()}")
-            log(f"Backreference length: {length}")
-            log(f"Backreference relative offset: {offset}")
-            log(f"Backreference absolute offset: {actual_offset}")
-
-            # have to read incrementally because you might have to read data that you've just written
-            # this is probably a really slow way of doing this.
-            # for i in range(length):
-            #     out.write(out.getbuffer()[actual_offset + i: actual_offset + i + 1].tobytes())
-            # new method for doing the same:
-            buffer = out.getbuffer()[actual_offset: actual_offset + length].tobytes()
-            condition = (offset - length) <= 0
-            if condition:
-                buffer = (buffer * length)[:length]
-                # better safe than sorry, this way we're sure to extend it
-                # as much as needed without doing some extra calculations
-            out.write(buffer)
-
-    result = out.getvalue()
-    if uncompressed_length != len(result):
+                if tag == ElementType.CopyOneByte:
+                    length = ((type_byte & 0x1C) >> 2) + 4
+                    offset = ((type_byte & 0xE0) << 3) | data[pos]
+                    pos += 1
+                elif tag == ElementType.CopyTwoByte:
+                    length = 1 + (type_byte >> 2)
+                    offset = data[pos] | (data[pos + 1] << 8)
+                    pos += 2
+                else:
+                    length = 1 + (type_byte >> 2)
+                    offset = int.from_bytes(data[pos:pos + 4], "little")
+                    pos += 4
+
+                if offset == 0:
+                    raise ValueError("Offset cannot be 0")
+                if offset > out_pos:
+                    raise ValueError("Backreference before the start of the data")
+
+                actual_offset = out_pos - offset
+                if DEBUG:
+                    log(f"Current Outstream Length: {out_pos}")
+                    log(f"Backreference length: {length}")
+                    log(f"Backreference relative offset: {offset}")
+                    log(f"Backreference absolute offset: {actual_offset}")
+
+                if offset >= length:
+                    out[out_pos:out_pos + length] = out[actual_offset:actual_offset + length]
+                else:
+                    # the copy overlaps the data it writes: the last offset bytes are repeated
+                    out[out_pos:out_pos + length] = (out[actual_offset:out_pos] * (length // offset + 1))[:length]
+                out_pos += length
+    except IndexError:
+        raise ValueError(f"Truncated data at offset {pos}")
+
+    if uncompressed_length != out_pos or len(out) != out_pos:
         raise ValueError("Wrong data length in uncompressed data")
         # TODO: allow a partial / potentially bad result via a flag in the function call?
 
-    return result
+    return bytes(out)
+
+
+# Native decompressors, used when installed (same output, the pure Python version
+# is still run on failure so that errors are the same)
+try:
+    import cramjam
+
+    def _decompress_native(data: typing.Union[bytes, bytearray, memoryview]) -> bytes:
+        return bytes(cramjam.snappy.decompress_raw(data))
+except ImportError:
+    try:
+        import snappy
+
+        def _decompress_native(data: typing.Union[bytes, bytearray, memoryview]) -> bytes:
+            return snappy.uncompress(data)
+    except ImportError:
+        _decompress_native = None
+
+
+def decompress_bytes(data: typing.Union[bytes, bytearray, memoryview]) -> bytes:
+    """Decompresses snappy compressed bytes"""
+    if _decompress_native is not None and not DEBUG:
+        try:
+            return _decompress_native(data)
+        except Exception:
+            pass
+    return _decompress_python(data)
+
+
+def decompress(data: typing.BinaryIO) -> bytes:
+    """Decompresses the snappy compressed data stream"""
+    return decompress_bytes(data.read())
 
 
 def main(path):
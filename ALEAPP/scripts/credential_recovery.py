@@ -0,0 +1,277 @@
+# Recovery of the PINs and passwords that apps store as hashes, shared by the
+# artifact modules of vault and app locker apps.
+#
+# Java's String.hashCode() of a digit string is a polynomial in 31 mod 2**32, so
+# PINs are found by inverting it instead of hashing every digit string: the
+# prefixes of a PIN are enumerated (vectorized with NumPy when installed) and the
+# suffix that completes each prefix is solved for directly, the suffix values
+# being numbers written in base 31 with digits 0-9.
+#
+# SHA-1 and SHA-256 hashes of PINs and lock patterns are looked up in tables of
+# the hashes of every candidate, built once per length and kept in a per-user
+# cache folder, and PBKDF2 candidates are derived across a thread pool.
+
+import hashlib
+import math
+import os
+import string
+import tempfile
+
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import permutations
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+hashcode_mask = 0xFFFFFFFF
+# Longest suffix solved for with at most two candidates per prefix (9 * (31**7 - 1) / 30 < 2 * 2**32)
+max_suffix_length = 7
+# Number of prefixes evaluated per NumPy batch
+batch_prefix_length = 6
+
+def java_string_hashcode(text):
+    '''Java's String.hashCode() of text, as a signed 32 bit int'''
+    hashcode = 0
+    for char in text:
+        hashcode = (31 * hashcode + ord(char)) & hashcode_mask
+    return ((hashcode + 0x80000000) & hashcode_mask) - 0x80000000
+
+def _digit_string_base(length):
+    '''Hash of the digit string of length zeros: the digits then add d * 31**position'''
+    return (ord('0') * (31 ** length - 1) // 30) & hashcode_mask
+
+def _suffix(value, suffix_length):
+    '''The digit string of suffix_length with base 31 value value, or None'''
+    digits = []
+    for _ in range(suffix_length):
+        value, digit = divmod(value, 31)
+        if digit > 9:
+            return None
+        digits.append(string.digits[digit])
+    return ''.join(reversed(digits))
+
+def _suffixes(residue, suffix_length):
+    '''Digit strings of suffix_length whose base 31 value is residue mod 2**32'''
+    max_value = 9 * (31 ** suffix_length - 1) // 30
+    for value in range(residue, max_value + 1, 1 << 32):
+        suffix = _suffix(value, suffix_length)
+        if suffix is not None:
+            yield suffix
+
+def _pins_python(target, prefix_length, suffix_length):
+    multiplier = pow(31, suffix_length, 1 << 32)
+    for prefix in range(10 ** prefix_length):
+        prefix_text = f'{prefix:0{prefix_length}d}' if prefix_length else ''
+        prefix_value = int(prefix_text, 31) if prefix_length else 0
+        for suffix in _suffixes((target - prefix_value * multiplier) & hashcode_mask, suffix_length):
+            yield prefix_text + suffix
+
+def _digit_values(length):
+    '''Base 31 values of all digit strings of length, in numerical order'''
+    values = numpy.zeros(1, dtype=numpy.uint64)
+    for _ in range(length):
+        values = (values[:, None] * 31 + numpy.arange(10, dtype=numpy.uint64)).ravel()
+    return values
+
+def _digit_value_table(length, size):
+    '''Boolean array of size, True at the base 31 values of the digit strings of length'''
+    table = numpy.zeros(size, dtype=bool)
+    table[_digit_values(length)] = True
+    return table
+
+def _pins_numpy(target, prefix_length, suffix_length):
+    multiplier = pow(31, suffix_length, 1 << 32)
+    max_value = 9 * (31 ** suffix_length - 1) // 30
+    low_length = min(prefix_length, batch_prefix_length)
+    high_length = prefix_length - low_length
+    # prefix = high * 10**low_length + low, prefix value = high value * 31**low_length + low value
+    low_terms = (_digit_values(low_length) * multiplier) & hashcode_mask
+    high_multiplier = pow(31, low_length, 1 << 32) * multiplier
+    # suffix values are checked as two halves looked up in tables of the valid values
+    split_length = suffix_length // 2
+    split = 31 ** split_length
+    valid_low = _digit_value_table(split_length, split)
+    valid_high = _digit_value_table(suffix_length - split_length, (max_value + (1 << 32)) // split + 1)
+    found = []
+    for high in range(10 ** high_length):
+        high_value = int(f'{high:0{high_length}d}', 31) if high_length else 0
+        base = (target - high_value * high_multiplier) & hashcode_mask
+        residues = (base + (1 << 32) - low_terms) & hashcode_mask
+        for wrap in range(0, max_value + 1, 1 << 32):
+            values = residues + wrap
+            value_highs = values // split
+            lows = numpy.flatnonzero(valid_high[value_highs] & valid_low[values - value_highs * split])
+            # PINs as numbers: prefix * 10**suffix_length + suffix digits
+            values = values[lows]
+            pins = (lows + high * 10 ** low_length).astype(numpy.uint64) * 10 ** suffix_length
+            for position in range(suffix_length):
+                values, digits = numpy.divmod(values, 31)
+                pins += digits * 10 ** position
+            found.append(pins)
+    return [f'{pin:0{prefix_length + suffix_length}d}' for pin in numpy.sort(numpy.concatenate(found)).tolist()]
+
+def java_hashcode_pins(hashcode, min_length=1, max_length=15):
+    '''Yields all digit strings of min_length to max_length digits whose Java
+       String.hashCode() is hashcode (int or str), shortest first, then in
+       numerical order.'''
+    hashcode = int(hashcode) & hashcode_mask
+    for length in range(min_length, max_length + 1):
+        suffix_length = min(length, max_suffix_length)
+        prefix_length = length - suffix_length
+        target = (hashcode - _digit_string_base(length)) & hashcode_mask
+        if numpy is not None and prefix_length:
+            yield from _pins_numpy(target, prefix_length, suffix_length)
+        else:
+            yield from _pins_python(target, prefix_length, suffix_length)
+
+def recover_java_hashcode_pin(hashcode, min_length=1, max_length=15):
+    '''The first PIN of java_hashcode_pins(), or None'''
+    return next(java_hashcode_pins(hashcode, min_length, max_length), None)
+
+def pin_candidate(length, index):
+    '''The PIN of length digits at index, as hashed: ASCII digits'''
+    return b'%0*d' % (length, index)
+
+def pattern_candidate(length, index):
+    '''The lock pattern of length points at index, in the order of
+       itertools.permutations(range(9), length), as hashed: one byte per point'''
+    points = list(range(9))
+    pattern = []
+    for position in range(length):
+        choice, index = divmod(index, math.perm(8 - position, length - 1 - position))
+        pattern.append(points.pop(choice))
+    return bytes(pattern)
+
+candidate_kinds = {
+    # kind: (candidate at an index, all candidates of a length in index order)
+    'pin': (pin_candidate, lambda length: (pin_candidate(length, index) for index in range(10 ** length))),
+    'pattern': (pattern_candidate, lambda length: map(bytes, permutations(range(9), length))),
+}
+candidate_counts = {
+    'pin': lambda length: 10 ** length,
+    'pattern': lambda length: math.perm(9, length),
+}
+# Bits of the digests kept in the tables, the rest of an entry is the index of the candidate,
+# so there are tables for at most 2**index_bits candidates (PINs of up to 7 digits)
+digest_prefix_bits = 40
+index_bits = 24
+
+def _user_cache_folder():
+    if os.name == 'nt':
+        return os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    return os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+
+# The tables don't depend on the evidence, they are kept on disk for the next runs. The
+# folder is the user's own, as other users could replace the tables in a shared one.
+table_folder = os.path.join(_user_cache_folder(), 'ALEAPP', 'credential_tables')
+
+def _build_digest_table(kind, algorithm, length):
+    _, candidates = candidate_kinds[kind]
+    new_hash = getattr(hashlib, algorithm)
+    prefix_length = digest_prefix_bits // 8
+    from_bytes = int.from_bytes
+    packed = [from_bytes(new_hash(value).digest()[:prefix_length], 'big') << index_bits | index
+              for index, value in enumerate(candidates(length))]
+    packed.sort()
+    return array('Q', packed)
+
+@lru_cache(maxsize=None)
+def _digest_table(kind, algorithm, length):
+    '''Sorted array of the digest prefixes of all candidates of kind and length,
+       each packed with the index of its candidate. A damaged table file can only
+       make lookups miss, as the candidates found are hashed again.'''
+    path = os.path.join(table_folder, f'{kind}-{algorithm}-{length}-{digest_prefix_bits}.bin')
+    table = array('Q')
+    try:
+        with open(path, 'rb') as table_file:
+            table.frombytes(table_file.read())
+        if len(table) == candidate_counts[kind](length):
+            return table
+    except OSError:
+        pass
+    table = _build_digest_table(kind, algorithm, length)
+    try:
+        os.makedirs(table_folder, mode=0o700, exist_ok=True)
+        # written under a temporary name first, another run may be writing the same table
+        handle, temp_path = tempfile.mkstemp(dir=table_folder)
+        with os.fdopen(handle, 'wb') as table_file:
+            table.tofile(table_file)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+    return table
+
+def lookup_hash(digest, kind, algorithm='sha1', lengths=range(4, 7)):
+    '''The candidate (PIN or lock pattern bytes) whose hash is digest (hex
+       string or bytes), trying the lengths in order, or None. Raises ValueError
+       for lengths with more candidates than a table can index.'''
+    too_long = [length for length in lengths if candidate_counts[kind](length) > 1 << index_bits]
+    if too_long:
+        raise ValueError(f'{kind}s of length {too_long[0]} have more candidates than a table can index '
+                         f'({1 << index_bits})')
+    if isinstance(digest, str):
+        digest = bytes.fromhex(digest.strip())
+    candidate, _ = candidate_kinds[kind]
+    new_hash = getattr(hashlib, algorithm)
+    prefix = int.from_bytes(digest[:digest_prefix_bits // 8], 'big')
+    for length in lengths:
+        table = _digest_table(kind, algorithm, length)
+        position = bisect_left(table, prefix << index_bits)
+        while position < len(table) and table[position] >> index_bits == prefix:
+            value = candidate(length, table[position] & ((1 << index_bits) - 1))
+            if new_hash(value).digest() == digest:
+                return value
+            position += 1
+    return None
+
+def pin_for_hash(digest, algorithm='sha1', min_length=4, max_length=6):
+    '''The PIN of min_length to max_length digits whose hash is digest, or None.
+       algorithm is 'sha1', 'sha256' or 'java_hashcode' (digest is then the hashcode).
+       SHA hashes are looked up for PINs of up to 7 digits, longer ones raise ValueError.'''
+    if algorithm == 'java_hashcode':
+        return recover_java_hashcode_pin(digest, min_length, max_length)
+    pin = lookup_hash(digest, 'pin', algorithm, range(min_length, max_length + 1))
+    return pin.decode('ascii') if pin is not None else None
+
+def pattern_for_hash(digest, algorithm='sha1', min_length=4, max_length=9):
+    '''The Android lock pattern whose hash (of one byte per point, as in
+       gesture.key) is digest, as a string of its points 0-8, or None'''
+    pattern = lookup_hash(digest, 'pattern', algorithm, range(min_length, max_length + 1))
+    return ''.join(str(point) for point in pattern) if pattern is not None else None
+
+def _derive_pbkdf2_keys(hash_name, salt, iterations, key_length, passwords):
+    return [hashlib.pbkdf2_hmac(hash_name, password, salt, iterations, key_length) for password in passwords]
+
+def find_pbkdf2_password(passwords, salt, iterations, key_length, matches, hash_name='sha1', chunk_size=256):
+    '''Derives the PBKDF2 key of each of passwords (bytes), and returns the first
+       (password, key) for which matches(password, key) is true, or None. Keys are
+       derived across a thread pool, matches is called in this thread, in order.'''
+    passwords = list(passwords)
+    chunks = [passwords[start:start + chunk_size] for start in range(0, len(passwords), chunk_size)]
+    derive = partial(_derive_pbkdf2_keys, hash_name, salt, iterations, key_length)
+    workers = os.cpu_count() or 1
+    if workers == 1 or len(chunks) < 2:
+        executor = None
+        derived = map(derive, chunks)
+    else:
+        # threads rather than processes: the key derivation releases the GIL, and pool
+        # processes would import the main module again, which starts the GUI in aleappGUI.py
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = [executor.submit(derive, chunk) for chunk in chunks]
+        derived = (future.result() for future in futures)
+    try:
+        for chunk, keys in zip(chunks, derived):
+            for password, key in zip(chunk, keys):
+                if matches(password, key):
+                    return password, key
+    finally:
+        if executor is not None:
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+    return None
@@ -27,8 +27,13 @@ SOFTWARE.
 """
 
 # -*- coding: utf-8 -*-
+import os
 import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
+from scripts.filetypes import application, archive, audio, document, font, image, text, video
+from scripts.filetypes.isobmff import IsoBmff
 from scripts.filetypes import ARCHIVE as archive_matchers
 from scripts.filetypes import AUDIO as audio_matchers
 from scripts.filetypes import APPLICATION as application_matchers
@@ -118,6 +123,158 @@ def get_bytes(obj):
     raise TypeError('Unsupported type as file input: %s' % type(obj))
 
 
+# engine.py
+#
+# Instead of trying every matcher on a buffer, the matchers that can match a
+# buffer starting with a given byte are listed once in a dispatch table (in
+# the order of the matchers list, so the first match is the same). The table
+# also gives how many header bytes these matchers look at, files are read
+# for that much only. Matchers with a signature that doesn't start at the
+# first byte (offset rules) are listed for every first byte.
+
+_NUM_PROBE_BYTES = 512
+
+# Matcher type: (bytes its signature can start with or None for an offset rule,
+#                number of header bytes it looks at)
+_SIGNATURES = {
+    image.Dwg: (b'\x41', 4),
+    image.Xcf: (b'\x67', 10),
+    image.Jpeg: (b'\xFF', 3),
+    image.Jpx: (b'\x00', 51),
+    image.Apng: (b'\x89', _NUM_SIGNATURE_BYTES),
+    image.Png: (b'\x89', 4),
+    image.Gif: (b'\x47', 3),
+    image.Webp: (b'\x52', 14),
+    image.Tiff: (b'\x49\x4D', 10),
+    image.Cr2: (b'\x49\x4D', 10),
+    image.Bmp: (b'\x42', 2),
+    image.Jxr: (b'\x49', 3),
+    image.Psd: (b'\x38', 4),
+    image.Ico: (b'\x00', 4),
+    image.Dcm: (None, 133),
+    image.Qoi: (b'\x71', 4),
+    video.M3gp: (None, 11),
+    video.M4v: (b'\x00', 11),
+    video.Mkv: (b'\x1A', _NUM_SIGNATURE_BYTES),
+    video.Avi: (b'\x52', 12),
+    video.Wmv: (b'\x30', 10),
+    video.Mpeg: (b'\x00', 4),
+    video.Webm: (b'\x1A', _NUM_SIGNATURE_BYTES),
+    video.Flv: (b'\x46', 4),
+    audio.Aac: (b'\xFF', 2),
+    audio.Midi: (b'\x4D', 4),
+    audio.Mp3: (b'\x49\xFF', 3),
+    audio.M4a: (None, 11),
+    audio.Ogg: (b'\x4F', 4),
+    audio.Flac: (b'\x66', 4),
+    audio.Wav: (b'\x52', 12),
+    audio.Amr: (b'\x23', 12),
+    audio.Aiff: (b'\x46', 12),
+    font.Woff: (b'\x77', 8),
+    font.Woff2: (b'\x77', 8),
+    font.Ttf: (b'\x00', 5),
+    font.Otf: (b'\x4F', 5),
+    document.Doc: (b'\xD0', 2143),
+    document.Docx: (b'\x50', _NUM_SIGNATURE_BYTES),
+    document.Odt: (b'\x50', _NUM_SIGNATURE_BYTES),
+    document.Xls: (b'\xD0', 2096),
+    document.Xlsx: (b'\x50', _NUM_SIGNATURE_BYTES),
+    document.Ods: (b'\x50', _NUM_SIGNATURE_BYTES),
+    document.Ppt: (b'\xD0', 2097),
+    document.Pptx: (b'\x50', _NUM_SIGNATURE_BYTES),
+    document.Odp: (b'\x50', _NUM_SIGNATURE_BYTES),
+    archive.Br: (b'\xCE', 4),
+    archive.Rpm: (b'\xED', 4),
+    archive.Dcm: (None, 131),
+    archive.Epub: (b'\x50', 58),
+    archive.Zip: (b'\x50', 4),
+    archive.Tar: (None, 262),
+    archive.Rar: (b'\x52', 7),
+    archive.Gz: (b'\x1F', 3),
+    archive.Bz2: (b'\x42', 3),
+    archive.SevenZ: (b'\x37', 6),
+    archive.Pdf: (b'\xEF\x25', 7),
+    archive.Exe: (b'\x4D', 2),
+    archive.Swf: (b'\x46\x43\x5A', 3),
+    archive.Rtf: (b'\x7B', 5),
+    archive.Nes: (b'\x4E', 4),
+    archive.Crx: (b'\x43', 4),
+    archive.Cab: (b'\x4D\x49', 4),
+    archive.Eot: (None, 36),
+    archive.Ps: (b'\x25', 2),
+    archive.Xz: (b'\xFD', 6),
+    archive.Sqlite: (b'\x53', 4),
+    archive.Deb: (b'\x21', 21),
+    archive.Ar: (b'\x21', 7),
+    archive.Z: (b'\x1F', 2),
+    archive.Lzop: (b'\x89', 8),
+    archive.Lz: (b'\x4C', 4),
+    archive.Elf: (b'\x7F', 53),
+    archive.Lz4: (b'\x04', 4),
+    # frames, or skippable frames (magic 0x184D2A5?, little endian)
+    archive.Zstd: (bytes(range(0x22, 0x29)) + bytes(range(0x50, 0x60)), _NUM_SIGNATURE_BYTES),
+    application.Wasm: (b'\x00', 8),
+    text.Json: (b'\x5B\x7B', 5),
+    text.Plist: (b'\x3C', 80),
+    text.Html: (None, 15),
+}
+
+
+class _Dispatch(object):
+    """
+    Dispatch table of a list of matchers.
+    """
+    def __init__(self, matchers):
+        self.matchers = matchers
+        # ISO-BMFF matchers look at the whole ftyp box, whatever its first bytes
+        self.isobmff = any(isinstance(matcher, IsoBmff) for matcher in matchers)
+        self.candidates = []
+        self.header_bytes = []
+        for first_byte in range(256):
+            candidates = []
+            header_bytes = 0
+            for matcher in matchers:
+                first_bytes, size = _SIGNATURES.get(type(matcher), (None, _NUM_SIGNATURE_BYTES))
+                if isinstance(matcher, IsoBmff):
+                    first_bytes, size = None, 16
+                if first_bytes is None or first_byte in first_bytes:
+                    candidates.append(matcher)
+                    header_bytes = max(header_bytes, size)
+            self.candidates.append(tuple(candidates))
+            self.header_bytes.append(header_bytes)
+
+    def match(self, buf):
+        for matcher in (self.candidates[buf[0]] if buf else self.matchers):
+            if matcher.match(buf):
+                return matcher
+        return None
+
+    def read_header(self, path):
+        """
+        Reads the header bytes of a file the matchers look at.
+        """
+        with open(path, 'rb') as fp:
+            buf = bytearray(fp.read(_NUM_PROBE_BYTES))
+            if len(buf) == _NUM_PROBE_BYTES:
+                needed = self.header_bytes[buf[0]]
+                if self.isobmff and buf[4:8] == b'ftyp':
+                    needed = max(needed, int.from_bytes(buf[0:4], 'big'))
+                if needed > _NUM_PROBE_BYTES:
+                    buf += fp.read(min(needed, _NUM_SIGNATURE_BYTES) - _NUM_PROBE_BYTES)
+        return buf
+
+
+@lru_cache(maxsize=None)
+def _dispatch(matchers):
+    return _Dispatch(matchers)
+
+
+@lru_cache(maxsize=65536)
+def _match_file(path, size, mtime, matchers):
+    dispatch = _dispatch(matchers)
+    return dispatch.match(dispatch.read_header(path))
+
+
 # match.py
 
 def match(obj, matchers=TYPES):
@@ -125,6 +282,9 @@ def match(obj, matchers=TYPES):
     Matches the given input against the available
     file type matchers.
 
+    Results for a path are cached while the size and
+    modification time of the file stay the same.
+
     Args:
         obj: path to file, bytes or bytearray.
 
@@ -134,13 +294,12 @@ def match(obj, matchers=TYPES):
     Raises:
         TypeError: if obj is not a supported type.
     """
-    buf = get_bytes(obj)
-
-    for matcher in matchers:
-        if matcher.match(buf):
-            return matcher
+    matchers = tuple(matchers)
+    if isinstance(obj, (str, pathlib.PurePath)):
+        stat = os.stat(obj)
+        return _match_file(os.fspath(obj), stat.st_size, stat.st_mtime_ns, matchers)
 
-    return None
+    return _dispatch(matchers).match(get_bytes(obj))
 
 
 def image_match(obj):
@@ -321,6 +480,45 @@ def guess_extension(obj):
     return kind.extension if kind else kind
 
 
+def guess_many(paths, max_workers=8):
+    """
+    Infers the types of many files, reading them on
+    a pool of threads.
+
+    Args:
+        paths: paths to files.
+        max_workers: number of threads.
+
+    Returns:
+        List of the matched type instances (or None), in
+        the order of paths.
+
+    Raises:
+        OSError: if a file can't be read.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(guess, paths))
+
+
+def guess_mime_many(paths, max_workers=8):
+    """
+    Infers the MIME types of many files, reading them
+    on a pool of threads.
+
+    Args:
+        paths: paths to files.
+        max_workers: number of threads.
+
+    Returns:
+        List of the matched MIME types as strings (or None),
+        in the order of paths.
+
+    Raises:
+        OSError: if a file can't be read.
+    """
+    return [kind.mime if kind else kind for kind in guess_many(paths, max_workers)]
+
+
 def get_type(mime=None, ext=None):
     """
     Returns the file type instance searching by
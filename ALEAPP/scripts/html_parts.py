@@ -1,3 +1,7 @@
+from scripts.asset_bundle import bundle_file_names
+
+bundle_css, bundle_head_js, bundle_body_js = bundle_file_names()
+
 # Variables in page_header = {title}
 # 
 page_header = \
@@ -8,35 +12,15 @@ page_header = \
         <meta name="viewport" content="width=device-width, initial-scale=1, shrink-to-fit=no">
         <meta http-equiv="x-ua-compatible" content="ie=edge">
         <title>{0}</title>
-        <!-- Dark mode -->
-        <link rel="stylesheet" href="_elements/dark-mode.css">
         <!-- Font Awesome -->
         <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.3.0/css/all.min.css">
         <!-- Google Fonts Roboto -->
         <link rel="stylesheet" href="https://fonts.googleapis.com/css?family=Roboto:300,400,500,700&display=swap">
-        <!-- Bootstrap core CSS -->
-        <link rel="stylesheet" href="_elements/MDB-Free_4.13.0/css/bootstrap.min.css">
-        <!-- Material Design Bootstrap - TOGGLE THIS FOR ALTERNATE DESIGN!-->
-        <link rel="stylesheet" href="_elements/MDB-Free_4.13.0/css/mdb.min.css">
-        <!-- Highlight.js -->
-        <link rel="stylesheet" href="_elements/highlight.min.css">
-        <script src="_elements/highlight.min.js"></script>
-        <!-- Cal-Heatmap -->
-        <script src="_elements/d3.v7.min.js"></script>
-        <script src="_elements/cal-heatmap.min.js"></script>
-        <link rel="stylesheet" href="_elements/cal-heatmap.css">
-        <script src="_elements/popper.min.js"></script>
-        <script src="_elements/Tooltip.min.js"></script>
-        <!-- Your custom styles (optional) -->
-        <link rel="stylesheet" href="_elements/dashboard.css">
-        <link rel="stylesheet" href="_elements/chat.css">
-        <!-- MDBootstrap Datatables  -->
-        <link rel="stylesheet" href="_elements/MDB-Free_4.13.0/css/addons/datatables.min.css" rel="stylesheet">
-        <link href="_elements/timeline/css/timeline.min.css" rel="stylesheet" />
-
-        <!-- Icons -->
-        <!--script src="https://unpkg.com/feather-icons/dist/feather.min.js"></script-->
-        <script src="_elements/feather.min.js"></script>
+        <!-- Dark mode, Bootstrap, Material Design Bootstrap, Highlight.js, Cal-Heatmap, Datatables,
+             timeline and custom styles, bundled (see asset_bundle.py) -->
+        <link rel="stylesheet" href="_elements/""" + bundle_css + """">
+        <!-- Highlight.js, Cal-Heatmap (D3, Popper, Tooltip) and Feather icons -->
+        <script src="_elements/""" + bundle_head_js + """"></script>
     </head>
     <body>
 """
@@ -270,24 +254,8 @@ body_end = \
 """
     <!-- End your project here-->
 
-    <!-- jQuery -->
-    <script type="text/javascript" src="_elements/MDB-Free_4.13.0/js/jquery.min.js"></script>
-    <!-- Bootstrap tooltips -->
-    <script type="text/javascript" src="_elements/MDB-Free_4.13.0/js/popper.min.js"></script>
-    <!-- Bootstrap core JavaScript -->
-    <script type="text/javascript" src="_elements/MDB-Free_4.13.0/js/bootstrap.js"></script>
-    <!-- MDB core JavaScript -->
-    <script type="text/javascript" src="_elements/MDB-Free_4.13.0/js/mdb.min.js"></script>
-    <!-- Your custom scripts -->
-    <!-- MDBootstrap Datatables  -->
-    <script type="text/javascript" src="_elements/MDB-Free_4.13.0/js/addons/datatables.min.js"></script>
-    <!-- Chart.js -->
-    <script type="text/javascript" src="_elements/chart.umd.min.js"></script>
-    <script type="text/javascript" src="_elements/moment.min.js"></script>
-    <script type="text/javascript" src="_elements/timeline/js/timeline.min.js"></script>
-    <!-- Garmin Functions -->
-    <script type="text/javascript" src="_elements/garmin-functions.js"></script>
-    <script type="text/javascript" src="_elements/chat.js"></script>
+    <!-- jQuery, Bootstrap, MDB, MDBootstrap Datatables, Chart.js, Moment, timeline, Garmin and chat functions -->
+    <script type="text/javascript" src="_elements/""" + bundle_body_js + """"></script>
     <script>
         feather.replace()
     </script>
@@ -339,6 +307,39 @@ default_responsive_table_script = \
     </script>
 """
 
+# Tables written as data shards (see ArtifactHtmlReport.write_artifact_data_table) get
+# their rows when DataTables initialises them, whichever script does it. The rows are
+# found by the data-leapp-shards attribute of the table, its id can be on other tables
+table_shards_script = \
+"""
+    <script>
+        (function($) {
+            var dataTable = $.fn.dataTable;
+            function shardedRows(table) {
+                var key = table.getAttribute && table.getAttribute('data-leapp-shards');
+                return key && window.leappTableData && !dataTable.isDataTable(table) ? leappTableData[key] : null;
+            }
+            $.fn.dataTable = $.extend(function(options) {
+                if (this.length === 1) {
+                    var rows = shardedRows(this[0]);
+                    if (rows) {
+                        options = $.extend({}, options, {data: rows, deferRender: true});
+                    }
+                } else if (this.filter(function() { return shardedRows(this); }).length) {
+                    // each table gets its own rows, then the others are initialised together
+                    this.each(function() {
+                        if (shardedRows(this)) {
+                            $(this).dataTable(options);
+                        }
+                    });
+                    options = $.extend({}, options, {retrieve: true});
+                }
+                return dataTable.call(this, options);
+            }, dataTable);
+        })(jQuery);
+    </script>
+"""
+
 page_footer = \
 """
     </body>
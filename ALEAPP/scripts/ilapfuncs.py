@@ -1,21 +1,27 @@
 # common standard imports
+import atexit
 import codecs
 import csv
 from datetime import *
+import gzip
 import json
 import os
 import re
 import shutil
 import sqlite3
 import sys
-from functools import lru_cache
+import threading
+from functools import lru_cache, wraps
+from json.encoder import encode_basestring_ascii
 from pathlib import Path
+from time import monotonic, sleep
 
 # common third party imports
 import pytz
 import simplekml
 from bs4 import BeautifulSoup
 from scripts.filetype import guess_mime
+from scripts import ccl_abx
 
 # LEAPP version unique imports
 from geopy.geocoders import Nominatim
@@ -28,6 +34,7 @@ class OutputParameters:
     # static parameters
     nl = '\n'
     screen_output_file_path = ''
+    shared_output_lock = None # set in worker processes when plugins run in parallel
 
     def __init__(self, output_folder):
         now = datetime.now()
@@ -128,6 +135,22 @@ def get_next_unused_name(path):
         num += 1
     return os.path.join(folder, new_name)
 
+def copy_file_rest(source, destination):
+    '''Copies source from its current position to the end into destination, in the
+       kernel with sendfile where available'''
+    destination.flush()
+    if hasattr(os, 'sendfile'):
+        offset = source.tell()
+        try:
+            while True:
+                sent = os.sendfile(destination.fileno(), source.fileno(), offset, 1 << 30)
+                if sent == 0:
+                    return
+                offset += sent
+        except OSError:
+            source.seek(offset) # not supported for these files, copy the remaining part
+    shutil.copyfileobj(source, destination)
+
 def open_sqlite_db_readonly(path):
     '''Opens an sqlite db in read-only mode, so original db (and -wal/journal are intact)'''
     if is_platform_windows():
@@ -174,6 +197,8 @@ def does_table_exist(db, table_name):
 class GuiWindow:
     '''This only exists to hold window handle if script is run from GUI'''
     window_handle = None  # static variable
+    log_update_interval = 0.1 # seconds between redraws of the log window
+    last_log_update = 0.0
 
     @staticmethod
     def SetProgressBar(n, total):
@@ -182,24 +207,79 @@ class GuiWindow:
             progress_bar.config(value=n)
 
 
+class LogWriter:
+    '''Writes the log files through handles kept open, instead of opening and
+       closing a file for every line. A background thread flushes them every
+       flush_interval seconds and they are flushed at exit, so the logs are
+       complete even when processing stops on an error.
+    '''
+    flush_interval = 1.0
+
+    def __init__(self):
+        self._files = {} # path -> open handle
+        self._lock = threading.Lock()
+        self._flusher = None
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            # a forked worker must not write out (again) what the parent buffered
+            os.register_at_fork(before=self.flush, after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._files = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def write(self, path, text):
+        with self._lock:
+            log_file = self._files.get(path)
+            if log_file is None:
+                log_file = self._files[path] = open(path, 'a', encoding='utf8')
+            log_file.write(text)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, name='LogWriter', daemon=True)
+                self._flusher.start()
+
+    def _flush_periodically(self):
+        while True:
+            sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        '''Writes out everything logged so far'''
+        with self._lock:
+            for log_file in self._files.values():
+                log_file.flush()
+
+    def close(self):
+        '''Flushes and closes the log files, they are reopened by the next write'''
+        with self._lock:
+            for log_file in self._files.values():
+                log_file.close()
+            self._files.clear()
+
+log_writer = LogWriter()
+
+
 def logfunc(message=""):
     def redirect_logs(string):
         log_text.insert('end', string)
         log_text.see('end')
-        log_text.update()
+        # redrawing the window for every line would slow down processing
+        now = monotonic()
+        if now - GuiWindow.last_log_update >= GuiWindow.log_update_interval:
+            GuiWindow.last_log_update = now
+            log_text.update()
 
     if GuiWindow.window_handle:
         log_text = GuiWindow.window_handle.nametowidget('logs_frame.log_text')
         sys.stdout.write = redirect_logs
 
-    with open(OutputParameters.screen_output_file_path, 'a', encoding='utf8') as a:
-        print(message)
-        a.write(message + '<br>' + OutputParameters.nl)
+    print(message)
+    log_writer.write(OutputParameters.screen_output_file_path, message + '<br>' + OutputParameters.nl)
 
 
 def logdevinfo(message=""):
-    with open(OutputParameters.screen_output_file_path_devinfo, 'a', encoding='utf8') as b:
-        b.write(message + '<br>' + OutputParameters.nl)
+    log_writer.write(OutputParameters.screen_output_file_path_devinfo, message + '<br>' + OutputParameters.nl)
 
 
 """ def deviceinfoin(ordes, kas, vas, sources): # unused function
@@ -211,120 +291,394 @@ def logdevinfo(message=""):
     db.commit() """
 
 
+def serialize_shared_output(func):
+    '''Decorator for functions writing to the exports shared by all artifacts
+       (TSV, timeline, KML), so that parallel plugins write them one at a time
+    '''
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if OutputParameters.shared_output_lock is None:
+            return func(*args, **kwargs)
+        with OutputParameters.shared_output_lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+
 def html2csv(reportfolderbase):
+    '''Exports the tables of the report pages to _CSV Exports by parsing the pages.
+       Tables written with ArtifactHtmlReport.write_artifact_data_table are exported
+       as they are written when ArtifactHtmlReport.csv_export is set, so pages that
+       already have their CSV file are skipped, as are pages without tables.
+    '''
     # List of items that take too long to convert or that shouldn't be converted
     itemstoignore = ['index.html',
                      'Distribution Keys.html',
                      'StrucMetadata.html',
                      'StrucMetadataCombined.html']
 
-    if os.path.isdir(os.path.join(reportfolderbase, '_CSV Exports')):
-        pass
-    else:
-        os.makedirs(os.path.join(reportfolderbase, '_CSV Exports'))
-    for root, _, files in sorted(os.walk(reportfolderbase)):
+    csv_folder = os.path.join(reportfolderbase, '_CSV Exports')
+    os.makedirs(csv_folder, exist_ok=True)
+    for root, dirs, files in sorted(os.walk(reportfolderbase)):
+        if root == reportfolderbase:
+            # _elements, _CSV Exports, _TSV Exports, _Table Data...
+            dirs[:] = [d for d in dirs if not d.startswith('_')]
         for file in files:
             if file.endswith(".html"):
                 fullpath = (os.path.join(root, file))
-                if file in itemstoignore:
-                    pass
-                else:
-                    data = open(fullpath, 'r', encoding='utf8')
-                    soup = BeautifulSoup(data, 'html.parser')
-                    tables = soup.find_all("table")
-                    data.close()
-
-                    for table in tables:
-                        output_rows = []
-                        for table_row in table.findAll('tr'):
-                            columns = table_row.findAll('td')
-                            output_row = [column.text for column in columns]
-                            output_rows.append(output_row)
-
-                        file = (os.path.splitext(file)[0])
-                        with codecs.open(os.path.join(reportfolderbase, '_CSV Exports', file + '.csv'), 'a',
-                                         'utf-8-sig') as csvfile:
-                            writer = csv.writer(csvfile, quotechar='"', quoting=csv.QUOTE_ALL)
-                            writer.writerows(output_rows)
-
-
-def tsv(report_folder, data_headers, data_list, tsvname, source_file=None):
+                csv_path = os.path.join(csv_folder, os.path.splitext(file)[0] + '.csv')
+                if file in itemstoignore or os.path.exists(csv_path):
+                    continue
+                with open(fullpath, 'r', encoding='utf8') as data:
+                    page = data.read()
+                if '<table' not in page:
+                    continue
+                soup = BeautifulSoup(page, 'html.parser')
+                tables = soup.find_all("table")
+
+                for table in tables:
+                    output_rows = []
+                    for table_row in table.findAll('tr'):
+                        columns = table_row.findAll('td')
+                        output_row = [column.text for column in columns]
+                        output_rows.append(output_row)
+
+                    with codecs.open(csv_path, 'a', 'utf-8-sig') as csvfile:
+                        writer = csv.writer(csvfile, quotechar='"', quoting=csv.QUOTE_ALL)
+                        writer.writerows(output_rows)
+
+
+class TsvWriter:
+    '''Writes the _TSV Exports files. Each file is opened once and kept open until
+       the artifact module writing it returns (run_plugin closes them), rows are
+       written as they are read from data_list, which can be any iterable (a
+       sqlite cursor for example). Files are written as .tsv.gz when compress is
+       set, for the run or for a call.
+       When plugins run in parallel, other processes append to the same files, so
+       the files are then closed at the end of each call instead.
+    '''
+    compress = False # set by the --compress_tsv option
+
+    def __init__(self):
+        self._files = {} # tsv path -> (open file, csv writer)
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=self.close)
+
+    def _writer(self, tsv_report_folder, data_headers, tsvname, source_file, compress):
+        tsv_path = os.path.join(tsv_report_folder, tsvname + ('.tsv.gz' if compress else '.tsv'))
+        if tsv_path not in self._files:
+            os.makedirs(tsv_report_folder, exist_ok=True)
+            is_new = not os.path.exists(tsv_path)
+            # the byte order mark only goes at the start of the file
+            encoding = 'utf-8-sig' if is_new else 'utf-8'
+            if compress:
+                tsvfile = gzip.open(tsv_path, 'at', encoding=encoding, newline='')
+            else:
+                tsvfile = open(tsv_path, 'a', encoding=encoding, newline='')
+            writer = csv.writer(tsvfile, delimiter='\t')
+            if is_new:
+                writer.writerow(tuple(data_headers) if source_file is None
+                                else tuple(data_headers) + ("source file",))
+            self._files[tsv_path] = tsvfile, writer
+        return self._files[tsv_path][1]
+
+    def write(self, tsv_report_folder, data_headers, data_list, tsvname, source_file=None, compress=None):
+        if compress is None:
+            compress = self.compress
+        writer = self._writer(tsv_report_folder, data_headers, tsvname, source_file, compress)
+        if source_file is None:
+            writer.writerows(data_list)
+        else:
+            writer.writerows((*row, source_file) for row in data_list)
+        if OutputParameters.shared_output_lock is not None:
+            self.close()
+
+    def close(self):
+        '''Closes the files, they are reopened by the next write'''
+        for tsvfile, _ in self._files.values():
+            tsvfile.close()
+        self._files.clear()
+
+tsv_writer = TsvWriter()
+
+
+@serialize_shared_output
+def tsv(report_folder, data_headers, data_list, tsvname, source_file=None, compress=None):
     report_folder = report_folder.rstrip('/')
     report_folder = report_folder.rstrip('\\')
     report_folder_base, tail = os.path.split(report_folder)
-    tsv_report_folder = os.path.join(report_folder_base, '_TSV Exports')
+    tsv_writer.write(os.path.join(report_folder_base, '_TSV Exports'), data_headers, data_list, tsvname,
+                     source_file, compress)
 
-    if os.path.isdir(tsv_report_folder):
-        pass
-    else:
-        os.makedirs(tsv_report_folder)
-
-    if os.path.exists(os.path.join(tsv_report_folder, tsvname + '.tsv')):
-        with codecs.open(os.path.join(tsv_report_folder, tsvname + '.tsv'), 'a', 'utf-8-sig') as tsvfile:
-            tsv_writer = csv.writer(tsvfile, delimiter='\t')
-            for i in data_list:
-                if source_file == None:
-                    tsv_writer.writerow(i)
-                else:
-                    row_data = list(i)
-                    row_data.append(source_file)
-                    tsv_writer.writerow(tuple(row_data))
-    else:
-        with codecs.open(os.path.join(tsv_report_folder, tsvname + '.tsv'), 'a', 'utf-8-sig') as tsvfile:
-            tsv_writer = csv.writer(tsvfile, delimiter='\t')
-            if source_file == None:
-                tsv_writer.writerow(data_headers)
-                for i in data_list:
-                    tsv_writer.writerow(i)
-            else:
-                data_hdr = list(data_headers)
-                data_hdr.append("source file")
-                tsv_writer.writerow(tuple(data_hdr))
-                for i in data_list:
-                    row_data = list(i)
-                    row_data.append(source_file)
-                    tsv_writer.writerow(tuple(row_data))
 
+def export_rows(rows, report_folder, data_headers, tsvname=None, tlactivity=None, source_file=None, batch_size=10000):
+    '''Yields the rows of an iterable (a sqlite cursor for example) and writes them
+       to the TSV export and the timeline, batch_size rows at a time. Passing it as
+       data_list to write_artifact_data_table exports the rows everywhere in a single
+       pass, without holding all of them in memory. The first column of the rows is
+       the timeline key.
+    '''
+    def export(batch):
+        if tsvname:
+            tsv(report_folder, data_headers, batch, tsvname, source_file)
+        if tlactivity:
+            timeline(report_folder, tlactivity, batch, data_headers)
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        yield row
+        if len(batch) == batch_size:
+            export(batch)
+            batch = []
+    if batch:
+        export(batch)
+
+
+class TimelineWriter:
+    '''Writes the rows of all artifacts to _Timeline/tl.db over a connection kept
+       open for the whole run. Rows are read from data_list as they are inserted
+       (it can be a generator) in batches of batch_size, one transaction per call.
+       The key and activity indexes are built once, by finish(), after all rows
+       are in.
+    '''
+    batch_size = 10000
+
+    def __init__(self):
+        self._db = None
+        self._db_path = None
+        self.reset_stats()
+        if hasattr(os, 'register_at_fork'):
+            # a forked worker opens its own connection
+            os.register_at_fork(before=self.close)
+
+    def _connect(self, tl_report_folder):
+        tldb = os.path.join(tl_report_folder, 'tl.db')
+        if self._db_path != tldb:
+            self.close()
+            os.makedirs(tl_report_folder, exist_ok=True)
+            self._db = sqlite3.connect(tldb)
+            self._db.execute('''PRAGMA synchronous = EXTRA''')
+            self._db.execute('''PRAGMA journal_mode = WAL''')
+            self._db.execute('''CREATE TABLE IF NOT EXISTS data(key TEXT, activity TEXT, datalist TEXT)''')
+            self._db.commit()
+            self._db_path = tldb
+        return self._db
+
+    def write(self, tl_report_folder, tlactivity, data_list, data_headers):
+        '''Adds the rows of data_list to the timeline, the first column being the key'''
+        db = self._connect(tl_report_folder)
+        to_json = self._json_row_encoder(data_headers)
+        activity_bytes = len(tlactivity.encode('utf-8'))
+        batch = []
+        try:
+            for entry in data_list:
+                entry = [str(field) for field in entry]
+                data_str = to_json(entry)
+                batch.append((entry[0], tlactivity, data_str))
+                self.bytes += len(entry[0].encode('utf-8')) + activity_bytes + len(data_str.encode('utf-8'))
+                if len(batch) == self.batch_size:
+                    self._insert(db, batch)
+                    batch = []
+            self._insert(db, batch)
+            start = monotonic()
+            db.commit()
+            self.seconds += monotonic() - start
+        except BaseException:
+            db.rollback()
+            raise
+
+    def _insert(self, db, batch):
+        # only the database work is timed, not the rows data_list produces
+        start = monotonic()
+        db.executemany("INSERT INTO data VALUES(?,?,?)", batch)
+        self.seconds += monotonic() - start
+        self.rows += len(batch)
 
+    @staticmethod
+    def _json_row_encoder(data_headers):
+        '''Returns a function giving json.dumps(dict(zip(data_headers, entry))) for a
+           row of strings, without building the dict when the headers allow it'''
+        if not all(isinstance(header, str) for header in data_headers) or len(set(data_headers)) != len(data_headers):
+            return lambda entry: json.dumps(dict(zip(data_headers, entry)))
+        keys = [encode_basestring_ascii(header) + ': ' for header in data_headers]
+        return lambda entry: '{' + ', '.join([key + encode_basestring_ascii(value)
+                                              for key, value in zip(keys, entry)]) + '}'
+
+    def stats(self):
+        '''Returns the rows and UTF-8 bytes written by this process, the seconds
+           spent inserting and committing them and the resulting insert rate'''
+        return {'rows': self.rows, 'bytes': self.bytes, 'seconds': self.seconds,
+                'rows_per_second': self.rows / self.seconds if self.seconds else 0.0}
+
+    def reset_stats(self):
+        self.rows = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def add_stats(self, stats):
+        '''Adds the counters of another process (a parallel worker) to those of this one'''
+        self.rows += stats['rows']
+        self.bytes += stats['bytes']
+        self.seconds += stats['seconds']
+
+    def finish(self, report_folder_base):
+        '''Indexes the timeline of report_folder_base, if any, and closes it'''
+        tl_report_folder = os.path.join(report_folder_base, '_Timeline')
+        if not os.path.exists(os.path.join(tl_report_folder, 'tl.db')):
+            return
+        db = self._connect(tl_report_folder)
+        with db:
+            db.execute('''CREATE INDEX IF NOT EXISTS data_key ON data(key)''')
+            db.execute('''CREATE INDEX IF NOT EXISTS data_activity ON data(activity)''')
+        self.close()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            self._db_path = None
+
+timeline_writer = TimelineWriter()
+
+
+@serialize_shared_output
 def timeline(report_folder, tlactivity, data_list, data_headers):
     report_folder = report_folder.rstrip('/')
     report_folder = report_folder.rstrip('\\')
     report_folder_base, tail = os.path.split(report_folder)
-    tl_report_folder = os.path.join(report_folder_base, '_Timeline')
+    timeline_writer.write(os.path.join(report_folder_base, '_Timeline'), tlactivity, data_list, data_headers)
 
-    if os.path.isdir(tl_report_folder):
-        tldb = os.path.join(tl_report_folder, 'tl.db')
-        db = sqlite3.connect(tldb)
-        cursor = db.cursor()
-        cursor.execute('''PRAGMA synchronous = EXTRA''')
-        cursor.execute('''PRAGMA journal_mode = WAL''')
-        db.commit()
-    else:
-        os.makedirs(tl_report_folder)
-        # create database
-        tldb = os.path.join(tl_report_folder, 'tl.db')
-        db = sqlite3.connect(tldb, isolation_level = 'exclusive')
-        cursor = db.cursor()
-        cursor.execute(
-            """
-            CREATE TABLE data(key TEXT, activity TEXT, datalist TEXT)
-            """
-        )
-        db.commit()
 
-    for entry in data_list:
-        entry = [str(field) for field in entry]
-        
-        data_dict = dict(zip(data_headers, entry))
+class MediaResolver:
+    '''Finds the paths of files_found that contain a media path or identifier, as
+       media_to_html does for every row of a report, without testing each path.
+       The path components are indexed once by their trigrams: a lookup takes the
+       longest part of the media path, finds the components containing it through
+       its least common trigram, then tests the paths having one of them. Lookups,
+       MIME types and the copies made to the report folders are cached, so a file
+       is only copied once.
+    '''
+    separators_re = re.compile(r'[\\/]')
+    gram_length = 3
+
+    def __init__(self, files_found):
+        self.files = files_found
+        self.file_count = len(files_found)
+        self.paths = [str(path) for path in files_found]
+        component_paths = {}
+        for index, path in enumerate(self.paths):
+            for component in set(self.separators_re.split(path)):
+                component_paths.setdefault(component, []).append(index)
+        self.components = list(component_paths)
+        self.component_paths = list(component_paths.values())
+        n = self.gram_length
+        self.gram_components = {}
+        for component_index, component in enumerate(self.components):
+            for gram in {component[i:i + n] for i in range(len(component) - n + 1)}:
+                self.gram_components.setdefault(gram, []).append(component_index)
+        self.lookups = {}
+        self.mimetypes = {}
+        self.sources = {}
+
+    def matches(self, media_path):
+        '''Returns the paths of files_found containing media_path, in files_found order'''
+        found = self.lookups.get(media_path)
+        if found is None:
+            found = self.lookups[media_path] = self._find(media_path)
+        return found
+
+    def _find(self, media_path):
+        key = max(self.separators_re.split(media_path), key=len)
+        n = self.gram_length
+        if len(key) < n:
+            return [self.files[index] for index, path in enumerate(self.paths) if media_path in path]
+        component_indices = min((self.gram_components.get(key[i:i + n], ()) for i in range(len(key) - n + 1)), key=len)
+        candidates = set()
+        for component_index in component_indices:
+            if key in self.components[component_index]:
+                candidates.update(self.component_paths[component_index])
+        return [self.files[index] for index in sorted(candidates) if media_path in self.paths[index]]
+
+    def mimetype(self, path):
+        mimetype = self.mimetypes.get(path)
+        if mimetype is None:
+            mimetype = self.mimetypes[path] = guess_mime(path) or ''
+        return mimetype
+
+    def copy_to_report(self, path, report_folder):
+        '''Copies path to a folder of report_folder named as its parent folder, once.
+           Returns the path of the copy'''
+        source = self.sources.get((path, report_folder))
+        if source is None:
+            locationfiles = Path(report_folder).joinpath(os.path.basename(os.path.dirname(path)))
+            locationfiles.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(path, locationfiles)
+            source = self.sources[(path, report_folder)] = str(Path(locationfiles, Path(path).name))
+        return source
+
+    def media_to_html(self, media_path, report_folder):
+        '''See media_to_html'''
+        def relative_paths(source, splitter):
+            splitted_a = source.split(splitter)
+            for x in splitted_a:
+                if 'LEAPP_Reports_' in x:
+                    report_folder = x
+
+            splitted_b = source.split(report_folder)
+            return '.' + splitted_b[1]
+
+        platform = is_platform_windows()
+        if platform:
+            media_path = media_path.replace('/', '\\')
+            splitter = '\\'
+        else:
+            splitter = '/'
+
+        thumb = media_path
+        for match in self.matches(media_path):
+            filename = os.path.basename(match)
+            if filename.startswith('~') or filename.startswith('._'):
+                continue
+
+            dirs = os.path.dirname(report_folder)
+            dirs = os.path.dirname(dirs)
+            env_path = os.path.join(dirs, 'temp')
+            if env_path in match:
+                source = match
+                source = relative_paths(source, splitter)
+            else:
+                source = relative_paths(self.copy_to_report(match, report_folder), splitter)
 
-        data_str = json.dumps(data_dict)
-        cursor.executemany(
-            "INSERT INTO data VALUES(?,?,?)", [(str(entry[0]), tlactivity, data_str)])
+            mimetype = self.mimetype(match)
 
-    db.commit()
-    db.close()
+            if 'video' in mimetype:
+                thumb = f'<video width="320" height="240" controls="controls"><source src="{source}" type="video/mp4" preload="none">Your browser does not support the video tag.</video>'
+            elif 'image' in mimetype:
+                thumb = f'<a href="{source}" target="_blank"><img src="{source}"width="300"></img></a>'
+            elif 'audio' in mimetype:
+                thumb = f'<audio controls><source src="{source}" type="audio/ogg"><source src="{source}" type="audio/mpeg">Your browser does not support the audio element.</audio>'
+            else:
+                thumb = f'<a href="{source}" target="_blank"> Link to {filename} file</>'
+        return thumb
 
 
+# Resolver of the last files_found given to media_resolver
+_media_resolver = None
+
+def media_resolver(files_found):
+    '''Returns the MediaResolver of files_found. Artifacts look up the media of all
+       their rows in the same files_found, its resolver is kept while it is passed
+       again, unchanged in length.
+    '''
+    global _media_resolver
+    if not hasattr(files_found, '__len__'):
+        return MediaResolver(list(files_found))
+    resolver = _media_resolver
+    if resolver is None or resolver.files is not files_found or resolver.file_count != len(files_found):
+        resolver = _media_resolver = MediaResolver(files_found)
+    return resolver
+
 def media_to_html(media_path, files_found, report_folder):
     """
     Show selected media files in the HTML report with proper relative pathing.
@@ -338,64 +692,10 @@ def media_to_html(media_path, files_found, report_folder):
     :return: The relative path to the file in the report folder with proper HTML tags applied.
     :rtype: str
     """
-
-    def media_path_filter(name):
-        return media_path in name
-
-    def relative_paths(source, splitter):
-        splitted_a = source.split(splitter)
-        for x in splitted_a:
-            if 'LEAPP_Reports_' in x:
-                report_folder = x
-
-        splitted_b = source.split(report_folder)
-        return '.' + splitted_b[1]
-
-    platform = is_platform_windows()
-    if platform:
-        media_path = media_path.replace('/', '\\')
-        splitter = '\\'
-    else:
-        splitter = '/'
-
-    thumb = media_path
-    for match in filter(media_path_filter, files_found):
-        filename = os.path.basename(match)
-        if filename.startswith('~') or filename.startswith('._'):
-            continue
-
-        dirs = os.path.dirname(report_folder)
-        dirs = os.path.dirname(dirs)
-        env_path = os.path.join(dirs, 'temp')
-        if env_path in match:
-            source = match
-            source = relative_paths(source, splitter)
-        else:
-            path = os.path.dirname(match)
-            dirname = os.path.basename(path)
-            filename = Path(match)
-            filename = filename.name
-            locationfiles = Path(report_folder).joinpath(dirname)
-            Path(f'{locationfiles}').mkdir(parents=True, exist_ok=True)
-            shutil.copy2(match, locationfiles)
-            source = Path(locationfiles, filename)
-            source = relative_paths(str(source), splitter)
-
-        mimetype = guess_mime(match)
-        if mimetype == None:
-            mimetype = ''
-
-        if 'video' in mimetype:
-            thumb = f'<video width="320" height="240" controls="controls"><source src="{source}" type="video/mp4" preload="none">Your browser does not support the video tag.</video>'
-        elif 'image' in mimetype:
-            thumb = f'<a href="{source}" target="_blank"><img src="{source}"width="300"></img></a>'
-        elif 'audio' in mimetype:
-            thumb = f'<audio controls><source src="{source}" type="audio/ogg"><source src="{source}" type="audio/mpeg">Your browser does not support the audio element.</audio>'
-        else:
-            thumb = f'<a href="{source}" target="_blank"> Link to {filename} file</>'
-    return thumb
+    return media_resolver(files_found).media_to_html(media_path, report_folder)
 
 
+@serialize_shared_output
 def kmlgen(report_folder, kmlactivity, data_list, data_headers):
     report_folder = report_folder.rstrip('/')
     report_folder = report_folder.rstrip('\\')
@@ -442,290 +742,8 @@ def kmlgen(report_folder, kmlactivity, data_list, data_headers):
 
 def abxread(in_path,
             multi_root):  # multi_root should be False under most circumstances. File with no root tags set the multi_root argument to True.
-
-    """
-    Copyright 2021-2022, CCL Forensics
-    Permission is hereby granted, free of charge, to any person obtaining a copy of
-    this software and associated documentation files (the "Software"), to deal in
-    the Software without restriction, including without limitation the rights to
-    use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
-    of the Software, and to permit persons to whom the Software is furnished to do
-    so, subject to the following conditions:
-    The above copyright notice and this permission notice shall be included in all
-    copies or substantial portions of the Software.
-    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
-    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
-    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
-    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
-    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
-    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
-    SOFTWARE.
-    """
-
-    import base64
-    import enum
-    import struct
-    import typing
-    import xml.etree.ElementTree as etree
-
-    __version__ = "0.2.0"
-    __description__ = "Python module to convert Android ABX binary XML files"
-    __contact__ = "Alex Caithness"
-
-    # See: base/core/java/com/android/internal/util/BinaryXmlSerializer.java
-
-    class AbxDecodeError(Exception):
-        pass
-
-    class XmlType(enum.IntEnum):
-        # These first constants are from: libcore/xml/src/main/java/org/xmlpull/v1/XmlPullParser.java
-        # most of them are unused, but here for completeness
-        START_DOCUMENT = 0
-        END_DOCUMENT = 1
-        START_TAG = 2
-        END_TAG = 3
-        TEXT = 4
-        CDSECT = 5
-        ENTITY_REF = 6
-        IGNORABLE_WHITESPACE = 7
-        PROCESSING_INSTRUCTION = 8
-        COMMENT = 9
-        DOCDECL = 10
-
-        ATTRIBUTE = 15
-
-    class DataType(enum.IntEnum):
-        TYPE_NULL = 1 << 4
-        TYPE_STRING = 2 << 4
-        TYPE_STRING_INTERNED = 3 << 4
-        TYPE_BYTES_HEX = 4 << 4
-        TYPE_BYTES_BASE64 = 5 << 4
-        TYPE_INT = 6 << 4
-        TYPE_INT_HEX = 7 << 4
-        TYPE_LONG = 8 << 4
-        TYPE_LONG_HEX = 9 << 4
-        TYPE_FLOAT = 10 << 4
-        TYPE_DOUBLE = 11 << 4
-        TYPE_BOOLEAN_TRUE = 12 << 4
-        TYPE_BOOLEAN_FALSE = 13 << 4
-
-    class AbxReader:
-        MAGIC = b"ABX\x00"
-
-        def _read_raw(self, length):
-            buff = self._stream.read(length)
-            if len(buff) < length:
-                raise ValueError(f"couldn't read enough data at offset: {self._stream.tell() - len(buff)}")
-            return buff
-
-        def _read_byte(self):
-            buff = self._read_raw(1)
-            return buff[0]
-
-        def _read_short(self):
-            buff = self._read_raw(2)
-            return struct.unpack(">h", buff)[0]
-
-        def _read_int(self):
-            buff = self._read_raw(4)
-            return struct.unpack(">i", buff)[0]
-
-        def _read_long(self):
-            buff = self._read_raw(8)
-            return struct.unpack(">q", buff)[0]
-
-        def _read_float(self):
-            buff = self._read_raw(4)
-            return struct.unpack(">f", buff)[0]
-
-        def _read_double(self):
-            buff = self._read_raw(8)
-            return struct.unpack(">d", buff)[0]
-
-        def _read_string_raw(self):
-            length = self._read_short()
-            if length < 0:
-                raise ValueError(f"Negative string length at offset {self._stream.tell() - 2}")
-            buff = self._read_raw(length)
-            return buff.decode("utf-8")
-
-        def _read_interned_string(self):
-            reference = self._read_short()
-            if reference == -1:
-                value = self._read_string_raw()
-                self._interned_strings.append(value)
-            else:
-                value = self._interned_strings[reference]
-            return value
-
-        def __init__(self, stream: typing.BinaryIO):
-            self._interned_strings = []
-            self._stream = stream
-
-        def read(self, *, is_multi_root=False):
-            """
-            Read the ABX file
-            :param is_multi_root: some xml files on Android contain multiple root elements making reading them using a
-            document model problematic. For these files, set is_multi_root to True and the output ElementTree will wrap
-            the elements in a single "root" element.
-            :return: ElementTree representation of the data.
-            """
-            magic = self._read_raw(len(AbxReader.MAGIC))
-            if magic != AbxReader.MAGIC:
-                raise ValueError(f"Invalid magic. Expected {AbxReader.MAGIC.hex()}; got: {magic.hex()}")
-
-            # document_opened = False
-            document_opened = True
-            root_closed = False
-            root = None
-            element_stack = []  # because ElementTree doesn't support parents we maintain a stack
-            if is_multi_root:
-                root = etree.Element("root")
-                element_stack.append(root)
-
-            while True:
-                # Read the token. This gives us the XML data type and the raw data type.
-                token_raw = self._stream.read(1)
-                if not token_raw:
-                    break
-                token = token_raw[0]
-
-                data_start_offset = self._stream.tell()
-
-                # The lower nibble gives us the XML type. This is mostly defined in XmlPullParser.java, other than
-                # ATTRIBUTE which is from BinaryXmlSerializer
-                xml_type = token & 0x0f
-                if xml_type == XmlType.START_DOCUMENT:
-                    # Since Android 13, START_DOCUMENT can essentially be considered no-op as it's implied by the reader to
-                    # always be present (regardless of whether it is).
-                    if token & 0xf0 != DataType.TYPE_NULL:
-                        raise AbxDecodeError(
-                            f"START_DOCUMENT with an invalid data type at offset {data_start_offset - 1}")
-                    # if document_opened:
-                    # if not root_closed:
-                    #     raise AbxDecodeError(f"Unexpected START_DOCUMENT at offset {data_start_offset - 1}")
-                    document_opened = True
-
-                elif xml_type == XmlType.END_DOCUMENT:
-                    if token & 0xf0 != DataType.TYPE_NULL:
-                        raise AbxDecodeError(
-                            f"END_DOCUMENT with an invalid data type at offset {data_start_offset - 1}")
-                    if not (len(element_stack) == 0 or (len(element_stack) == 1 and is_multi_root)):
-                        raise AbxDecodeError(f"END_DOCUMENT with unclosed elements at offset {data_start_offset - 1}")
-                    if not document_opened:
-                        raise AbxDecodeError(f"END_DOCUMENT before document started at offset {data_start_offset - 1}")
-                    break
-
-                elif xml_type == XmlType.START_TAG:
-                    if token & 0xf0 != DataType.TYPE_STRING_INTERNED:
-                        raise AbxDecodeError(f"START_TAG with an invalid data type at offset {data_start_offset - 1}")
-                    if not document_opened:
-                        raise AbxDecodeError(f"START_TAG before document started at offset {data_start_offset - 1}")
-                    if root_closed:
-                        raise AbxDecodeError(
-                            f"START_TAG after root was closed started at offset {data_start_offset - 1}")
-
-                    tag_name = self._read_interned_string()
-                    if len(element_stack) == 0:
-                        element = etree.Element(tag_name)
-                        element_stack.append(element)
-                        root = element
-                    else:
-                        element = etree.SubElement(element_stack[-1], tag_name)
-                        element_stack.append(element)
-
-                elif xml_type == XmlType.END_TAG:
-                    if token & 0xf0 != DataType.TYPE_STRING_INTERNED:
-                        raise AbxDecodeError(f"END_TAG with an invalid data type at offset {data_start_offset}")
-                    if len(element_stack) == 0 or (is_multi_root and len(element_stack) == 1):
-                        raise AbxDecodeError(f"END_TAG without any elements left at offset {data_start_offset}")
-
-                    tag_name = self._read_interned_string()
-                    if element_stack[-1].tag != tag_name:
-                        raise AbxDecodeError(
-                            f"Unexpected END_TAG name at {data_start_offset}. "
-                            f"Expected: {element_stack[-1].tag}; got: {tag_name}")
-
-                    last = element_stack.pop()
-                    if len(element_stack) == 0:
-                        root_closed = True
-                        root = last
-                elif xml_type == XmlType.TEXT:
-                    value = self._read_string_raw()
-                    if len(element_stack[-1]):
-                        if len(value.strip()) == 0:  # layout whitespace can be safely discarded
-                            continue
-                        raise NotImplementedError("Can't deal with elements with mixed text and element contents")
-
-                    if element_stack[-1].text is None:
-                        element_stack[-1].text = value
-                    else:
-                        element_stack[-1].text += value
-                elif xml_type == XmlType.ATTRIBUTE:
-                    if len(element_stack) == 0 or (is_multi_root and len(element_stack) == 1):
-                        raise AbxDecodeError(f"ATTRIBUTE without any elements left at offset {data_start_offset}")
-
-                    attribute_name = self._read_interned_string()
-
-                    if attribute_name in element_stack[-1].attrib:
-                        raise AbxDecodeError(f"ATTRIBUTE name already in target element at offset {data_start_offset}")
-
-                    data_type = token & 0xf0
-
-                    if data_type == DataType.TYPE_NULL:
-                        value = None  # remember to output xml as "null"
-                    elif data_type == DataType.TYPE_BOOLEAN_TRUE:
-                        # value = True  # remember to output xml as "true"
-                        value = "true"
-                    elif data_type == DataType.TYPE_BOOLEAN_FALSE:
-                        # value = False  # remember to output xml as "false"
-                        value = "false"
-                    elif data_type == DataType.TYPE_INT:
-                        value = self._read_int()
-                    elif data_type == DataType.TYPE_INT_HEX:
-                        value = f"{self._read_int():x}"  # don't do this conversion in dict
-                    elif data_type == DataType.TYPE_LONG:
-                        value = self._read_long()
-                    elif data_type == DataType.TYPE_LONG_HEX:
-                        value = f"{self._read_long():x}"  # don't do this conversion in dict
-                    elif data_type == DataType.TYPE_FLOAT:
-                        value = self._read_float()
-                    elif data_type == DataType.TYPE_DOUBLE:
-                        value = self._read_double()
-                    elif data_type == DataType.TYPE_STRING:
-                        value = self._read_string_raw()
-                    elif data_type == DataType.TYPE_STRING_INTERNED:
-                        value = self._read_interned_string()
-                    elif data_type == DataType.TYPE_BYTES_HEX:
-                        length = self._read_short()  # is this safe?
-                        value = self._read_raw(length)
-                        value = value.hex()  # skip this step for dict
-                    elif data_type == DataType.TYPE_BYTES_BASE64:
-                        length = self._read_short()  # is this safe?
-                        value = self._read_raw(length)
-                        value = base64.encodebytes(value).decode().strip()
-                    else:
-                        raise AbxDecodeError(f"Unexpected attribute datatype at offset: {data_start_offset}")
-
-                    element_stack[-1].attrib[attribute_name] = str(value)
-                else:
-                    raise NotImplementedError(f"unexpected XML type: {xml_type}")
-
-            if not (root_closed or (is_multi_root and len(element_stack) == 1 and element_stack[0] is root)):
-                raise AbxDecodeError("Elements still in the stack when completing the document")
-
-            if root is None:
-                raise AbxDecodeError("Document was never assigned a root element")
-
-            tree = etree.ElementTree(root)
-
-            return tree
-
-    with open(in_path, "rb") as f:
-        reader = AbxReader(f)
-        doc = reader.read(is_multi_root=multi_root)
-        # print(etree.tostring(doc.getroot()).decode())
-    return doc
+    """Reads an Android binary XML (ABX) file into an ElementTree, see scripts/ccl_abx.py"""
+    return ccl_abx.read_file(in_path, is_multi_root=multi_root)
 
 
 def checkabx(in_path):
@@ -352,59 +352,26 @@ import json
 import traceback
 import os
 
+from scripts.protobuf_wire import read_fixed, read_tag, read_varint
+
 strings = []
 
 def GetDynamicWireFormat(data, start, end):
-    wire_type = data[start] & 0x7
     firstByte = data[start]
     if (firstByte & 0x80) == 0:
-        field_number = (firstByte >> 3)
-        return (start+1, wire_type, field_number)
-    else:
-        byteList = []
-        pos = 0
-        while True:
-            if start+pos >= end:
-                return (None, None, None)
-            oneByte = data[start+pos]
-            byteList.append(oneByte & 0x7F)
-            pos = pos + 1
-            if oneByte & 0x80 == 0x0:
-                break;
-
-        newStart = start + pos
-
-        index = len(byteList) - 1
-        field_number = 0
-        while index >= 0:
-            field_number = (field_number << 0x7) + byteList[index]
-            index = index - 1
-
-        field_number = (field_number >> 3)
-        return (newStart, wire_type, field_number)
+        return (start+1, firstByte & 0x7, firstByte >> 3)
+    (field_number, wire_type, newStart) = read_tag(data, start, end)
+    if field_number == None:
+        return (None, None, None)
+    return (newStart, wire_type, field_number)
 
 
 
 #return (num, newStart, success)
 def RetrieveInt(data, start, end):
-    pos = 0
-    byteList = []
-    while True:
-        if start+pos >= end:
-            return (None, None, False)
-        oneByte = data[start+pos]
-        byteList.append(oneByte & 0x7F)
-        pos = pos + 1
-        if oneByte & 0x80 == 0x0:
-            break;
-
-    newStart = start + pos
-
-    index = len(byteList) - 1
-    num = 0
-    while index >= 0:
-        num = (num << 0x7) + byteList[index]
-        index = index - 1
+    num, newStart = read_varint(data, start, end)
+    if num == None:
+        return (None, None, False)
     return (num, newStart, True)
 
 
@@ -438,18 +405,9 @@ def ParseData(data, start, end, messages, depth = 0):
             ordinary  = ordinary + 1
 
         elif wire_type == 0x01:#64-bit
-            num = 0
-            pos = 7
-            while pos >= 0:
-                #if start+1+pos >= end:
-                if start+pos >= end:
-                    return False
-                #num = (num << 8) + ord(data[start+1+pos])
-                num = (num << 8) + data[start+pos]
-                pos = pos - 1
-
-            #start = start + 9
-            start = start + 8
+            (num, start) = read_fixed(data, start, 8, end)
+            if num == None:
+                return False
             try:
                 floatNum = struct.unpack('d',struct.pack('q',num))
                 floatNum = floatNum[0]
@@ -521,19 +479,9 @@ def ParseData(data, start, end, messages, depth = 0):
             start = start+stringLen
 
         elif wire_type == 0x05:#32-bit
-            num = 0
-            pos = 3
-            while pos >= 0:
-
-                #if start+1+pos >= end:
-                if start+pos >= end:
-                    return False
-                #num = (num << 8) + ord(data[start+1+pos])
-                num = (num << 8) + data[start+pos]
-                pos = pos - 1
-
-            #start = start + 5
-            start = start + 4
+            (num, start) = read_fixed(data, start, 4, end)
+            if num == None:
+                return False
             try:
                 floatNum = struct.unpack('f',struct.pack('i',num))
                 floatNum = floatNum[0]
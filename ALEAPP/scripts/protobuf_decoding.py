@@ -0,0 +1,281 @@
+# Faster blackboxprotobuf.decode_message for the artifact modules.
+#
+# blackboxprotobuf guesses the type of each length delimited field of each blob
+# (a message if it parses as one, bytes otherwise), and decodes the repeats of a
+# field in a blob with the type guessed for its first occurrence. A typedef
+# learned from the first blobs of a column would decode later blobs differently,
+# so the guessing is kept: decode_message() here is the same algorithm as
+# blackboxprotobuf 1.0.1 (the version requirements.txt gets along with
+# protobuf 3.10), with the varints read inline and the typedefs copied on write
+# instead of deep copied for every message. Anything unusual (errors, named
+# message types, very deep nesting, another blackboxprotobuf version) is left to
+# blackboxprotobuf itself, so the values, typedefs and exceptions are the same.
+
+import copy
+import multiprocessing
+import os
+import struct
+
+from concurrent.futures import ProcessPoolExecutor
+
+import blackboxprotobuf
+
+# Same decoding as the installed blackboxprotobuf: the 1.0.1 layout (lib.interface, lib.types.type_maps)
+try:
+    import blackboxprotobuf.lib.interface
+    import blackboxprotobuf.lib.types.type_maps
+    compatible_library = not hasattr(blackboxprotobuf.lib, 'config')
+except ImportError:
+    compatible_library = False
+
+# Pool processes import the main module again, which only the guarded command line
+# entry point allows: aleapp.py sets this, aleappGUI.py builds its window when imported
+process_pool_allowed = False
+
+class _Fallback(Exception):
+    '''Raised for blobs left to blackboxprotobuf'''
+
+_varint_mask = (1 << 64) - 1
+_sign_bit = 1 << 63
+
+def _read_varint(buf, pos):
+    '''Unsigned varint at pos, as decoder._DecodeVarint'''
+    result = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        result |= (b & 0x7f) << shift
+        pos += 1
+        if not b & 0x80:
+            return result & _varint_mask, pos
+        shift += 7
+        if shift >= 64:
+            raise ValueError('Too many bytes when decoding varint.')
+
+def _read_signed_varint(buf, pos):
+    '''Signed varint at pos, as decoder._DecodeSignedVarint'''
+    b = buf[pos]
+    if b < 0x80:
+        return b, pos + 1
+    result, pos = _read_varint(buf, pos)
+    return (result ^ _sign_bit) - _sign_bit, pos
+
+def _decode_uint(buf, pos):
+    return _read_varint(buf, pos)
+
+def _decode_sint(buf, pos):
+    value, pos = _read_varint(buf, pos)
+    # zigzag
+    if value & 1:
+        return ~(value >> 1), pos
+    return value >> 1, pos
+
+def _decode_bytes(buf, pos):
+    length, pos = _read_signed_varint(buf, pos)
+    end = pos + length
+    return buf[pos:end], end
+
+def _decode_str(buf, pos):
+    value, end = _decode_bytes(buf, pos)
+    return value.decode('utf-8', 'backslashreplace'), end
+
+def _struct_decoder(fmt):
+    unpack = struct.Struct(fmt).unpack
+    size = struct.calcsize(fmt)
+    def decode(buf, pos):
+        new_pos = pos + size
+        return unpack(buf[pos:new_pos])[0], new_pos
+    return decode
+
+def _packed_decoder(decode_value):
+    def decode(buf, pos):
+        length, pos = _read_signed_varint(buf, pos)
+        end = pos + length
+        output = []
+        while pos < end:
+            value, pos = decode_value(buf, pos)
+            output.append(value)
+        if pos > end:
+            raise ValueError('Invalid Packed Field Length')
+        return output, pos
+    return decode
+
+_decoders = {
+    'uint': _decode_uint,
+    'int': _read_signed_varint,
+    'sint': _decode_sint,
+    'fixed32': _struct_decoder('<I'),
+    'sfixed32': _struct_decoder('<i'),
+    'float': _struct_decoder('<f'),
+    'fixed64': _struct_decoder('<Q'),
+    'sfixed64': _struct_decoder('<q'),
+    'double': _struct_decoder('<d'),
+    'bytes': _decode_bytes,
+    'str': _decode_str,
+}
+for _name in ('uint', 'int', 'sint', 'fixed32', 'sfixed32', 'float', 'fixed64', 'sfixed64', 'double'):
+    _decoders['packed_' + _name] = _packed_decoder(_decoders[_name])
+
+_wiretypes = {
+    'uint': 0, 'int': 0, 'sint': 0,
+    'fixed32': 5, 'sfixed32': 5, 'float': 5,
+    'fixed64': 1, 'sfixed64': 1, 'double': 1,
+    'bytes': 2, 'str': 2, 'message': 2, 'group': 3,
+}
+for _name in ('uint', 'int', 'sint', 'fixed32', 'sfixed32', 'float', 'fixed64', 'sfixed64', 'double'):
+    _wiretypes['packed_' + _name] = 2
+
+# wire type: default type, None for the length delimited ones that are guessed and END_GROUP
+_wire_type_defaults = {0: 'int', 1: 'fixed64', 2: None, 3: 'group', 4: None, 5: 'fixed32'}
+
+def _decode_lendelim_message(buf, typedef, pos):
+    length, pos = _read_signed_varint(buf, pos)
+    return _decode_message(buf, typedef, pos, pos + length, False)
+
+def _decode_message(buf, typedef, pos, end, group):
+    '''blackboxprotobuf.lib.types.length_delim.decode_message, the typedef given is not modified'''
+    if end is None:
+        end = len(buf)
+    if typedef is None:
+        original = {}
+        typedef = {}
+    else:
+        # field typedefs are copied when they are used, the others are shared with the typedef given
+        original = typedef
+        typedef = dict(typedef)
+    output = {}
+
+    while pos < end:
+        # Read in a field
+        tag = buf[pos]
+        if tag < 0x80:
+            pos += 1
+        else:
+            tag, pos = _read_varint(buf, pos)
+        field_number = str(tag >> 3)
+        wire_type = tag & 7
+        orig_field_number = field_number
+
+        field_typedef = typedef.get(field_number)
+        if field_typedef is None:
+            field_typedef = {'type': _wire_type_defaults[wire_type]}
+        elif field_typedef is original.get(field_number):
+            field_typedef = typedef[field_number] = dict(field_typedef)
+        field_type = field_typedef['type']
+
+        field_out = None
+        if field_type is None:
+            if wire_type == 2:
+                # Try to decode as a message first, then just do as bytes
+                try:
+                    field_out, message_typedef, pos = _decode_lendelim_message(buf, {}, pos)
+                    field_typedef['message_typedef'] = message_typedef
+                    field_type = 'message'
+                except (_Fallback, RecursionError):
+                    raise _Fallback()
+                except Exception:
+                    field_out, pos = _decode_bytes(buf, pos)
+                    field_type = 'bytes'
+            elif wire_type == 4:
+                if not group:
+                    raise ValueError('Found END_GROUP before START_GROUP')
+                return output, typedef, pos
+            else:
+                raise ValueError(f'Could not find default type for wiretype: {wire_type}')
+        elif field_type == 'message':
+            if 'message_typedef' in field_typedef:
+                message_typedef = field_typedef['message_typedef']
+            elif 'message_type_name' in field_typedef:
+                raise _Fallback()
+            else:
+                message_typedef = None
+            try:
+                field_out, message_typedef, pos = _decode_lendelim_message(buf, message_typedef, pos)
+                field_typedef['message_typedef'] = message_typedef
+            except (_Fallback, RecursionError):
+                raise _Fallback()
+            except Exception:
+                pass
+
+            # same as blackboxprotobuf from here, which can't add a second alternative typedef
+            if field_out is None and 'alt_typedefs' in field_typedef:
+                raise _Fallback()
+            if field_out is None:
+                # Still no typedef, try anonymous, and let the error propagate if it fails
+                field_out, message_typedef, pos = _decode_lendelim_message(buf, {}, pos)
+                field_typedef['alt_typedefs'] = {'1': message_typedef}
+                field_number = field_number + '-1'
+        elif field_type == 'group':
+            field_out, group_typedef, pos = _decode_message(buf, field_typedef.get('group_typedef'), pos, None, True)
+            field_typedef['group_typedef'] = group_typedef
+        else:
+            # Verify wiretype matches
+            if _wiretypes[field_type] != wire_type:
+                raise ValueError(f'Invalid wiretype for field number {field_number}. '
+                                 f'{field_type} is not wiretype {wire_type}')
+            field_out, pos = _decoders[field_type](buf, pos)
+        field_typedef['type'] = field_type
+        if 'name' not in field_typedef:
+            field_typedef['name'] = ''
+
+        field_key = field_number
+        if '-' not in field_number and field_typedef['name'] != '':
+            field_key = field_typedef['name']
+        # Deal with repeats
+        if field_key in output:
+            if isinstance(field_out, list):
+                if isinstance(output[field_number], list):
+                    output[field_key] += field_out
+                else:
+                    output[field_key] = field_out.append(output[field_key])
+            else:
+                if isinstance(output[field_number], list):
+                    output[field_key].append(field_out)
+                else:
+                    output[field_key] = [output[field_key], field_out]
+        else:
+            output[field_key] = field_out
+            typedef[orig_field_number] = field_typedef
+    if pos > end:
+        raise ValueError('Invalid Message Length')
+    if group:
+        raise ValueError('Got START_GROUP with no END_GROUP.')
+    return output, typedef, pos
+
+def decode_message(buf, message_type=None):
+    '''Decodes a protobuf message to a Python dictionary, as
+       blackboxprotobuf.decode_message. Returns tuple of (values, types)'''
+    if compatible_library and isinstance(buf, (bytes, bytearray)):
+        typedef = None
+        if isinstance(message_type, dict):
+            # the typedef returned doesn't share anything with the one given
+            typedef = copy.deepcopy(message_type)
+        elif message_type is None or isinstance(message_type, str):
+            if message_type not in blackboxprotobuf.lib.interface.known_messages:
+                typedef = {}
+        if typedef is not None:
+            try:
+                value, typedef, _ = _decode_message(buf, typedef, 0, len(buf), False)
+                return value, typedef
+            except Exception:
+                pass # errors, and what is not handled here, are left to blackboxprotobuf
+    return blackboxprotobuf.decode_message(buf, message_type)
+
+def _decode_messages(message_type, blobs):
+    return [decode_message(buf, message_type) for buf in blobs]
+
+def decode_messages(blobs, message_type=None, chunk_size=512):
+    '''decode_message() of each of blobs, returned as a list. Large lists are
+       decoded across a process pool when process_pool_allowed is set.'''
+    blobs = list(blobs)
+    workers = os.cpu_count() or 1
+    # plugin workers (--workers) can't start processes
+    if (not process_pool_allowed or workers == 1 or len(blobs) < 2 * chunk_size
+            or multiprocessing.current_process().daemon):
+        return _decode_messages(message_type, blobs)
+    chunks = [blobs[start:start + chunk_size] for start in range(0, len(blobs), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        decoded = []
+        for values in executor.map(_decode_messages, [message_type] * len(chunks), chunks):
+            decoded.extend(values)
+    return decoded
@@ -0,0 +1,62 @@
+# Low level protobuf wire format reading, shared by parse3 and ccl_protobuff.
+#
+# The readers work on offsets into bytes, bytearray or memoryview objects, so
+# messages are walked without a stream or a copy per field: a length delimited
+# value is just its (start, end) offsets, and an embedded message is only read
+# when the caller walks those offsets.
+
+WIRETYPE_VARINT = 0
+WIRETYPE_FIXED64 = 1
+WIRETYPE_LENGTH_DELIMITED = 2
+WIRETYPE_START_GROUP = 3
+WIRETYPE_END_GROUP = 4
+WIRETYPE_FIXED32 = 5
+
+def read_varint(data, pos, end=None, max_length=None):
+    '''The little endian base 128 varint in data at pos, as (value, position
+       after it). value is None if data ends (at end) before the varint does.
+       With max_length, the varint stops after max_length bytes.'''
+    if end is None:
+        end = len(data)
+    if pos >= end:
+        return None, pos
+    b = data[pos]
+    if b < 0x80:
+        return b, pos + 1
+    limit = end if max_length is None else min(end, pos + max_length)
+    if pos + 1 < limit:
+        b2 = data[pos + 1]
+        if b2 < 0x80:
+            return (b & 0x7f) | b2 << 7, pos + 2
+    start = pos
+    result = b & 0x7f
+    shift = 7
+    pos += 1
+    while pos < limit:
+        b = data[pos]
+        pos += 1
+        if b < 0x80:
+            return result | b << shift, pos
+        result |= (b & 0x7f) << shift
+        shift += 7
+    if max_length is not None and pos == start + max_length:
+        return result, pos
+    return None, pos
+
+def read_tag(data, pos, end=None):
+    '''The field key in data at pos, as (field number, wire type, position after
+       it). The field number is None if data ends before the key does.'''
+    tag, pos = read_varint(data, pos, end)
+    if tag is None:
+        return None, None, pos
+    return tag >> 3, tag & 0x07, pos
+
+def read_fixed(data, pos, size, end=None):
+    '''The unsigned little endian int of size bytes in data at pos, as (value,
+       position after it). value is None if data ends before it does.'''
+    if end is None:
+        end = len(data)
+    new_pos = pos + size
+    if new_pos > end:
+        return None, pos
+    return int.from_bytes(data[pos:new_pos], 'little'), new_pos
@@ -1,11 +1,12 @@
 import html
 import os
 import pathlib
-import shutil
 
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from scripts.asset_bundle import install_bundle
 from scripts.html_parts import *
-from scripts.ilapfuncs import logfunc
+from scripts.ilapfuncs import copy_file_rest, logfunc, log_writer
 from scripts.version_info import aleapp_version, aleapp_contributors
 
 # Icon Mappings Dictionary
@@ -976,7 +977,14 @@ def generate_report(reportfolderbase, time_in_secs, time_HMS, extraction_type, i
     # Get all files
     side_list = OrderedDict() # { Category1 : [path1, path2, ..], Cat2:[..] } Dictionary containing paths as values, key=category
 
-    for root, dirs, files in sorted(os.walk(reportfolderbase)):
+    def walk_report_folders():
+        for root, dirs, files in os.walk(reportfolderbase):
+            if root == reportfolderbase:
+                # _elements, _TSV Exports, _Table Data... hold no artifact pages
+                dirs[:] = [folder for folder in dirs if not folder.startswith('_')]
+            yield root, dirs, files
+
+    for root, dirs, files in sorted(walk_report_folders()):
         files = sorted(files)
         for file in files:
             if file.endswith(".temphtml"):
@@ -1002,61 +1010,23 @@ def generate_report(reportfolderbase, time_in_secs, time_HMS, extraction_type, i
                                                           tail.replace(".temphtml", ""))
 
     # Now that we have all the file paths, start writing the files
-
-    for path_list in side_list.values():
-        for path in path_list:
-            old_filename = os.path.basename(path)
-            filename = old_filename.replace(".temphtml", ".html")
-            # search for it in nav_list_data, then mark that one as 'active' tab
-            active_nav_list_data = mark_item_active(nav_list_data, filename) + nav_bar_script
-            artifact_data = get_file_content(path)
-
-            # Now write out entire html page for artifact
-            f = open(os.path.join(reportfolderbase, filename), 'w', encoding='utf8')
-            artifact_data = insert_sidebar_code(artifact_data, active_nav_list_data, path)
-            f.write(artifact_data)
-            f.close()
-
-            # Now delete .temphtml
-            os.remove(path)
-            # If dir is empty, delete it
-            try:
-                os.rmdir(os.path.dirname(path))
-            except OSError:
-                pass # Perhaps it was not empty!
+    # Pages are copied, not loaded in memory, so several are written at once
+    paths = [path for path_list in side_list.values() for path in path_list]
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+        for _ in executor.map(lambda path: finalize_artifact_page(path, reportfolderbase, nav_list_data), paths):
+            pass
+    for path in paths:
+        # If dir is empty, delete it
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass # Perhaps it was not empty!
 
     # Create index.html's page content
     create_index_html(reportfolderbase, time_in_secs, time_HMS, extraction_type, image_input_path, nav_list_data, casedata)
+    # The styles and scripts are bundled once for all the reports of the output folder
     elements_folder = os.path.join(reportfolderbase, '_elements')
-    os.mkdir(elements_folder)
-    __location__ = os.path.dirname(os.path.abspath(__file__))
-    
-    shutil.copy2(os.path.join(__location__,"logo.jpg"), elements_folder)
-    shutil.copy2(os.path.join(__location__,"dashboard.css"), elements_folder)
-    shutil.copy2(os.path.join(__location__,"feather.min.js"), elements_folder)
-    shutil.copy2(os.path.join(__location__,"dark-mode.css"), elements_folder)
-    shutil.copy2(os.path.join(__location__,"dark-mode-switch.js"), elements_folder)
-    shutil.copytree(os.path.join(__location__,"MDB-Free_4.13.0"), os.path.join(elements_folder, 'MDB-Free_4.13.0'))
-    # Chart.js
-    shutil.copy2(os.path.join(__location__,"chart.umd.min.js"), elements_folder)
-    # Moment
-    shutil.copy2(os.path.join(__location__,"moment.min.js"), elements_folder)
-    # D3
-    shutil.copy2(os.path.join(__location__,"d3.v7.min.js"), elements_folder)
-    # Popper
-    shutil.copy2(os.path.join(__location__,"popper.min.js"), elements_folder)
-    # Cal-Heatmap
-    shutil.copy2(os.path.join(__location__,"cal-heatmap.css"), elements_folder)
-    shutil.copy2(os.path.join(__location__,"cal-heatmap.min.js"), elements_folder)
-    shutil.copy2(os.path.join(__location__,"Tooltip.min.js"), elements_folder)
-    # Highlight.js
-    shutil.copy2(os.path.join(__location__,"highlight.min.css"), elements_folder)
-    shutil.copy2(os.path.join(__location__,"highlight.min.js"), elements_folder)
-    # Garmin Custom JS
-    shutil.copy2(os.path.join(__location__,"garmin-functions.js"), elements_folder)
-    shutil.copytree(os.path.join(__location__,"timeline"), os.path.join(elements_folder, 'timeline'))
-    shutil.copy2(os.path.join(__location__,"chat.css"), elements_folder)
-    shutil.copy2(os.path.join(__location__,"chat.js"), elements_folder)
+    install_bundle(elements_folder, os.path.join(os.path.dirname(reportfolderbase), '_ALEAPP_assets'))
 
 def get_file_content(path):
     f = open(path, 'r', encoding='utf8')
@@ -1092,6 +1062,7 @@ def create_index_html(reportfolderbase, time_in_secs, time_HMS, extraction_type,
             </p>
         """
 
+    log_writer.flush() # the logs are read back into the report below
     # Get script run log (this will be tab2)
     devinfo_files_path = os.path.join(reportfolderbase, 'Script Logs', 'DeviceInfo.html')
     tab2_content = get_file_content(devinfo_files_path)
@@ -1181,6 +1152,41 @@ def generate_key_val_table_without_headings(title, data_list, html_escape=True,
 
     return code
 
+def finalize_artifact_page(path, reportfolderbase, nav_list_data):
+    '''Writes the final html page of a .temphtml artifact page to reportfolderbase,
+       with the sidebar marking it active, then deletes the .temphtml'''
+    filename = os.path.basename(path).replace(".temphtml", ".html")
+    # search for it in nav_list_data, then mark that one as 'active' tab
+    active_nav_list_data = mark_item_active(nav_list_data, filename) + nav_bar_script
+    write_page_with_sidebar(path, os.path.join(reportfolderbase, filename), active_nav_list_data)
+    os.remove(path)
+
+def write_page_with_sidebar(path, out_path, sidebar_code, chunk_size=65536):
+    '''Copies the page at path to out_path, replacing the sidebar placeholder with
+       sidebar_code. Only the part before the placeholder is read in memory, the
+       rest of the page is copied as is.'''
+    placeholder = body_sidebar_dynamic_data_placeholder.encode('utf8')
+    with open(path, 'rb') as page, open(out_path, 'wb') as out:
+        head = b''
+        while True:
+            chunk = page.read(chunk_size)
+            head += chunk
+            pos = head.find(placeholder)
+            if pos >= 0 or not chunk:
+                break
+            # keep what could be the start of the placeholder, write the rest
+            keep = len(placeholder) - 1
+            out.write(head[:-keep])
+            head = head[-keep:]
+        if pos < 0:
+            logfunc(f'Error, could not find {body_sidebar_dynamic_data_placeholder} in file {path}')
+            out.write(head)
+            return
+        out.write(head[:pos])
+        out.write(sidebar_code.encode('utf8'))
+        out.write(head[pos + len(placeholder):])
+        copy_file_rest(page, out)
+
 def insert_sidebar_code(data, sidebar_code, filename):
     pos = data.find(body_sidebar_dynamic_data_placeholder)
     if pos < 0:
@@ -1,103 +1,665 @@
 import time as timex
 import fnmatch
+import io
+import mmap
+import json
 import os
+import re
+import shutil
+import sqlite3
+import struct
 import tarfile
+import zlib
 
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import chain
 from pathlib import Path
 from scripts.ilapfuncs import *
-from zipfile import ZipFile
+from stat import S_ISDIR
+from zipfile import ZipFile, ZIP_STORED
 
 from fnmatch import _compile_pattern
 from functools import lru_cache
 normcase = lru_cache(maxsize=None)(os.path.normcase)
 
+def glob_name_hints(filepattern):
+    '''Splits a (normcased) glob pattern on path separators and returns a list of
+       (kind, text) hints, kind being 'equals', 'startswith' or 'endswith'. Any
+       path matched by the pattern has a component satisfying each hint.
+       Returns an empty list if a [...] set spans a path separator, as the
+       pattern cannot be split safely then.
+    '''
+    sep = normcase('/')
+    i, n = 0, len(filepattern)
+    while i < n: # locate [...] sets the same way fnmatch.translate does
+        if filepattern[i] == '[':
+            j = i + 1
+            if j < n and filepattern[j] == '!':
+                j += 1
+            if j < n and filepattern[j] == ']':
+                j += 1
+            while j < n and filepattern[j] != ']':
+                j += 1
+            if j < n and sep in filepattern[i:j]:
+                return []
+            i = j
+        i += 1
+    hints = []
+    components = filepattern.split(sep)
+    for position, component in enumerate(components):
+        wildcards = [component.find(c) for c in '*?[' if c in component]
+        if not wildcards:
+            if component:
+                hints.append(('equals', component))
+            continue
+        # '*' also matches separators, so a partial component is only anchored
+        # where it touches a literal separator (or the end of the pattern)
+        prefix = component[:min(wildcards)]
+        if prefix and position > 0:
+            hints.append(('startswith', prefix))
+        if '[' not in component:
+            suffix = component[max(component.rfind('*'), component.rfind('?')) + 1:]
+            if suffix:
+                hints.append(('endswith', suffix))
+    return hints
+
+FileStat = namedtuple('FileStat', 'size mtime is_dir')
+
+class FilePatternSet:
+    '''Matches many glob patterns against a path at once. Each pattern is filed
+       under a literal path component it requires, so only the patterns whose
+       component occurs in the path are tried.
+    '''
+    def __init__(self, filepatterns):
+        self.filepatterns = list(dict.fromkeys(filepatterns))
+        self._by_component = {} # normcased component -> [(pattern, required text, compiled pattern)]
+        self._unanchored = []   # patterns without a literal component, always tried
+        for filepattern in self.filepatterns:
+            normalized = normcase(filepattern)
+            # longest wildcard free run, a cheap substring test before the regex
+            required = '' if '[' in normalized else max(re.split(r'[*?]', normalized), key=len)
+            entry = (filepattern, required, _compile_pattern(normalized))
+            names = [text for kind, text in glob_name_hints(normalized) if kind == 'equals']
+            if names:
+                # longer components (package names) are rarer than 'databases' or 'files'
+                self._by_component.setdefault(max(names, key=len), []).append(entry)
+            else:
+                self._unanchored.append(entry)
+
+    def match(self, path):
+        '''Returns the patterns that match path, which must already be normcased'''
+        matched = [filepattern for filepattern, required, pat in self._unanchored
+                   if required in path and pat(path) is not None]
+        by_component = self._by_component
+        for component in set(path.split(normcase('/'))):
+            for filepattern, required, pat in by_component.get(component, ()):
+                if required in path and pat(path) is not None:
+                    matched.append(filepattern)
+        return matched
+
+class ListingCache:
+    '''Listings of the evidence read by earlier runs, kept in a SQLite database in
+       the base output folder so that running the same evidence again with another
+       profile does not walk the whole tree or read all the archive headers again.
+       Each listing is stored as JSON with a fingerprint of the evidence and is
+       only used while it still matches.
+    '''
+    file_name = 'ALEAPP_listing_cache.db'
+    format_version = 2
+
+    def __init__(self, output_folder):
+        self.db_path = os.path.join(output_folder, self.file_name)
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path)
+        db.execute('''CREATE TABLE IF NOT EXISTS listings (input_path TEXT, seeker TEXT,
+                      fingerprint TEXT, created REAL, data BLOB, PRIMARY KEY (input_path, seeker))''')
+        return db
+
+    @staticmethod
+    def _fingerprint(input_path):
+        input_stat = os.stat(input_path)
+        return f'{ListingCache.format_version}:{input_stat.st_size}:{input_stat.st_mtime_ns}'
+
+    def load(self, seeker, input_path):
+        '''Returns the listing stored by seeker for input_path, or None if there is
+           none or the evidence changed since'''
+        try:
+            db = self._connect()
+            try:
+                row = db.execute('SELECT fingerprint, data FROM listings WHERE input_path=? AND seeker=?',
+                                 (os.path.abspath(input_path), seeker)).fetchone()
+            finally:
+                db.close()
+            if row is None or row[0] != self._fingerprint(input_path):
+                return None
+            return json.loads(zlib.decompress(row[1]))
+        except Exception as ex:
+            logfunc(f'Could not read the listing cache {self.db_path} ' + str(ex))
+        return None
+
+    def store(self, seeker, input_path, listing):
+        try:
+            data = zlib.compress(json.dumps(listing, separators=(',', ':')).encode('utf-8'), 1)
+            db = self._connect()
+            try:
+                with db:
+                    db.execute('INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?)',
+                               (os.path.abspath(input_path), seeker, self._fingerprint(input_path),
+                                timex.time(), data))
+            finally:
+                db.close()
+        except Exception as ex:
+            logfunc(f'Could not write the listing cache {self.db_path} ' + str(ex))
+
 class FileSeekerBase:
     # This is an abstract base class
     def search(self, filepattern_to_search, return_on_first_hit=False):
         '''Returns a list of paths for files/folders that matched'''
         pass
 
+    def search_many(self, filepatterns, extract=True):
+        '''Searches for several patterns at once. Returns a dict of pattern -> list
+           of paths, each list being what search() returns for that pattern.
+           With extract=False, seekers that can read archive members directly
+           return the paths without writing the members out yet (see materialize)
+        '''
+        return {filepattern: self.search(filepattern) for filepattern in filepatterns}
+
+    def materialize(self, paths):
+        '''Makes sure the paths returned by search_many(extract=False) exist on disk.
+           Returns those that do'''
+        return list(paths)
+
+    def open(self, path):
+        '''Opens a found path for reading in binary mode, even if it was not
+           written to disk (search_many with extract=False)'''
+        return open(path, 'rb')
+
+    def stat(self, path):
+        '''Returns the FileStat (size, mtime, is_dir) of a found path, following symlinks'''
+        path_stat = os.stat(path)
+        return FileStat(path_stat.st_size, path_stat.st_mtime, S_ISDIR(path_stat.st_mode))
+
     def cleanup(self):
         '''close any open handles'''
         pass
 
 class FileSeekerDir(FileSeekerBase):
-    def __init__(self, directory):
+    # attributes saved in the listing cache
+    _listing_attributes = ('_all_files', '_subtree_end', '_name_index', '_sizes', '_mtimes', '_is_dirs',
+                           '_dir_indices')
+
+    def __init__(self, directory, listing_cache=None):
         FileSeekerBase.__init__(self)
         self.directory = directory
         self._all_files = []
+        # Index used by search() to avoid matching every path against every pattern.
+        # Entries are listed depth first, so the descendants of entry i are the
+        # entries i+1 .. _subtree_end[i]-1
+        self._subtree_end = array('L')
+        self._name_index = {} # normcased entry name -> indices of entries with that name
+        self._sorted_names = None # built on first prefix/suffix lookup
+        self._sorted_reversed_names = None
+        self._prefix_names = set(normcase(directory).split(normcase('/')))
+        self._prefix_names.add(normcase('root'))
+        # stat data of each entry, served by stat() without touching the disk again
+        self._sizes = array('q')
+        self._mtimes = array('d')
+        self._is_dirs = bytearray()
+        self._dir_indices = array('L') # entries that were listed, used to check a cached listing
+        self._stale_stats = None # with a cached listing, 1 for each entry stat() hasn't checked yet
+        if listing_cache is not None and self._load_listing(listing_cache):
+            logfunc(f'File listing loaded from cache - {len(self._all_files)} files')
+            return
         logfunc('Building files listing...')
         self.build_files_list(directory)
         logfunc(f'File listing complete - {len(self._all_files)} files')
+        if listing_cache is not None:
+            listing_cache.store('fs', directory, {name: self._encode_attribute(getattr(self, name))
+                                                  for name in self._listing_attributes})
 
-    def build_files_list(self, directory):
-        '''Populates all paths in directory into _all_files'''
+    @staticmethod
+    def _encode_attribute(value):
+        if isinstance(value, array):
+            return value.tolist()
+        if isinstance(value, bytearray):
+            return list(value)
+        return value
+
+    def _load_listing(self, listing_cache):
+        '''Uses the cached listing if no listed directory was modified since.
+           Entries can only be added, removed or renamed by modifying their directory,
+           so checking the directories is enough to know the listing is still valid.
+           The sizes and mtimes of files can still have changed, stat() checks them
+           again the first time it is asked for them.
+        '''
+        listing = listing_cache.load('fs', self.directory)
+        if listing is None:
+            return False
+        all_files, mtimes = listing['_all_files'], listing['_mtimes']
+        def modified(index):
+            try:
+                return os.stat(all_files[index]).st_mtime != mtimes[index]
+            except OSError:
+                return True
+        with ThreadPoolExecutor() as executor:
+            if any(executor.map(modified, listing['_dir_indices'], chunksize=256)):
+                logfunc('Evidence was modified since the cached file listing was made')
+                return False
+        for name in self._listing_attributes:
+            current = getattr(self, name)
+            if isinstance(current, array):
+                setattr(self, name, array(current.typecode, listing[name]))
+            elif isinstance(current, bytearray):
+                setattr(self, name, bytearray(listing[name]))
+            else:
+                setattr(self, name, listing[name])
+        self._stale_stats = bytearray(b'\x01') * len(self._all_files)
+        return True
+
+    @staticmethod
+    def _scan_directory(directory):
+        '''Lists a directory, returns its entries as (name, path, recurse, size, mtime, is_dir)
+           tuples and the exception that stopped the listing, if any
+        '''
+        entries = []
         try:
-            files_list = os.scandir(directory)
-            for item in files_list:
-                self._all_files.append(item.path)
-                if item.is_dir(follow_symlinks=False):
-                    self.build_files_list(item.path)
+            with os.scandir(directory) as files_list:
+                for item in files_list:
+                    recurse = item.is_dir(follow_symlinks=False)
+                    try:
+                        try:
+                            item_stat = item.stat()
+                        except OSError: # dangling symlink
+                            item_stat = item.stat(follow_symlinks=False)
+                        size, mtime, is_dir = item_stat.st_size, item_stat.st_mtime, S_ISDIR(item_stat.st_mode)
+                    except OSError:
+                        size, mtime, is_dir = 0, 0.0, recurse
+                    entries.append((item.name, item.path, recurse, size, mtime, is_dir))
         except Exception as ex:
-            logfunc(f'Error reading {directory} ' + str(ex))
+            return entries, ex
+        return entries, None
+
+    def build_files_list(self, directory):
+        '''Populates all paths in directory into _all_files. Directories are listed
+           by a pool of threads, the listings are then added in depth first order.
+        '''
+        listings = {}
+        with ThreadPoolExecutor() as executor:
+            pending = {executor.submit(self._scan_directory, directory): directory}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    scanned = pending.pop(future)
+                    listings[scanned] = future.result()
+                    for name, path, recurse, *_ in listings[scanned][0]:
+                        if recurse:
+                            pending[executor.submit(self._scan_directory, path)] = path
+        self._add_listing(directory, listings)
+
+    def _add_listing(self, directory, listings):
+        entries, error = listings.pop(directory)
+        for name, path, recurse, size, mtime, is_dir in entries:
+            index = len(self._all_files)
+            self._all_files.append(path)
+            self._subtree_end.append(index + 1)
+            self._name_index.setdefault(normcase(name), []).append(index)
+            self._sizes.append(size)
+            self._mtimes.append(mtime)
+            self._is_dirs.append(is_dir)
+            if recurse:
+                self._dir_indices.append(index)
+                self._add_listing(path, listings)
+                self._subtree_end[index] = len(self._all_files)
+        if error is not None:
+            logfunc(f'Error reading {directory} ' + str(error))
+
+    def stat(self, path):
+        for index in self._name_index.get(normcase(os.path.basename(path)), ()):
+            if self._all_files[index] == path:
+                if self._stale_stats is not None and self._stale_stats[index]:
+                    self._restat(index)
+                return FileStat(self._sizes[index], self._mtimes[index], bool(self._is_dirs[index]))
+        return FileSeekerBase.stat(self, path)
+
+    def _restat(self, index):
+        '''Updates the cached stat data of an entry from the disk, as _scan_directory reads it'''
+        path = self._all_files[index]
+        try:
+            try:
+                path_stat = os.stat(path)
+            except OSError: # dangling symlink
+                path_stat = os.lstat(path)
+            self._sizes[index] = path_stat.st_size
+            self._mtimes[index] = path_stat.st_mtime
+            self._is_dirs[index] = S_ISDIR(path_stat.st_mode)
+        except OSError:
+            pass
+        self._stale_stats[index] = 0
+
+    def _postings(self, kind, text, limit):
+        '''Returns indices of entries whose name satisfies the hint, in listing order,
+           or None if more than limit entries do
+        '''
+        if kind == 'equals':
+            return self._name_index.get(text, [])
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self._name_index)
+            self._sorted_reversed_names = sorted(name[::-1] for name in self._name_index)
+        if kind == 'startswith':
+            names = self._sorted_names
+        else:
+            names, text = self._sorted_reversed_names, text[::-1]
+        first = bisect_left(names, text)
+        last = bisect_left(names, text + '\U0010ffff')
+        matched = names[first:last]
+        if kind == 'endswith':
+            matched = [name[::-1] for name in matched]
+        if sum(len(self._name_index[name]) for name in matched) > limit:
+            return None
+        if len(matched) == 1:
+            return self._name_index[matched[0]]
+        return sorted(chain.from_iterable(self._name_index[name] for name in matched))
+
+    def _candidates(self, filepattern):
+        '''Returns indices of entries that may match filepattern, in listing order.
+           Only the subtrees of entries satisfying the most selective name hint
+           of the pattern are considered. Returns None if no hint narrows the
+           search down, in which case every entry is a candidate.
+        '''
+        best_postings = None
+        best_cost = len(self._all_files)
+        hints = glob_name_hints(filepattern)
+        hints.sort(key=lambda hint: hint[0] != 'equals') # cheapest lookups first
+        for kind, text in hints:
+            if kind == 'equals':
+                common = text in self._prefix_names
+            else:
+                common = any(getattr(name, kind)(text) for name in self._prefix_names)
+            if common:
+                continue # part of the input path itself, so every entry has it
+            postings = self._postings(kind, text, best_cost)
+            if postings is None:
+                continue
+            cost = 0
+            end = 0
+            for start in postings:
+                if start >= end:
+                    end = self._subtree_end[start]
+                    cost += end - start
+                    if cost > best_cost:
+                        break
+            if cost <= best_cost:
+                best_postings, best_cost = postings, cost
+        if best_postings is None:
+            return None
+        return self._expand_postings(best_postings)
+
+    def _expand_postings(self, postings):
+        end = 0
+        for start in postings:
+            if start < end:
+                continue # nested inside a subtree already yielded
+            end = self._subtree_end[start]
+            yield from range(start, end)
 
     def search(self, filepattern, return_on_first_hit=False):
-        pat = _compile_pattern( normcase(filepattern) )
+        filepattern = normcase(filepattern)
+        pat = _compile_pattern(filepattern)
         root = normcase("root/")
-        if return_on_first_hit:
-            for item in self._all_files:
-                if pat( root + normcase(item) ) is not None:
-                    return [item]
-            return []
+        all_files = self._all_files
+        candidates = self._candidates(filepattern)
+        if candidates is None:
+            candidates = range(len(all_files))
         pathlist = []
-        for item in self._all_files:
+        for index in candidates:
+            item = all_files[index]
             if pat( root + normcase(item) ) is not None:
+                if return_on_first_hit:
+                    return [item]
                 pathlist.append(item)
         return pathlist
 
+    def search_many(self, filepatterns, extract=True):
+        found = {}
+        unindexed = []
+        root = normcase("root/")
+        for filepattern in dict.fromkeys(filepatterns):
+            candidates = self._candidates(normcase(filepattern))
+            if candidates is None:
+                unindexed.append(filepattern)
+                continue
+            pat = _compile_pattern(normcase(filepattern))
+            found[filepattern] = [self._all_files[index] for index in candidates
+                                  if pat( root + normcase(self._all_files[index]) ) is not None]
+        if unindexed:
+            # patterns the index cannot narrow down share a single pass over the listing
+            pattern_set = FilePatternSet(unindexed)
+            for filepattern in unindexed:
+                found[filepattern] = []
+            for item in self._all_files:
+                for filepattern in pattern_set.match(root + normcase(item)):
+                    found[filepattern].append(item)
+        return found
+
 class FileSeekerTar(FileSeekerBase):
-    def __init__(self, tar_file_path, temp_folder):
+    # TarInfo attributes saved in the listing cache
+    _member_attributes = ('name', 'mode', 'size', 'mtime', 'type', 'linkname', 'offset', 'offset_data')
+
+    def __init__(self, tar_file_path, temp_folder, listing_cache=None):
         FileSeekerBase.__init__(self)
+        self.tar_file_path = tar_file_path
         self.is_gzip = tar_file_path.lower().endswith('gz')
         mode ='r:gz' if self.is_gzip else 'r'
         self.tar_file = tarfile.open(tar_file_path, mode)
         self.temp_folder = temp_folder
         self.directory = temp_folder
+        self._extracted = {} # (member name, offset) -> path it was written to
+        self._members = None # member index of an earlier run, see _load_listing
+        self._listing_cache = listing_cache
+        if listing_cache is not None:
+            self._load_listing()
+
+    def _load_listing(self):
+        '''With the member index of an earlier run, passes over the archive no longer
+           read every header. Only matching members are read, skipping ahead to their
+           data, and a .tar.gz is not decompressed past the last of them.
+        '''
+        listing = self._listing_cache.load('tar', self.tar_file_path)
+        if listing is None:
+            return
+        members = []
+        for values in listing:
+            member = tarfile.TarInfo()
+            for name, value in zip(self._member_attributes, values):
+                setattr(member, name, value)
+            member.type = member.type.encode('latin-1')
+            members.append(member)
+        self._members = members
+        self._listing_cache = None
+        logfunc(f'Archive listing loaded from cache - {len(members)} members')
+
+    def _iter_members(self):
+        '''The members of the archive, from the cached index if there is one. Otherwise
+           iterating the TarFile reads the headers in a single forward pass the first
+           time and keeps them (name, offset, size) as the member index.
+        '''
+        if self._members is not None:
+            return iter(self._members)
+        return iter(self.tar_file)
+
+    def _store_listing(self):
+        '''Saves the member index once a pass over the archive has read all of it'''
+        if self._listing_cache is None:
+            return
+        # the pass is complete, so getmembers() doesn't read the archive again
+        members = self.tar_file.getmembers()
+        if not any(member.sparse for member in members):
+            self._listing_cache.store('tar', self.tar_file_path,
+                                      [[getattr(member, name) if name != 'type' else member.type.decode('latin-1')
+                                        for name in self._member_attributes] for member in members])
+        self._listing_cache = None
+
+    def __getstate__(self):
+        '''Open archives cannot be pickled, worker processes reopen the archive'''
+        state = self.__dict__.copy()
+        del state['tar_file']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.tar_file = tarfile.open(self.tar_file_path, 'r:gz' if self.is_gzip else 'r')
+
+    def _extract_member(self, member):
+        '''Writes member to temp_folder, returns its path or None on failure.
+           Called while iterating over the archive, the member data is read as
+           it streams past, so a .tar.gz never has to be decompressed again.
+           Members are told apart by their offset: a later member with the same
+           name is written over the earlier one, as tar extracts them.
+        '''
+        key = (member.name, member.offset)
+        if key in self._extracted:
+            return self._extracted[key]
+        try:
+            clean_name = sanitize_file_path(member.name)
+            full_path = os.path.join(self.temp_folder, Path(clean_name))
+            if member.isdir():
+                os.makedirs(full_path, exist_ok=True)
+            else:
+                parent_dir = os.path.dirname(full_path)
+                if not os.path.exists(parent_dir):
+                    os.makedirs(parent_dir)
+                with open(full_path, "wb") as fout:
+                    shutil.copyfileobj(tarfile.ExFileObject(self.tar_file, member), fout)
+                os.utime(full_path, (member.mtime, member.mtime))
+            self._extracted[key] = full_path
+            return full_path
+        except Exception as ex:
+            logfunc(f'Could not write file to filesystem, path was {member.name} ' + str(ex))
+        return None
 
     def search(self, filepattern, return_on_first_hit=False):
         pathlist = []
         pat = _compile_pattern( normcase(filepattern) )
         root = normcase("root/")
-        for member in self.tar_file.getmembers():
+        for member in self._iter_members():
             if pat( root + normcase(member.name) ) is not None:
-                try:
-                    clean_name = sanitize_file_path(member.name)
-                    full_path = os.path.join(self.temp_folder, Path(clean_name))
-                    if member.isdir():
-                        os.makedirs(full_path, exist_ok=True)
-                    else:
-                        parent_dir = os.path.dirname(full_path)
-                        if not os.path.exists(parent_dir):
-                            os.makedirs(parent_dir)
-                        with open(full_path, "wb") as fout:
-                            fout.write(tarfile.ExFileObject(self.tar_file, member).read())
-                            fout.close()
-                        os.utime(full_path, (member.mtime, member.mtime))
+                full_path = self._extract_member(member)
+                if full_path is not None:
                     pathlist.append(full_path)
-                except Exception as ex:
-                    logfunc(f'Could not write file to filesystem, path was {member.name} ' + str(ex))
+        self._store_listing()
         return pathlist
 
+    def search_many(self, filepatterns, extract=True):
+        # members are always written out, as they stream past in the single pass
+        pattern_set = FilePatternSet(filepatterns)
+        root = normcase("root/")
+        found = {filepattern: [] for filepattern in pattern_set.filepatterns}
+        for member in self._iter_members():
+            matched = pattern_set.match(root + normcase(member.name))
+            if matched:
+                full_path = self._extract_member(member)
+                if full_path is not None:
+                    for filepattern in matched:
+                        found[filepattern].append(full_path)
+        self._store_listing()
+        return found
+
     def cleanup(self):
         self.tar_file.close()
 
+class BufferFile(io.RawIOBase):
+    '''Read only, seekable file object over a buffer, such as a memoryview of an mmap'''
+    def __init__(self, buffer):
+        super().__init__()
+        self._buffer = buffer
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        size = max(0, min(len(b), len(self._buffer) - self._position))
+        b[:size] = self._buffer[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        if offset < 0:
+            raise ValueError(f'Negative seek position {offset}')
+        self._position = offset
+        return offset
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        if isinstance(self._buffer, memoryview):
+            self._buffer.release() # lets the seeker close the mmap
+        self._buffer = b''
+        super().close()
+
 class FileSeekerZip(FileSeekerBase):
     def __init__(self, zip_file_path, temp_folder):
         FileSeekerBase.__init__(self)
+        self.zip_file_path = zip_file_path
         self.zip_file = ZipFile(zip_file_path)
         self.name_list = self.zip_file.namelist()
         self.temp_folder = temp_folder
         self.directory = temp_folder
+        self._members_by_path = {} # path a found member is (or would be) extracted to -> member name
+        self._extracted = set()
+        self._mmap = None # whole archive, mapped on first open() of a stored member
+
+    def __getstate__(self):
+        '''Open archives cannot be pickled, worker processes reopen the archive'''
+        state = self.__dict__.copy()
+        del state['zip_file']
+        state['_mmap'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.zip_file = ZipFile(self.zip_file_path)
+
+    def _target_path(self, member):
+        '''Returns the path ZipFile.extract() writes member to'''
+        arcname = member.replace('/', os.path.sep)
+        if os.path.altsep:
+            arcname = arcname.replace(os.path.altsep, os.path.sep)
+        arcname = os.path.splitdrive(arcname)[1]
+        arcname = os.path.sep.join(x for x in arcname.split(os.path.sep)
+                                   if x not in ('', os.path.curdir, os.path.pardir))
+        if os.path.sep == '\\':
+            arcname = ZipFile._sanitize_windows_name(arcname, os.path.sep)
+        return os.path.normpath(os.path.join(self.temp_folder, arcname))
+
+    def _extract_member(self, member):
+        '''Writes member to temp_folder, returns its path or None on failure'''
+        try:
+            extracted_path = self.zip_file.extract(member, path=self.temp_folder) # already replaces illegal chars with _ when exporting
+            f = self.zip_file.getinfo(member)
+            date_time = f.date_time
+            date_time = timex.mktime(date_time + (0, 0, -1))
+            os.utime(extracted_path, (date_time, date_time))
+            self._members_by_path[extracted_path] = member
+            self._extracted.add(extracted_path)
+            return extracted_path
+        except Exception as ex:
+            member = member.lstrip("/")
+            logfunc(f'Could not write file to filesystem, path was {member} ' + str(ex))
+        return None
 
     def search(self, filepattern, return_on_first_hit=False):
         pathlist = []
@@ -105,18 +667,67 @@ class FileSeekerZip(FileSeekerBase):
         root = normcase("root/")
         for member in self.name_list:
             if pat( root + normcase(member) ) is not None:
-                try:
-                    extracted_path = self.zip_file.extract(member, path=self.temp_folder) # already replaces illegal chars with _ when exporting
-                    f = self.zip_file.getinfo(member)
-                    date_time = f.date_time
-                    date_time = timex.mktime(date_time + (0, 0, -1))
-                    os.utime(extracted_path, (date_time, date_time))
+                extracted_path = self._extract_member(member)
+                if extracted_path is not None:
                     pathlist.append(extracted_path)
-                except Exception as ex:
-                    member = member.lstrip("/")
-                    logfunc(f'Could not write file to filesystem, path was {member} ' + str(ex))
         return pathlist
 
+    def search_many(self, filepatterns, extract=True):
+        pattern_set = FilePatternSet(filepatterns)
+        root = normcase("root/")
+        found = {filepattern: [] for filepattern in pattern_set.filepatterns}
+        for member in self.name_list:
+            matched = pattern_set.match(root + normcase(member))
+            if matched:
+                if extract:
+                    path = self._extract_member(member)
+                    if path is None:
+                        continue
+                else:
+                    path = self._target_path(member)
+                    self._members_by_path[path] = member
+                for filepattern in matched:
+                    found[filepattern].append(path)
+        return found
+
+    def materialize(self, paths):
+        available = []
+        for path in paths:
+            member = self._members_by_path.get(path)
+            if member is not None and path not in self._extracted:
+                path = self._extract_member(member)
+                if path is None:
+                    continue
+            available.append(path)
+        return available
+
+    def open(self, path):
+        member = self._members_by_path.get(path)
+        if member is None or path in self._extracted:
+            return open(path, 'rb')
+        info = self.zip_file.getinfo(member)
+        if info.compress_type != ZIP_STORED or info.flag_bits & 0x1: # compressed or encrypted
+            return self.zip_file.open(info)
+        if self._mmap is None:
+            with open(self.zip_file_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # data follows the local file header, whose name and extra field lengths
+        # may differ from those in the central directory
+        name_length, extra_length = struct.unpack_from('<HH', self._mmap, info.header_offset + 26)
+        start = info.header_offset + 30 + name_length + extra_length
+        return io.BufferedReader(BufferFile(memoryview(self._mmap)[start:start + info.file_size]))
+
+    def stat(self, path):
+        member = self._members_by_path.get(path)
+        if member is None or path in self._extracted:
+            return FileSeekerBase.stat(self, path)
+        info = self.zip_file.getinfo(member)
+        return FileStat(info.file_size, timex.mktime(info.date_time + (0, 0, -1)), info.is_dir())
+
     def cleanup(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass # a plugin still holds a view of it, the mapping goes away with the process
         self.zip_file.close()
-        
\ No newline at end of file
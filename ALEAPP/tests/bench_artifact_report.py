@@ -0,0 +1,99 @@
+'''Benchmark of ArtifactHtmlReport.write_artifact_data_table for tables of 10k,
+100k and 1M rows, written as data shards and, for comparison, inline as before.
+
+    python tests/bench_artifact_report.py [--rows 10000 100000 1000000]
+
+For each table it prints the time to write the page, the size of the HTML page
+and of its data shards, and, when node is installed, the time to evaluate the
+shard scripts (the data a browser loads before DataTables draws the first page).
+Browser layout and DataTables drawing are not measured.
+'''
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.artifact_report import ArtifactHtmlReport
+
+headers = ('Timestamp', 'Package', 'Title', 'Text', 'Source')
+
+
+def rows(count):
+    for n in range(count):
+        yield (f'2024-01-{n % 28 + 1:02} 12:{n % 60:02}:{n * 7 % 60:02}', f'com.example.app{n % 50}',
+               f'Message {n}', f'Text of message {n} <with markup> & more', f'/data/data/app{n % 50}/databases/db')
+
+
+def folder_size(folder):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(folder) for name in files)
+
+
+def write_page(base, row_count, inline):
+    folder = os.path.join(base, 'Category')
+    os.makedirs(folder)
+    if inline:
+        ArtifactHtmlReport.inline_row_limit = row_count
+    start = time.perf_counter()
+    report = ArtifactHtmlReport('Benchmark')
+    report.start_artifact_report(folder, 'Benchmark')
+    report.write_artifact_data_table(headers, rows(row_count), 'source')
+    report.end_artifact_report()
+    return time.perf_counter() - start, os.path.join(folder, 'Benchmark.temphtml')
+
+
+def evaluate_shards(page):
+    '''Seconds node takes to run the data scripts of the page, or None without node'''
+    node = shutil.which('node')
+    if node is None:
+        return None
+    with open(page, encoding='utf8') as page_file:
+        text = page_file.read()
+    job = {'setup': re.findall(r'<script>(var leappTableData[^<]*)</script>', text),
+           'shards': [os.path.join(os.path.dirname(os.path.dirname(page)), unquote(url))
+                      for url in re.findall(r'<script src="(_Table%20Data/[^"]+)"', text)]}
+    script = ('const fs = require("fs"), vm = require("vm"), job = JSON.parse(process.argv[1]);'
+              'const context = {}; context.window = context; vm.createContext(context);'
+              'const start = process.hrtime.bigint();'
+              'for (const setup of job.setup) vm.runInContext(setup, context);'
+              'for (const shard of job.shards) vm.runInContext(fs.readFileSync(shard, "ascii"), context);'
+              'console.log(Number(process.hrtime.bigint() - start) / 1e9);')
+    output = subprocess.run([node, '-e', script, json.dumps(job)], capture_output=True, text=True, check=True)
+    return float(output.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+    inline_row_limit = ArtifactHtmlReport.inline_row_limit
+
+    for row_count in args.rows:
+        for inline in (False, True):
+            base = tempfile.mkdtemp()
+            try:
+                ArtifactHtmlReport.inline_row_limit = inline_row_limit
+                seconds, page = write_page(base, row_count, inline)
+                data_size = folder_size(os.path.join(base, '_Table Data')) if not inline else 0
+                line = (f'{row_count:>8} rows, {"inline" if inline else "shards"}: written in {seconds:.2f}s, '
+                        f'page {os.path.getsize(page) / 1e3:.0f} kB, data {data_size / 1e3:.0f} kB')
+                evaluated = None if inline else evaluate_shards(page)
+                if evaluated is not None:
+                    line += f', shards evaluated in {evaluated:.2f}s'
+                print(line)
+            finally:
+                shutil.rmtree(base, ignore_errors=True)
+    ArtifactHtmlReport.inline_row_limit = inline_row_limit
+
+
+if __name__ == '__main__':
+    main()
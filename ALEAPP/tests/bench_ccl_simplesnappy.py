@@ -0,0 +1,188 @@
+'''Benchmark of ccl_simplesnappy on LevelDB-sized blocks: the stream decompress
+it had before decompress_bytes, the pure Python _decompress_python and the
+native _decompress_native (cramjam or python-snappy).
+
+    python tests/bench_ccl_simplesnappy.py [--blocks 3000]
+
+The blocks are 4 to 64 KB of text from the repo's Python files, random bytes
+and repeated runs, compressed with cramjam or python-snappy, one of which is
+needed to write them.
+'''
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts import ccl_simplesnappy
+from scripts.ccl_simplesnappy import ElementType, log, read_byte, read_le_varint, read_uint16, read_uint24, \
+    read_uint32
+
+try:
+    import cramjam
+
+    def compress(data):
+        return bytes(cramjam.snappy.compress_raw(data))
+except ImportError:
+    try:
+        import snappy
+
+        def compress(data):
+            return snappy.compress(data)
+    except ImportError:
+        compress = None
+
+
+def linear_decompress(data):
+    '''ccl_simplesnappy.decompress before decompress_bytes'''
+    uncompressed_length = read_le_varint(data)
+    log(f"Uncompressed length: {uncompressed_length}")
+
+    out = io.BytesIO()
+
+    while True:
+        start_offset = data.tell()
+        log(f"Reading tag at offset {start_offset}")
+        type_byte = read_byte(data)
+        if type_byte is None:
+            break
+
+        log(f"Type Byte is {type_byte:02x}")
+
+        tag = type_byte & 0x03
+
+        log(f"Element Type is: {ElementType(tag)}")
+
+        if tag == ElementType.Literal:
+            if ((type_byte & 0xFC) >> 2) < 60:  # embedded in tag
+                length = 1 + ((type_byte & 0xFC) >> 2)
+                log(f"Literal length is embedded in type byte and is {length}")
+            elif ((type_byte & 0xFC) >> 2) == 60:  # 8 bit
+                length = 1 + read_byte(data)
+                log(f"Literal length is 8bit and is {length}")
+            elif ((type_byte & 0xFC) >> 2) == 61:  # 16 bit
+                length = 1 + read_uint16(data)
+                log(f"Literal length is 16bit and is {length}")
+            elif ((type_byte & 0xFC) >> 2) == 62:  # 16 bit
+                length = 1 + read_uint24(data)
+                log(f"Literal length is 24bit and is {length}")
+            elif ((type_byte & 0xFC) >> 2) == 63:  # 16 bit
+                length = 1 + read_uint32(data)
+                log(f"Literal length is 32bit and is {length}")
+            else:
+                raise ValueError()  # cannot ever happen
+
+            literal_data = data.read(length)
+            if len(literal_data) < length:
+                raise ValueError("Couldn't read enough literal data")
+
+            out.write(literal_data)
+
+        else:
+            if tag == ElementType.CopyOneByte:
+                length = ((type_byte & 0x1C) >> 2) + 4
+                offset = ((type_byte & 0xE0) << 3) | read_byte(data)
+            elif tag == ElementType.CopyTwoByte:
+                length = 1 + ((type_byte & 0xFC) >> 2)
+                offset = read_uint16(data)
+            elif tag == ElementType.CopyFourByte:
+                length = 1 + ((type_byte & 0xFC) >> 2)
+                offset = read_uint32(data)
+            else:
+                raise ValueError()  # cannot ever happen
+
+            if offset == 0:
+                raise ValueError("Offset cannot be 0")
+
+            actual_offset = out.tell() - offset
+            log(f"Current Outstream Length: {out.tell()}")
+            log(f"Backreference length: {length}")
+            log(f"Backreference relative offset: {offset}")
+            log(f"Backreference absolute offset: {actual_offset}")
+
+            buffer = out.getbuffer()[actual_offset: actual_offset + length].tobytes()
+            condition = (offset - length) <= 0
+            if condition:
+                buffer = (buffer * length)[:length]
+            out.write(buffer)
+
+    result = out.getvalue()
+    if uncompressed_length != len(result):
+        raise ValueError("Wrong data length in uncompressed data")
+
+    return result
+
+
+def repo_text():
+    scripts = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+    text = bytearray()
+    for root, _, files in os.walk(scripts):
+        for name in sorted(files):
+            if name.endswith('.py'):
+                with open(os.path.join(root, name), 'rb') as source:
+                    text += source.read()
+    return bytes(text)
+
+
+def leveldb_blocks(count, seed=1):
+    '''Uncompressed blocks of 4 to 64 KB: repo text, random bytes and repeated runs'''
+    rnd = random.Random(seed)
+    text = repo_text()
+    blocks = []
+    for _ in range(count):
+        size = rnd.randint(4096, 65536)
+        kind = rnd.random()
+        if kind < 0.7:
+            start = rnd.randrange(len(text) - size)
+            block = text[start:start + size]
+        elif kind < 0.85:
+            block = rnd.getrandbits(8 * size).to_bytes(size, 'little')
+        else:
+            run = bytes(rnd.getrandbits(8) for _ in range(rnd.randint(1, 64)))
+            block = (run * (size // len(run) + 1))[:size]
+        blocks.append(block)
+    return blocks
+
+
+def timed(label, function, blocks, size, baseline=None):
+    start = time.perf_counter()
+    results = [function(block) for block in blocks]
+    seconds = time.perf_counter() - start
+    print(f'{label}: {seconds:.2f}s, {size / seconds / 1e6:.1f} MB/s' +
+          (f' ({baseline / seconds:.1f}x)' if baseline else ''))
+    return results, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--blocks', type=int, default=3000)
+    args = parser.parse_args()
+    if compress is None:
+        sys.exit('cramjam or python-snappy is needed to compress the blocks')
+
+    blocks = leveldb_blocks(args.blocks)
+    compressed = [compress(block) for block in blocks]
+    size = sum(map(len, blocks))
+    print(f'{len(blocks)} blocks, {size / 1e6:.0f} MB, {sum(map(len, compressed)) / 1e6:.0f} MB compressed')
+
+    old, old_seconds = timed('stream decompress', lambda block: linear_decompress(io.BytesIO(block)), compressed,
+                             size)
+    if old != blocks:
+        sys.exit('Different results for the stream decompress')
+    new, _ = timed('_decompress_python', ccl_simplesnappy._decompress_python, compressed, size, old_seconds)
+    if new != blocks:
+        sys.exit('Different results for _decompress_python')
+    if ccl_simplesnappy._decompress_native is None:
+        print('_decompress_native: cramjam or python-snappy is not installed')
+        return
+    new, _ = timed('_decompress_native', ccl_simplesnappy._decompress_native, compressed, size, old_seconds)
+    if new != blocks:
+        sys.exit('Different results for _decompress_native')
+
+
+if __name__ == '__main__':
+    main()
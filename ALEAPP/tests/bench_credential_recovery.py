@@ -0,0 +1,73 @@
+'''Benchmark of java_hashcode_pins, the PIN search of NQ_Vault, with NumPy and
+with the pure Python fallback used when NumPy isn't installed, for each PIN
+length.
+
+    python tests/bench_credential_recovery.py [--lengths 4 ... 15] [--python-max-length 12]
+
+Each length is searched for the hashcodes of a few random PINs, and the times
+printed are per hashcode. Without NumPy a length takes about ten times as long
+as the one before, so above --python-max-length its time is extrapolated from
+the longest length timed.
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts import credential_recovery
+
+numpy = credential_recovery.numpy
+
+
+def timed_search(hashcodes, length):
+    start = time.perf_counter()
+    results = [list(credential_recovery.java_hashcode_pins(hashcode, length, length)) for hashcode in hashcodes]
+    return results, (time.perf_counter() - start) / len(hashcodes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lengths', type=int, nargs='+', default=list(range(4, 16)))
+    parser.add_argument('--python-max-length', type=int, default=12)
+    parser.add_argument('--hashcodes', type=int, default=3)
+    args = parser.parse_args()
+    if numpy is None:
+        print('NumPy is not installed, only the Python fallback is timed')
+
+    rnd = random.Random(1)
+    python_seconds = None
+    for length in args.lengths:
+        pins = [''.join(rnd.choice('0123456789') for _ in range(length)) for _ in range(args.hashcodes)]
+        hashcodes = [credential_recovery.java_string_hashcode(pin) for pin in pins]
+        line = f'{length:>2} digits:'
+        with_numpy = None
+        if numpy is not None:
+            with_numpy, numpy_seconds = timed_search(hashcodes, length)
+            line += f' NumPy {numpy_seconds:.4f}s,'
+            if not all(pin in found for pin, found in zip(pins, with_numpy)):
+                sys.exit(f'PIN not found with NumPy, length {length}')
+        if length <= args.python_max_length:
+            credential_recovery.numpy = None
+            try:
+                with_python, python_seconds = timed_search(hashcodes, length)
+            finally:
+                credential_recovery.numpy = numpy
+            if with_numpy is not None and with_python != with_numpy:
+                sys.exit(f'Different results for length {length}')
+            timed_length = length
+            line += f' Python {python_seconds:.4f}s'
+        elif python_seconds is not None:
+            python_seconds *= 10 ** (length - timed_length)
+            timed_length = length
+            line += f' Python ~{python_seconds:.1f}s (extrapolated)'
+        if with_numpy is not None and python_seconds:
+            line += f', NumPy speedup {python_seconds / numpy_seconds:.1f}x'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
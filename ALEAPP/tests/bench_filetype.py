@@ -0,0 +1,78 @@
+'''Benchmark of filetype.match's first byte dispatch against the loop over every
+matcher it replaced, on the files of a folder and on their headers in memory.
+
+    python tests/bench_filetype.py [folder] [--files 20000]
+
+The folder defaults to the ALEAPP folder. Run it twice for a warm page cache.
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts import filetype
+from scripts.filetypes import TYPES
+
+
+def linear_match(buf, matchers=TYPES):
+    '''filetype.match before the dispatch table'''
+    for matcher in matchers:
+        if matcher.match(buf):
+            return matcher
+    return None
+
+
+def linear_match_file(path):
+    return linear_match(filetype.get_signature_bytes(path))
+
+
+def list_files(folder, limit):
+    paths = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.isfile(path) and os.access(path, os.R_OK):
+                paths.append(path)
+                if len(paths) == limit:
+                    return paths
+    return paths
+
+
+def timed(label, function, items, baseline=None):
+    start = time.perf_counter()
+    results = [function(item) for item in items]
+    seconds = time.perf_counter() - start
+    print(f'{label}: {seconds:.2f}s' + (f' ({baseline / seconds:.1f}x)' if baseline else ''))
+    return results, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('folder', nargs='?', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument('--files', type=int, default=20000)
+    args = parser.parse_args()
+
+    paths = list_files(args.folder, args.files)
+    print(f'{len(paths)} files from {args.folder}')
+    old, old_seconds = timed('matcher loop on files', linear_match_file, paths)
+    new, _ = timed('dispatch on files', filetype.match, paths, old_seconds)
+    timed('dispatch on files, cached', filetype.match, paths, old_seconds)
+    if old != new:
+        sys.exit('Different results for files')
+
+    rnd = random.Random(1)
+    buffers = [filetype.get_signature_bytes(path) for path in paths]
+    buffers += [bytearray(rnd.getrandbits(8) for _ in range(512)) for _ in range(len(paths) // 4)]
+    print(f'{len(buffers)} headers in memory, a fifth of them random')
+    old, old_seconds = timed('matcher loop on buffers', linear_match, buffers)
+    new, _ = timed('dispatch on buffers', filetype.match, buffers, old_seconds)
+    if old != new:
+        sys.exit('Different results for buffers')
+
+
+if __name__ == '__main__':
+    main()
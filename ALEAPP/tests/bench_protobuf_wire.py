@@ -0,0 +1,194 @@
+'''Benchmark of the protobuf_wire readers in parse3 and ccl_protobuff against
+the readers they replaced: varints of 1 to 10 bytes read with RetrieveInt and
+GetDynamicWireFormat, and random messages parsed with parse3.ParseData and
+ccl_protobuff.read_protobuff.
+
+    python tests/bench_protobuf_wire.py [--varints 200000] [--messages 3000]
+'''
+
+import argparse
+import io
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts import ccl_protobuff, parse3
+
+
+def varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def linear_get_dynamic_wire_format(data, start, end):
+    '''parse3.GetDynamicWireFormat before protobuf_wire'''
+    wire_type = data[start] & 0x7
+    firstByte = data[start]
+    if (firstByte & 0x80) == 0:
+        field_number = (firstByte >> 3)
+        return (start+1, wire_type, field_number)
+    byteList = []
+    pos = 0
+    while True:
+        if start+pos >= end:
+            return (None, None, None)
+        oneByte = data[start+pos]
+        byteList.append(oneByte & 0x7F)
+        pos = pos + 1
+        if oneByte & 0x80 == 0x0:
+            break
+    field_number = 0
+    for byte in reversed(byteList):
+        field_number = (field_number << 0x7) + byte
+    return (start + pos, wire_type, field_number >> 3)
+
+
+def linear_retrieve_int(data, start, end):
+    '''parse3.RetrieveInt before protobuf_wire'''
+    pos = 0
+    byteList = []
+    while True:
+        if start+pos >= end:
+            return (None, None, False)
+        oneByte = data[start+pos]
+        byteList.append(oneByte & 0x7F)
+        pos = pos + 1
+        if oneByte & 0x80 == 0x0:
+            break
+    num = 0
+    for byte in reversed(byteList):
+        num = (num << 0x7) + byte
+    return (num, start + pos, True)
+
+
+def linear_read_fixed(data, start, size, end):
+    '''The 64 and 32 bit field loops of parse3.ParseData before protobuf_wire'''
+    num = 0
+    pos = size - 1
+    while pos >= 0:
+        if start+pos >= end:
+            return (None, start)
+        num = (num << 8) + data[start+pos]
+        pos = pos - 1
+    return (num, start + size)
+
+
+def linear_read_protobuff(stream, tag_mappings):
+    '''ccl_protobuff.read_protobuff before protobuf_wire'''
+    result = []
+    while True:
+        tag = ccl_protobuff.read_tag(stream, tag_mappings)
+        if tag is None:
+            break
+        result.append(tag)
+    return result
+
+
+def random_message(rnd, depth=0):
+    out = bytearray()
+    for _ in range(rnd.randint(3, 12)):
+        field_number = rnd.randint(1, 20)
+        wire_type = rnd.choice([0, 0, 0, 1, 2, 2, 5])
+        out += varint(field_number << 3 | wire_type)
+        if wire_type == 0:
+            out += varint(rnd.getrandbits(rnd.choice([6, 13, 32, 64])))
+        elif wire_type == 1:
+            out += struct.pack('<d', rnd.random())
+        elif wire_type == 5:
+            out += struct.pack('<f', rnd.random())
+        else:
+            value = random_message(rnd, depth + 1) if depth < 2 and rnd.random() < 0.3 else \
+                f'text {rnd.getrandbits(40)}'.encode('utf-8')
+            out += varint(len(value)) + value
+    return bytes(out)
+
+
+def timed(label, function, baseline=None):
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    print(f'{label}: {seconds:.2f}s' + (f' ({baseline / seconds:.1f}x)' if baseline else ''))
+    return result, seconds
+
+
+def read_all(read, data, offsets):
+    end = len(data)
+    return [read(data, start, end) for start in offsets]
+
+
+def parse_all(messages):
+    results = []
+    for message in messages:
+        parse3.strings = []
+        parsed = {}
+        parse3.ParseData(message, 0, len(message), parsed)
+        results.append((parsed, parse3.strings))
+    return results
+
+
+def plain(value):
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    if isinstance(value, ccl_protobuff.ProtoObject):
+        return value.tag, value.name, plain(value.value)
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--varints', type=int, default=200000)
+    parser.add_argument('--messages', type=int, default=3000)
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    values = [1 << 7 * (n % 10) | rnd.getrandbits(7 * (n % 10)) for n in range(args.varints)]
+    encoded = [varint(value) for value in values]
+    offsets = []
+    position = 0
+    for value in encoded:
+        offsets.append(position)
+        position += len(value)
+    data = b''.join(encoded)
+    print(f'{len(values)} varints of 1 to 10 bytes')
+    for label, old_read, new_read in (('RetrieveInt', linear_retrieve_int, parse3.RetrieveInt),
+                                      ('GetDynamicWireFormat', linear_get_dynamic_wire_format,
+                                       parse3.GetDynamicWireFormat)):
+        old, old_seconds = timed(f'{label}, old readers', lambda: read_all(old_read, data, offsets))
+        new, _ = timed(f'{label}, protobuf_wire', lambda: read_all(new_read, data, offsets), old_seconds)
+        if old != new:
+            sys.exit(f'Different results for {label}')
+
+    messages = [random_message(rnd) for _ in range(args.messages)]
+    print(f'{len(messages)} messages, {sum(map(len, messages)) / 1e3:.0f} kB')
+    new_readers = parse3.GetDynamicWireFormat, parse3.RetrieveInt, parse3.read_fixed
+    parse3.GetDynamicWireFormat, parse3.RetrieveInt, parse3.read_fixed = \
+        linear_get_dynamic_wire_format, linear_retrieve_int, linear_read_fixed
+    try:
+        old, old_seconds = timed('ParseData, old readers', lambda: parse_all(messages))
+    finally:
+        parse3.GetDynamicWireFormat, parse3.RetrieveInt, parse3.read_fixed = new_readers
+    new, _ = timed('ParseData, protobuf_wire', lambda: parse_all(messages), old_seconds)
+    if old != new:
+        sys.exit('Different results for ParseData')
+
+    old, old_seconds = timed('read_protobuff, streams', lambda: [
+        plain(linear_read_protobuff(io.BytesIO(message), {})) for message in messages])
+    new, _ = timed('read_protobuff, offsets', lambda: [
+        plain(ccl_protobuff.read_protobuff(io.BytesIO(message), {})) for message in messages], old_seconds)
+    if old != new:
+        sys.exit('Different results for read_protobuff')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+'''Benchmark of FileSeekerDir's indexed search against the linear fnmatch loop it
+replaced, on a synthetic listing (nothing is written to disk) and the search
+patterns of the artifact modules.
+
+    python tests/bench_search_files.py [--paths 1000000] [--linear-patterns 50]
+
+The linear loop matches every path against every pattern, so it is only timed on
+the first --linear-patterns patterns and its time for all of them extrapolated.
+'''
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scripts.search_files as search_files
+
+folders = ['databases', 'files', 'shared_prefs', 'cache', 'app_webview', 'no_backup']
+extensions = ['.db', '.db-wal', '.db-journal', '.xml', '.json', '.jpg', '.log', '']
+
+
+def synthetic_listings(directory, path_count, seed=1):
+    '''Listings shaped like an Android file system extraction, for FileSeekerDir._add_listing'''
+    rnd = random.Random(seed)
+    listings = {}
+    def add(folder, entries):
+        listings[folder] = ([(name, os.path.join(folder, name), recurse, 0, 0.0, recurse)
+                             for name, recurse in entries], None)
+    data = os.path.join(directory, 'data')
+    data_data = os.path.join(data, 'data')
+    media = os.path.join(directory, 'media', '0', 'DCIM')
+    add(directory, [('data', True), ('media', True)])
+    add(os.path.join(directory, 'media'), [('0', True)])
+    add(os.path.join(directory, 'media', '0'), [('DCIM', True)])
+    add(data, [('data', True)])
+    count = 6
+    packages = []
+    media_files = []
+    while count < path_count:
+        if rnd.random() < 0.2:
+            media_files.append((f'IMG_{len(media_files):07}.jpg', False))
+            count += 1
+            continue
+        package = f'com.vendor{len(packages) % 97}.app{len(packages)}'
+        packages.append((package, True))
+        package_path = os.path.join(data_data, package)
+        add(package_path, [(folder, True) for folder in folders])
+        for folder in folders:
+            files = [(f'{folder[:4]}{n}{rnd.choice(extensions)}', False) for n in range(rnd.randint(2, 40))]
+            add(os.path.join(package_path, folder), files)
+            count += len(files)
+        count += 1 + len(folders)
+    add(data_data, packages)
+    add(media, media_files)
+    return listings
+
+
+class SyntheticSeeker(search_files.FileSeekerDir):
+    path_count = 1000000
+
+    def build_files_list(self, directory):
+        self._add_listing(directory, synthetic_listings(directory, self.path_count))
+
+
+def artifact_patterns():
+    '''The literal '*/...' search patterns of the artifact modules'''
+    artifacts = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', 'artifacts')
+    patterns = set()
+    for file_name in sorted(os.listdir(artifacts)):
+        if file_name.endswith('.py'):
+            with open(os.path.join(artifacts, file_name), encoding='utf-8', errors='replace') as module:
+                patterns.update(re.findall(r"""['"](\*/[^'"\n]+)['"]""", module.read()))
+    return sorted(patterns)
+
+
+def linear_search(all_files, filepattern):
+    '''FileSeekerDir.search before the name index'''
+    pat = search_files._compile_pattern(search_files.normcase(filepattern))
+    root = search_files.normcase('root/')
+    return [item for item in all_files if pat(root + search_files.normcase(item)) is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--paths', type=int, default=1000000)
+    parser.add_argument('--linear-patterns', type=int, default=50)
+    args = parser.parse_args()
+    search_files.logfunc = lambda *args: None
+
+    patterns = artifact_patterns()
+    SyntheticSeeker.path_count = args.paths
+    start = time.perf_counter()
+    seeker = SyntheticSeeker(os.path.join(os.sep, 'evidence'))
+    print(f'{len(seeker._all_files)} paths indexed in {time.perf_counter() - start:.2f}s, '
+          f'{len(patterns)} artifact patterns')
+
+    start = time.perf_counter()
+    indexed = seeker.search_many(patterns)
+    indexed_seconds = time.perf_counter() - start
+    print(f'indexed search_many, all patterns: {indexed_seconds:.2f}s '
+          f'({indexed_seconds / len(patterns) * 1000:.2f}ms per pattern)')
+
+    sample = random.Random(1).sample(patterns, min(args.linear_patterns, len(patterns)))
+    start = time.perf_counter()
+    for filepattern in sample:
+        if linear_search(seeker._all_files, filepattern) != indexed[filepattern]:
+            sys.exit(f'Different results for {filepattern}')
+    linear_seconds = time.perf_counter() - start
+    per_pattern = linear_seconds / len(sample)
+    print(f'linear fnmatch loop, {len(sample)} patterns: {linear_seconds:.2f}s ({per_pattern * 1000:.2f}ms per '
+          f'pattern, ~{per_pattern * len(patterns):.0f}s for all of them)')
+    print(f'speedup: ~{per_pattern * len(patterns) / indexed_seconds:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the tests import the ALEAPP modules the way aleapp.py does, from the ALEAPP folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,39 @@
+import os
+import re
+
+import pytest
+
+artifact_report = pytest.importorskip('scripts.artifact_report')
+
+
+def shard_rows(base, key):
+    rows = []
+    for root, _, files in os.walk(os.path.join(base, '_Table Data')):
+        for name in sorted(files):
+            with open(os.path.join(root, name), encoding='ascii') as shard_file:
+                data = shard_file.read()
+            if f'leappTableData["{key}"]' in data:
+                rows.extend(re.findall(r'\["(\d+)"\]', data))
+    return rows
+
+
+def test_sharded_tables_with_the_same_id_keep_their_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifact_report.ArtifactHtmlReport, 'inline_row_limit', 2)
+    monkeypatch.setattr(artifact_report.ArtifactHtmlReport, 'shard_rows', 2)
+    folder = tmp_path / 'Category'
+    folder.mkdir()
+    report = artifact_report.ArtifactHtmlReport('Artifact')
+    report.start_artifact_report(str(folder), 'Artifact')
+    report.write_artifact_data_table(['n'], [(n,) for n in range(3)], 'source')
+    report.write_artifact_data_table(['n'], iter([(n,) for n in range(10, 15)]), 'source')
+    report.write_artifact_data_table(['n'], [(1,)], 'source')
+    report.end_artifact_report()
+    page = (folder / 'Artifact.temphtml').read_text(encoding='utf8')
+
+    tables = re.findall(r'<table id="dtBasicExample"[^>]*>', page)
+    keys = [re.search(r'data-leapp-shards="([^"]+)"', table) for table in tables]
+    assert keys[2] is None # written inline
+    keys = [key.group(1) for key in keys[:2]]
+    assert len(set(keys)) == 2
+    assert shard_rows(str(tmp_path), keys[0]) == ['0', '1', '2']
+    assert shard_rows(str(tmp_path), keys[1]) == ['10', '11', '12', '13', '14']
@@ -0,0 +1,83 @@
+import types
+
+import pytest
+
+fcm = pytest.importorskip('scripts.ccl_android_fcm_queued_messages')
+
+
+def length_delimited(tag, value):
+    return bytes([tag, len(value)]) + value
+
+
+def fcm_value(package, key_values):
+    message = length_delimited(0x2A, package.encode())
+    for key, value in key_values.items():
+        message += length_delimited(0x3A, length_delimited(0x0A, key.encode()) + length_delimited(0x12, value.encode()))
+    return length_delimited(0x12, message)
+
+
+def record(key, value, state=None):
+    return types.SimpleNamespace(key=key + bytes(8), value=value, state=state or fcm.ccl_leveldb.KeyState.Live,
+                                 origin_file='000003.log')
+
+
+logged = []
+
+
+class FakeLevelDb:
+    records = []
+    opened = 0
+
+    def __init__(self, db_path):
+        FakeLevelDb.opened += 1
+        if not self.records:
+            raise ValueError('not a leveldb')
+
+    def iterate_records_raw(self):
+        return iter(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+@pytest.fixture
+def leveldb(tmp_path, monkeypatch):
+    monkeypatch.setattr(fcm.ccl_leveldb, 'RawLevelDb', FakeLevelDb)
+    monkeypatch.setattr(FakeLevelDb, 'opened', 0)
+    monkeypatch.setattr(fcm, 'logfunc', logged.append)
+    logged.clear()
+    (tmp_path / '000003.log').write_bytes(b'')
+    yield tmp_path
+    fcm.clear_fcm_stores()
+
+
+def test_corrupt_records_are_skipped(leveldb, monkeypatch):
+    monkeypatch.setattr(FakeLevelDb, 'records', [
+        record(b'com.example:1600000000000000%1', fcm_value('com.example', {'title': 'one'})),
+        record(b'com.example:1600000000000001%2', b'\x12\x05\x2a\x09abc'), # truncated
+        record(b'com.other:1600000000000002%3', fcm_value('com.other', {'title': 'three'})),
+    ])
+    with fcm.FcmIterator(leveldb) as iterator:
+        assert [(x.package, x.key_values) for x in iterator] == [
+            ('com.example', {'title': 'one'}), ('com.other', {'title': 'three'})]
+        assert [key for key, _ in iterator.skipped_records] == [b'com.example:1600000000000001%2' + bytes(8)]
+    assert len(logged) == 1 and logged[0].startswith('1 records of')
+    with pytest.raises(ValueError):
+        list(iterator)
+    with fcm.FcmIterator(leveldb, 'com.other') as iterator:
+        assert [x.key for x in iterator] == ['com.other:1600000000000002%3']
+    assert FakeLevelDb.opened == 1
+
+
+def test_a_leveldb_that_cant_be_read_is_only_read_once(leveldb):
+    for _ in range(2):
+        with pytest.raises(ValueError, match='not a leveldb'):
+            fcm.FcmIterator(leveldb)
+    assert FakeLevelDb.opened == 1
+    fcm.clear_fcm_stores()
+    with pytest.raises(ValueError):
+        fcm.FcmIterator(leveldb)
+    assert FakeLevelDb.opened == 2
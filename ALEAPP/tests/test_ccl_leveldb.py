@@ -0,0 +1,229 @@
+# A small LevelDB written by the helpers below (a table file, a newer table with
+# deletions and overwrites, and a log file), checking the key range queries
+# against filtering every record of iterate_records_raw.
+
+import random
+import struct
+
+import pytest
+
+from scripts import ccl_leveldb
+
+
+def varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def blob(data):
+    return varint(len(data)) + data
+
+
+def snappy_literals(data):
+    '''data as snappy literals, which the decompressor reads like any compressed block'''
+    out = bytearray(varint(len(data)))
+    for start in range(0, len(data), 256):
+        chunk = data[start:start + 256]
+        out += bytes([60 << 2, len(chunk) - 1]) + chunk
+    return bytes(out)
+
+
+def internal_key(user_key, seq, live=True):
+    return user_key + struct.pack('<Q', seq << 8 | live)
+
+
+def block(entries, restart_interval=4):
+    '''A table block of (key, value) entries, keys sharing a prefix with the previous one'''
+    out = bytearray()
+    restarts = []
+    previous = b''
+    for number, (key, value) in enumerate(entries):
+        shared = 0
+        if number % restart_interval:
+            while shared < min(len(key), len(previous)) and key[shared] == previous[shared]:
+                shared += 1
+        else:
+            restarts.append(len(out))
+        out += varint(shared) + varint(len(key) - shared) + varint(len(value)) + key[shared:] + value
+        previous = key
+    for restart in restarts or [0]:
+        out += struct.pack('<I', restart)
+    return bytes(out + struct.pack('<I', len(restarts) or 1))
+
+
+def write_table(path, records, block_size=6, compress_every=2):
+    '''Writes an .ldb file of (user key, seq, live, value) records, in the order given'''
+    out = bytearray()
+    index = []
+    def add_block(raw, compressed):
+        offset = len(out)
+        data = snappy_literals(raw) if compressed else raw
+        out.extend(data + bytes([compressed]) + bytes(4))
+        return offset, len(data)
+    entries = [(internal_key(key, seq, live), value) for key, seq, live, value in records]
+    for number, start in enumerate(range(0, len(entries), block_size)):
+        chunk = entries[start:start + block_size]
+        offset, length = add_block(block(chunk), number % compress_every == 1)
+        index.append((chunk[-1][0], varint(offset) + varint(length)))
+    meta_handle = add_block(block([]), False)
+    index_handle = add_block(block(index, 1), False)
+    footer = b''.join(varint(value) for value in meta_handle + index_handle)
+    out += footer + bytes(40 - len(footer)) + struct.pack('<Q', ccl_leveldb.LdbFile.MAGIC)
+    path.write_bytes(bytes(out))
+
+
+def log_file(batches):
+    '''A log (or manifest) file of one block, each batch in a Full entry'''
+    out = bytearray()
+    for batch in batches:
+        out += struct.pack('<IHB', 0, len(batch), ccl_leveldb.LogEntryType.Full) + batch
+    return bytes(out)
+
+
+def write_log(path, first_seq, writes):
+    '''Writes a .log file of one batch of (key, value) writes, None values being deletions'''
+    batch = bytearray(struct.pack('<QI', first_seq, len(writes)))
+    for key, value in writes:
+        batch += bytes([value is not None]) + blob(key)
+        if value is not None:
+            batch += blob(value)
+    path.write_bytes(log_file([bytes(batch)]))
+
+
+def write_manifest(path, comparator, tables):
+    edit = bytearray(varint(ccl_leveldb.VersionEditTag.Comparator) + blob(comparator.encode()))
+    for level, file_no, records in tables:
+        keys = [internal_key(key, seq, live) for key, seq, live, _ in records]
+        edit += varint(ccl_leveldb.VersionEditTag.NewFile) + varint(level) + varint(file_no) + varint(1000)
+        edit += blob(min(keys)) + blob(max(keys))
+    edit += varint(ccl_leveldb.VersionEditTag.LastSequence) + varint(10000)
+    path.write_bytes(log_file([bytes(edit)]))
+
+
+def make_db(folder, comparator=ccl_leveldb.RawLevelDb.BYTEWISE_COMPARATOR, key_order=sorted):
+    '''Writes the database, returns the expected {user key: value} once deletions and overwrites are applied'''
+    folder.mkdir()
+    rnd = random.Random(1)
+    keys = [b'app:%04d' % n for n in range(0, 120, 3)] + [b'app:001', b'app', b'ap', b'apq', b'b\xff\xff',
+                                                          b'b\xff\xff\x00', b'zz:1', b'zz:2']
+    old = [(key, seq, True, b'v1:' + key) for seq, key in enumerate(key_order(keys), 1)]
+    # a newer level 0 table deleting and overwriting some of the keys
+    changed = rnd.sample(keys, 20)
+    newer = [(key, 1000 + seq, seq % 2 == 0, b'v2:' + key if seq % 2 == 0 else b'')
+             for seq, key in enumerate(key_order(changed))]
+    write_table(folder / '000005.ldb', key_order_records(old, key_order))
+    write_table(folder / '000006.ldb', key_order_records(newer, key_order), block_size=3)
+    write_manifest(folder / 'MANIFEST-000004', comparator, [(1, 5, old), (0, 6, newer)])
+    # the log has the newest writes, deleting or adding keys again
+    logged = [(b'app:0003', None), (b'app:0200', b'v3:app:0200'), (b'app:', b'v3:app:'), (b'ap', None),
+              (changed[0], b'v3:again')]
+    write_log(folder / '000007.log', 2000, logged)
+
+    expected = {}
+    for key, _, live, value in old + sorted(newer, key=lambda record: record[1]):
+        expected[key] = value if live else None
+    for key, value in logged:
+        expected[key] = value
+    return {key: value for key, value in expected.items() if value is not None}
+
+
+def key_order_records(records, key_order):
+    by_key = {record[0]: record for record in records}
+    return [by_key[key] for key in key_order(by_key)]
+
+
+def filtered(db, matches, include_deleted=False):
+    '''iterate_prefix or get done by filtering every record: the newest record of each matching user key'''
+    newest = {}
+    for record in db.iterate_records_raw():
+        if matches(record.user_key):
+            if record.user_key not in newest or record.seq > newest[record.user_key].seq:
+                newest[record.user_key] = record
+    return [newest[key] for key in sorted(newest)
+            if include_deleted or newest[key].state != ccl_leveldb.KeyState.Deleted]
+
+
+prefixes = [b'', b'a', b'ap', b'app', b'app:', b'app:00', b'app:001', b'app:0003', b'app:02', b'b', b'b\xff',
+            b'b\xff\xff', b'z', b'zz:', b'missing', b'\xff']
+
+
+@pytest.fixture
+def bytewise_db(tmp_path):
+    expected = make_db(tmp_path / 'db')
+    with ccl_leveldb.RawLevelDb(tmp_path / 'db') as db:
+        yield db, expected
+
+
+def test_iterate_prefix(bytewise_db):
+    db, expected = bytewise_db
+    assert db.is_bytewise
+    for prefix in prefixes:
+        found = list(db.iterate_prefix(prefix))
+        assert [(record.user_key, record.value) for record in found] == \
+            sorted((key, value) for key, value in expected.items() if key.startswith(prefix)), prefix
+        assert found == filtered(db, lambda key: key.startswith(prefix))
+
+
+def test_include_deleted(bytewise_db):
+    db, expected = bytewise_db
+    for prefix in prefixes:
+        found = list(db.iterate_prefix(prefix, include_deleted=True))
+        assert found == filtered(db, lambda key: key.startswith(prefix), include_deleted=True)
+        deleted = [record.user_key for record in found if record.state == ccl_leveldb.KeyState.Deleted]
+        assert not set(deleted) & set(expected)
+    deleted = {record.user_key for record in db.iterate_prefix(b'', include_deleted=True)} - set(expected)
+    assert b'app:0003' in deleted and b'ap' in deleted and len(deleted) > 5
+
+
+def test_get(bytewise_db):
+    db, expected = bytewise_db
+    keys = {record.user_key for record in db.iterate_records_raw()} | {b'app:00', b'missing', b'app:0003\x00'}
+    for key in keys:
+        record = db.get(key)
+        if key in expected:
+            assert record.user_key == key and record.value == expected[key]
+            assert [record] == filtered(db, lambda user_key: user_key == key)
+        else:
+            assert record is None
+
+
+def test_ldb_iterate_range(tmp_path):
+    make_db(tmp_path / 'db')
+    table = ccl_leveldb.LdbFile(tmp_path / 'db' / '000005.ldb')
+    try:
+        records = list(table)
+        assert len({record.origin_file for record in records}) == 1
+        assert any(record.was_compressed for record in records) and not all(record.was_compressed for record in records)
+        keys = sorted({record.user_key for record in records} | {b'', b'app:0050', b'app:9', b'b', b'\xff'})
+        for start in keys:
+            for end in [None] + keys:
+                expected = [record for record in records if start <= record.user_key and
+                            (end is None or record.user_key < end)]
+                assert list(table.iterate_range(start, end)) == expected, (start, end)
+                assert list(table.iterate_range(start, end, ordered=False)) == expected, (start, end)
+    finally:
+        table.close()
+
+
+def test_non_bytewise_comparator(tmp_path):
+    # the tables are in the order of another comparator, so only a full scan finds the keys
+    make_db(tmp_path / 'db', comparator='idb_cmp1', key_order=lambda keys: sorted(keys, reverse=True))
+    with ccl_leveldb.RawLevelDb(tmp_path / 'db') as db:
+        assert not db.is_bytewise
+        assert db.manifest.comparator == 'idb_cmp1'
+        for prefix in prefixes:
+            for include_deleted in (False, True):
+                assert list(db.iterate_prefix(prefix, include_deleted=include_deleted)) == \
+                    filtered(db, lambda key: key.startswith(prefix), include_deleted), prefix
+        for record in filtered(db, lambda key: True):
+            assert db.get(record.user_key) == record
+        # the binary search of the bytewise path would miss keys
+        table = next(file for file in db._files if file.path.name == '000005.ldb')
+        assert list(table.iterate_range(b'app:', b'app;')) != list(table.iterate_range(b'app:', b'app;', ordered=False))
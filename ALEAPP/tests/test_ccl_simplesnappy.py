@@ -0,0 +1,27 @@
+import pytest
+
+from scripts import ccl_simplesnappy
+
+
+def test_decompress():
+    # literal "abcd", then an 8 byte copy at offset 4 that overlaps its output
+    data = b'\x0c\x0cabcd\x11\x04'
+    for buffer_type in (bytes, bytearray, memoryview):
+        assert ccl_simplesnappy._decompress_python(buffer_type(data)) == b'abcd' * 3
+        assert ccl_simplesnappy.decompress_bytes(buffer_type(data)) == b'abcd' * 3
+
+
+@pytest.mark.parametrize('data', [
+    b'\xff\xff\xff\xff\x0f\x00', # 4GiB from 1 byte
+    b'\x80\x80\x80\x80\x80\x80\x80\x80\x80\x01abc',
+])
+def test_uncompressed_length_larger_than_the_data_can_hold(data):
+    with pytest.raises(ValueError, match='too large'):
+        ccl_simplesnappy._decompress_python(data)
+
+
+def test_largest_expansion():
+    cramjam = pytest.importorskip('cramjam')
+    raw = b'x' * 1000000
+    compressed = bytes(cramjam.snappy.compress_raw(raw))
+    assert ccl_simplesnappy._decompress_python(compressed) == raw
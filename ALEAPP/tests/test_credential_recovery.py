@@ -0,0 +1,114 @@
+import hashlib
+import itertools
+import random
+
+import pytest
+
+from scripts import credential_recovery
+
+
+def brute_force_pins(length):
+    '''hashcode -> digit strings of length with that Java String.hashCode(), as NQ_Vault searched them'''
+    pins = {}
+    for digits in itertools.product('0123456789', repeat=length):
+        pin = ''.join(digits)
+        pins.setdefault(credential_recovery.java_string_hashcode(pin), []).append(pin)
+    return pins
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def implementation(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(credential_recovery, 'numpy', None)
+    return request.param
+
+
+def test_java_string_hashcode():
+    assert credential_recovery.java_string_hashcode('') == 0
+    assert credential_recovery.java_string_hashcode('hello') == 99162322
+    assert credential_recovery.java_string_hashcode('polygenelubricants') == -2**31
+    assert credential_recovery.java_string_hashcode('1234') == 1509442
+
+
+@pytest.mark.parametrize('length', range(1, 6))
+def test_same_pins_as_the_exhaustive_search(length):
+    rnd = random.Random(length)
+    brute_forced = brute_force_pins(length)
+    targets = rnd.sample(sorted(brute_forced), min(200, len(brute_forced))) + [rnd.getrandbits(32) for _ in range(50)]
+    for hashcode in targets:
+        signed = (hashcode + 2**31) % 2**32 - 2**31
+        assert list(credential_recovery.java_hashcode_pins(hashcode, length, length)) == brute_forced.get(signed, [])
+
+
+def test_long_pins(implementation):
+    rnd = random.Random(3)
+    for length in (8, 9, 10, 11, 12):
+        pin = ''.join(rnd.choice('0123456789') for _ in range(length))
+        hashcode = credential_recovery.java_string_hashcode(pin)
+        pins = list(credential_recovery.java_hashcode_pins(hashcode, length, length))
+        assert pin in pins
+        assert pins == sorted(set(pins))
+        assert all(len(found) == length and credential_recovery.java_string_hashcode(found) == hashcode
+                   for found in pins)
+
+
+def test_numpy_and_python_agree(monkeypatch):
+    pytest.importorskip('numpy')
+    rnd = random.Random(4)
+    for _ in range(5):
+        hashcode = rnd.getrandbits(32) - 2**31
+        with_numpy = list(credential_recovery.java_hashcode_pins(hashcode, 8, 11))
+        monkeypatch.setattr(credential_recovery, 'numpy', None)
+        assert list(credential_recovery.java_hashcode_pins(hashcode, 8, 11)) == with_numpy
+        monkeypatch.undo()
+
+
+@pytest.mark.parametrize('hashcode, pin', [
+    # the PINs NQ_Vault used to know, 0000 being found before the shorter ones of its hashcode
+    ('1509442', '1234'), ('1477632', '0000'), ('-1867378635', '123456789'), ('-1812067894', '25101988'),
+])
+def test_known_pins(hashcode, pin, implementation):
+    assert credential_recovery.recover_java_hashcode_pin(hashcode, len(pin)) == pin
+    assert pin in credential_recovery.java_hashcode_pins(hashcode, len(pin), len(pin))
+
+
+def test_find_pbkdf2_password(monkeypatch):
+    monkeypatch.setattr(credential_recovery.os, 'cpu_count', lambda: 4)
+    salt = b'salt'
+    target = hashlib.pbkdf2_hmac('sha1', b'2718', salt, 10, 16)
+    passwords = [b'%04d' % n for n in range(3000)]
+    assert credential_recovery.find_pbkdf2_password(passwords, salt, 10, 16, lambda password, key: key == target,
+                                                    chunk_size=64) == (b'2718', target)
+    assert credential_recovery.find_pbkdf2_password(passwords[:100], salt, 10, 16, lambda password, key: False) is None
+
+
+@pytest.fixture
+def tables(tmp_path, monkeypatch):
+    monkeypatch.setattr(credential_recovery, 'table_folder', str(tmp_path / 'tables'))
+    credential_recovery._digest_table.cache_clear()
+    yield tmp_path / 'tables'
+    credential_recovery._digest_table.cache_clear()
+
+
+def test_hash_tables(tables):
+    digest = hashlib.sha1(b'2580').hexdigest()
+    assert credential_recovery.pin_for_hash(digest, 'sha1', 4, 4) == '2580'
+    assert credential_recovery.pin_for_hash(hashlib.sha256(b'0917').digest(), 'sha256', 3, 4) == '0917'
+    assert credential_recovery.pin_for_hash(digest, 'sha1', 5, 5) is None
+    assert credential_recovery.pattern_for_hash(hashlib.sha1(bytes([0, 4, 8, 5])).hexdigest(), 'sha1', 4, 4) == '0485'
+    assert sorted(path.name for path in tables.iterdir()) == [
+        'pattern-sha1-4-40.bin', 'pin-sha1-4-40.bin', 'pin-sha1-5-40.bin', 'pin-sha256-3-40.bin', 'pin-sha256-4-40.bin']
+    # read back from the files
+    credential_recovery._digest_table.cache_clear()
+    assert credential_recovery.pin_for_hash(digest, 'sha1', 4, 4) == '2580'
+
+
+def test_lengths_larger_than_the_table_index(tables):
+    assert 10 ** 7 <= 1 << credential_recovery.index_bits < 10 ** 8
+    with pytest.raises(ValueError):
+        credential_recovery.pin_for_hash(hashlib.sha1(b'12345678').hexdigest(), 'sha1', 4, 8)
+    assert not tables.exists()
+    assert credential_recovery.pin_for_hash(credential_recovery.java_string_hashcode('12345678'),
+                                            'java_hashcode', 8, 8) == '12345678'
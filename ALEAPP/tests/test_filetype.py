@@ -0,0 +1,169 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import random
+import sqlite3
+import tarfile
+import zipfile
+
+import pytest
+
+from scripts import filetype
+from scripts.filetypes import TYPES
+from scripts.filetypes.isobmff import IsoBmff
+
+
+def linear_match(obj, matchers=TYPES):
+    '''filetype.match before the dispatch table'''
+    buf = filetype.get_bytes(obj)
+    for matcher in matchers:
+        if matcher.match(buf):
+            return matcher
+    return None
+
+
+def outcome(match, *args):
+    try:
+        return match(*args)
+    except Exception as ex:
+        return type(ex)
+
+
+def ftyp(brand, *compatible):
+    box = brand + b'\x00\x00\x02\x00' + b''.join(compatible)
+    return (len(box) + 8).to_bytes(4, 'big') + b'ftyp' + box
+
+
+def zipped(*names, stored_first=None):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as archive:
+        if stored_first:
+            archive.writestr(stored_first[0], stored_first[1], compress_type=zipfile.ZIP_STORED)
+        for name in names:
+            archive.writestr(name, b'<x/>' * 10)
+    return data.getvalue()
+
+
+def sqlite_header(tmp_path):
+    path = os.path.join(str(tmp_path), 'sample.db')
+    with sqlite3.connect(path) as db:
+        db.execute('CREATE TABLE t (a)')
+    with open(path, 'rb') as db_file:
+        return db_file.read(1024)
+
+
+def tar_header():
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode='w') as archive:
+        member = tarfile.TarInfo('file.txt')
+        member.size = 3
+        archive.addfile(member, io.BytesIO(b'abc'))
+    return data.getvalue()
+
+
+def samples(tmp_path):
+    '''A header for each signature, real ones where the standard library writes them'''
+    ebml = b'\x1a\x45\xdf\xa3\x93\x42\x82'
+    headers = [
+        b'AC1015', b'gimp xcf v011', b'\xff\xd8\xff\xe0\x00\x10JFIF',
+        b'\x00\x00\x00\x0cjP  \r\n\x87\n' + ftyp(b'jp2 ', b'jp2 '),
+        b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR' + bytes(17) + b'\x00\x00\x00\x08acTL' + bytes(12),
+        b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR' + bytes(17), b'GIF89a', b'RIFF\x00\x00\x00\x00WEBPVP8 ',
+        b'II*\x00\x10\x00\x00\x00CR\x02', b'II*\x00', b'MM\x00*', b'BM', b'II\xbc\x01', b'8BPS\x00\x01',
+        b'\x00\x00\x01\x00\x01\x00', bytes(128) + b'DICM', b'qoif',
+        ftyp(b'heic', b'mif1', b'heic'), ftyp(b'avif', b'mif1', b'avif'), ftyp(b'3gp4', b'isom', b'3gp4'),
+        ftyp(b'isom', b'isom', b'mp41'), ftyp(b'mp42', b'mp42', b'isom'), ftyp(b'M4V ', b'M4V ', b'M4A ', b'mp42'),
+        ftyp(b'qt  ', b'qt  '), ftyp(b'M4A ', b'M4A ', b'mp42'), ftyp(b'dash', b'iso6'),
+        ebml + b'\x88matroska', ebml + b'\x84webm', b'RIFF\x00\x00\x00\x00AVI LIST',
+        b'0&\xb2u\x8ef\xcf\x11\xa6\xd9\x00\xaa\x00b\xce\x6c', b'\x00\x00\x01\xba', b'\x00\x00\x01\xb3',
+        b'FLV\x01\x05', b'\xff\xf1\x50', b'\xff\xf9', b'MThd\x00\x00\x00\x06', b'ID3\x03\x00', b'\xff\xfb\x90',
+        b'OggS\x00\x02', b'fLaC\x00\x00\x00\x22', b'RIFF\x00\x00\x00\x00WAVEfmt ', b'#!AMR\n',
+        b'FORM\x00\x00\x00\x00AIFFCOMM', b'wOFF\x00\x01\x00\x00', b'wOF2\x00\x01\x00\x00',
+        b'\x00\x01\x00\x00\x00\x0f', b'OTTO\x00\x0f',
+        b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + bytes(504) + b'\xec\xa5\xc1\x00',
+        b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + bytes(504) + b'\x09\x08\x10\x00\x00\x06\x05\x00',
+        b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + bytes(504) + b'\xa0\x46\x1d\xf0',
+        zipped('word/document.xml'), zipped('xl/workbook.xml'), zipped('ppt/presentation.xml'),
+        zipped('[Content_Types].xml', '_rels/.rels', 'word/document.xml'),
+        zipped('[Content_Types].xml', 'xl/styles.xml'), zipped('docProps/app.xml', 'ppt/slides/slide1.xml'),
+        zipped('content.xml', stored_first=('mimetype', 'application/vnd.oasis.opendocument.text')),
+        zipped('content.xml', stored_first=('mimetype', 'application/vnd.oasis.opendocument.spreadsheet')),
+        zipped('content.xml', stored_first=('mimetype', 'application/vnd.oasis.opendocument.presentation')),
+        zipped('content.opf', stored_first=('mimetype', 'application/epub+zip')), zipped('a.txt'),
+        b'\xce\xb2\xcf\x81', b'\xed\xab\xee\xdb', b'Rar!\x1a\x07\x00', b'Rar!\x1a\x07\x01\x00',
+        gzip.compress(b'abc'), bz2.compress(b'abc'), b"7z\xbc\xaf'\x1c\x00\x04", b'%PDF-1.4\n',
+        b'\xef\xbb\xbf%PDF-1.7', b'MZ\x90\x00', b'CWS\x0a', b'FWS\x0a', b'ZWS\x0d', b'{\\rtf1\\ansi',
+        b'NES\x1a', b'Cr24\x02\x00', b'MSCF\x00\x00', b'ISc(\x01', bytes(8) + b'\x02\x00\x01' + bytes(23) + b'LP' + bytes(8),
+        b'%!PS-Adobe', lzma.compress(b'abc'), sqlite_header(tmp_path), b'!<arch>\ndebian-binary   ',
+        b'!<arch>\n', b'\x1f\x9d\x90', b'\x1f\xa0', b'\x89LZO\x00\r\n\x1a\n', b'LZIP\x01',
+        b'\x7fELF\x02\x01\x01' + bytes(9) + b'\x02\x00', b'\x04"M\x18', b'(\xb5/\xfd\x00',
+        b'P*M\x18\x04\x00\x00\x00', b'\x00asm\x01\x00\x00\x00', b'{"key": "value"}', b'[1, 2, 3]',
+        b'<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" '
+        b'"http://www.apple.com/DTDs/PropertyList-1.0.dtd">\n<plist version="1.0">',
+        b'<!DOCTYPE html><html>', b'<!doctype HTML>\n<html>', b'<html><head>', tar_header(), b'', b'\x00',
+    ]
+    return headers
+
+
+def variants(rnd, header):
+    '''The header, cut short, padded and with bytes changed'''
+    yield header
+    yield header + bytes(9000)
+    tail = bytes(rnd.getrandbits(8) for _ in range(700))
+    yield header + tail
+    for length in sorted(set([*range(min(len(header), 40)), *rnd.sample(range(len(header) + 1),
+                                                                         min(len(header) + 1, 20))])):
+        yield header[:length]
+    padded = bytearray(header + tail)
+    for _ in range(30):
+        mutated = bytearray(padded)
+        for _ in range(rnd.randint(1, 3)):
+            mutated[rnd.randrange(min(len(mutated), 300))] = rnd.getrandbits(8)
+        yield bytes(mutated)
+
+
+def test_every_matcher_has_a_signature():
+    # matchers without one are tried on every buffer, and read up to 8 KB from every file
+    for matcher in TYPES:
+        assert isinstance(matcher, IsoBmff) or type(matcher) in filetype._SIGNATURES, type(matcher)
+
+
+def test_the_samples_cover_the_matchers(tmp_path):
+    headers = [header + bytes(3000) for header in samples(tmp_path)]
+    missing = [f'{type(matcher).__module__}.{type(matcher).__name__}' for matcher in TYPES
+               if not any(outcome(matcher.match, header) is True for header in headers)]
+    # compares 3 header bytes to 4, as in filetype, so it can't match anything
+    assert missing == ['scripts.filetypes.archive.Dcm']
+
+
+def test_same_match_as_the_matcher_loop(tmp_path):
+    rnd = random.Random(1)
+    buffers = [buf for header in samples(tmp_path) for buf in variants(rnd, header)]
+    buffers += [bytes(rnd.getrandbits(8) for _ in range(rnd.randint(0, 600))) for _ in range(2000)]
+    buffers += [bytes([first]) + bytes(rnd.getrandbits(8) for _ in range(300)) for first in range(256)]
+    matcher_lists = [TYPES, filetype.image_matchers, filetype.video_matchers, filetype.audio_matchers,
+                     filetype.font_matchers, filetype.document_matchers, filetype.archive_matchers,
+                     filetype.application_matchers]
+    for buf in buffers:
+        for matchers in matcher_lists:
+            for obj in (buf, bytearray(buf)):
+                assert outcome(filetype.match, obj, matchers) is outcome(linear_match, obj, matchers), (buf[:32],)
+
+
+def test_files_are_read_as_far_as_their_matchers_look(tmp_path):
+    rnd = random.Random(2)
+    headers = samples(tmp_path)
+    # an ftyp box longer than the first read
+    headers.append(ftyp(b'isom', *[b'mp41'] * 200))
+    for number, header in enumerate(headers):
+        for variant, buf in enumerate((header, header + bytes(9000), header + os.urandom(600))):
+            path = str(tmp_path / f'{number}_{variant}')
+            with open(path, 'wb') as sample_file:
+                sample_file.write(buf)
+            expected = outcome(linear_match, path)
+            assert outcome(filetype.match, path) is expected, header[:32]
+            assert outcome(filetype.match, path) is expected # cached
+            if not isinstance(expected, type): # not an exception
+                assert filetype.guess_many([path]) == [expected]
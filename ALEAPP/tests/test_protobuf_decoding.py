@@ -0,0 +1,124 @@
+# scripts.protobuf_decoding must give the same values, typedefs and exceptions as
+# blackboxprotobuf.decode_message, which it reimplements for the 1.0.1 release.
+
+import copy
+import random
+import struct
+
+import pytest
+
+blackboxprotobuf = pytest.importorskip('blackboxprotobuf')
+protobuf_decoding = pytest.importorskip('scripts.protobuf_decoding')
+
+
+def varint(value):
+    value &= (1 << 64) - 1
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def random_message(rnd, depth=0):
+    out = bytearray()
+    for _ in range(rnd.randint(0, 6)):
+        field_number = rnd.choice([1, 2, 3, 4, 5, 15, 16, 300])
+        wire_type = rnd.choice([0, 0, 1, 2, 2, 2, 5, 3])
+        if wire_type == 3 and depth > 3:
+            wire_type = 0
+        out += varint(field_number << 3 | wire_type)
+        if wire_type == 0:
+            out += varint(rnd.choice([0, 1, 127, 128, -1, 2 ** 63, rnd.getrandbits(40)]))
+        elif wire_type == 1:
+            out += struct.pack('<Q', rnd.getrandbits(64))
+        elif wire_type == 5:
+            out += struct.pack('<I', rnd.getrandbits(32))
+        elif wire_type == 2:
+            if depth < 5 and rnd.random() < .5:
+                body = random_message(rnd, depth + 1)
+            else:
+                body = rnd.choice([b'hello', 'é'.encode(), bytes(rnd.getrandbits(8) for _ in range(rnd.randint(0, 12)))])
+            out += varint(len(body)) + body
+        else:
+            out += random_message(rnd, depth + 1) + varint(field_number << 3 | 4)
+    return bytes(out)
+
+
+def mutate(rnd, data):
+    data = bytearray(data)
+    for _ in range(rnd.randint(1, 3)):
+        if not data:
+            break
+        position = rnd.randrange(len(data))
+        operation = rnd.random()
+        if operation < .4:
+            data[position] = rnd.getrandbits(8)
+        elif operation < .7:
+            del data[position:]
+        else:
+            data.insert(position, rnd.getrandbits(8))
+    return bytes(data)
+
+
+def outcome(function, *args):
+    try:
+        return 'value', function(*args)
+    except Exception as ex:
+        return 'error', type(ex), str(ex)
+
+
+def blobs():
+    rnd = random.Random(1)
+    found = [b'', b'\x08', b'\x0c', b'\x0b\x0c', b'\x0a\x05abc', bytearray(b'\x0a\x03abc'),
+             b'\x08' + b'\xff' * 11, b'\x0a\x03\x08\x01\x08\x0a\x01\x01']
+    for _ in range(2000):
+        message = random_message(rnd)
+        found += [message, mutate(rnd, message), bytes(rnd.getrandbits(8) for _ in range(rnd.randint(0, 20)))]
+    return found
+
+
+def test_the_installed_library_is_the_one_reimplemented():
+    assert protobuf_decoding.compatible_library
+
+
+@pytest.mark.parametrize('start', range(0, 6008, 1000))
+def test_same_result_as_blackboxprotobuf(start):
+    rnd = random.Random(start)
+    all_blobs = blobs()
+    for data in all_blobs[start:start + 1000]:
+        expected = outcome(blackboxprotobuf.decode_message, data)
+        assert outcome(protobuf_decoding.decode_message, data) == expected, data
+        if expected[0] == 'value':
+            # decoding again with the typedef found, as the artifacts do with the types of a first row
+            typedef = expected[1][1]
+            for other in (data, mutate(rnd, data), rnd.choice(all_blobs)):
+                typedef_before = copy.deepcopy(typedef)
+                assert outcome(protobuf_decoding.decode_message, other, typedef) == \
+                    outcome(blackboxprotobuf.decode_message, other, typedef), (other, typedef)
+                assert typedef == typedef_before
+
+
+def test_named_fields_and_message_types():
+    data = b'\x0a\x02\x08\x01\x12\x02hi\x18\x03'
+    typedef = {'1': {'type': 'message', 'name': 'inner', 'message_typedef': {'1': {'type': 'uint', 'name': 'n'}}},
+               '2': {'type': 'str', 'name': 'text'}, '3': {'type': 'sint', 'name': ''}}
+    for message_type in (typedef, None, 'None', {}):
+        expected = outcome(blackboxprotobuf.decode_message, data, message_type)
+        assert expected[0] == 'value'
+        assert outcome(protobuf_decoding.decode_message, data, message_type) == expected
+
+
+@pytest.mark.parametrize('process_pool_allowed', [False, True])
+def test_decode_messages_keeps_order(monkeypatch, process_pool_allowed):
+    monkeypatch.setattr(protobuf_decoding, 'process_pool_allowed', process_pool_allowed)
+    monkeypatch.setattr(protobuf_decoding.os, 'cpu_count', lambda: 2)
+    rnd = random.Random(7)
+    messages = [random_message(rnd) for _ in range(1500)]
+    messages = [message for message in messages if outcome(blackboxprotobuf.decode_message, message)[0] == 'value']
+    assert protobuf_decoding.decode_messages(messages, chunk_size=100) == \
+        [blackboxprotobuf.decode_message(message) for message in messages]
@@ -0,0 +1,266 @@
+# parse3 and ccl_protobuff read the wire format with scripts.protobuf_wire, and
+# must give the same values, parse3 strings and exceptions as their readers did
+# before it, reproduced here.
+
+import io
+import random
+import struct
+
+import pytest
+
+from scripts import ccl_protobuff, parse3, protobuf_wire
+
+
+def varint(value, length=None):
+    '''value as a varint, padded with continuation bytes to length'''
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value or (length and len(out) + 1 < length):
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def linear_get_dynamic_wire_format(data, start, end):
+    '''parse3.GetDynamicWireFormat before protobuf_wire'''
+    wire_type = data[start] & 0x7
+    firstByte = data[start]
+    if (firstByte & 0x80) == 0:
+        field_number = (firstByte >> 3)
+        return (start+1, wire_type, field_number)
+    byteList = []
+    pos = 0
+    while True:
+        if start+pos >= end:
+            return (None, None, None)
+        oneByte = data[start+pos]
+        byteList.append(oneByte & 0x7F)
+        pos = pos + 1
+        if oneByte & 0x80 == 0x0:
+            break
+    field_number = 0
+    for byte in reversed(byteList):
+        field_number = (field_number << 0x7) + byte
+    return (start + pos, wire_type, field_number >> 3)
+
+
+def linear_retrieve_int(data, start, end):
+    '''parse3.RetrieveInt before protobuf_wire'''
+    pos = 0
+    byteList = []
+    while True:
+        if start+pos >= end:
+            return (None, None, False)
+        oneByte = data[start+pos]
+        byteList.append(oneByte & 0x7F)
+        pos = pos + 1
+        if oneByte & 0x80 == 0x0:
+            break
+    num = 0
+    for byte in reversed(byteList):
+        num = (num << 0x7) + byte
+    return (num, start + pos, True)
+
+
+def linear_read_fixed(data, start, size, end):
+    '''The 64 and 32 bit field loops of parse3.ParseData before protobuf_wire'''
+    num = 0
+    pos = size - 1
+    while pos >= 0:
+        if start+pos >= end:
+            return (None, start)
+        num = (num << 8) + data[start+pos]
+        pos = pos - 1
+    return (num, start + size)
+
+
+def linear_read_protobuff(stream, tag_mappings):
+    '''ccl_protobuff.read_protobuff before protobuf_wire'''
+    result = []
+    while True:
+        tag = ccl_protobuff.read_tag(stream, tag_mappings)
+        if tag is None:
+            break
+        result.append(tag)
+    return result
+
+
+def linear_read_embedded_protobuf(stream, mappings):
+    '''ccl_protobuff.read_embedded_protobuf before protobuf_wire'''
+    return linear_read_protobuff(io.BytesIO(ccl_protobuff.read_blob(stream)), mappings)
+
+
+def mappings(read_embedded):
+    inner = {
+        0x08: ccl_protobuff.ProtoDecoder('number', ccl_protobuff.read_le_varint),
+        0x12: ccl_protobuff.read_string,
+    }
+    return {
+        0x08: ccl_protobuff.read_le_varint,
+        0x12: ccl_protobuff.ProtoDecoder('text', ccl_protobuff.read_string),
+        0x1a: ccl_protobuff.ProtoDecoder('inner', lambda stream: read_embedded(stream, inner)),
+        0x21: ccl_protobuff.read_double,
+        0x29: ccl_protobuff.read_long,
+        0x35: ccl_protobuff.read_int,
+        0x3a: ccl_protobuff.read_blob,
+    }
+
+
+def outcome(function, *args):
+    try:
+        return function(*args)
+    except Exception as ex:
+        return type(ex), str(ex)
+
+
+def plain(value):
+    '''ProtoObjects as tuples, to compare them'''
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    if isinstance(value, ccl_protobuff.ProtoObject):
+        return value.tag, value.name, plain(value.value)
+    return value
+
+
+def parse3_result(data):
+    parse3.strings = []
+    messages = {}
+    result = outcome(parse3.ParseData, data, 0, len(data), messages)
+    return result, messages, parse3.strings
+
+
+def random_message(rnd, depth=0):
+    out = bytearray()
+    for _ in range(rnd.randint(0, 6)):
+        field_number = rnd.choice([1, 2, 3, 4, 5, 6, 7, 15, 16, 300])
+        wire_type = rnd.choice([0, 0, 1, 2, 2, 2, 5, 3, 6])
+        key = field_number << 3 | wire_type
+        out += varint(key, rnd.choice([None, None, None, 3, 10, 11]))
+        if wire_type == 0:
+            out += varint(rnd.choice([0, 1, 127, 128, 2 ** 63, 2 ** 64 - 1, 2 ** 70, rnd.getrandbits(40)]),
+                          rnd.choice([None, None, 10, 11, 12]))
+        elif wire_type == 1:
+            out += struct.pack('<Q', rnd.getrandbits(64))
+        elif wire_type == 5:
+            out += struct.pack('<I', rnd.getrandbits(32))
+        elif wire_type == 2:
+            if depth < 3 and rnd.random() < 0.4:
+                value = random_message(rnd, depth + 1)
+            else:
+                value = rnd.choice([b'', 'text é'.encode('utf-8'), b'\xff\xfe', bytes(rnd.getrandbits(8)
+                                    for _ in range(rnd.randint(1, 20))), b''.join(varint(n) for n in range(120, 140))])
+            out += varint(len(value)) + value
+    return bytes(out)
+
+
+def fixed_messages():
+    return [
+        b'',
+        b'\x08\x96\x01',
+        b'\x08' + varint(2 ** 64 - 1),
+        # varints of 10 and 11 bytes, ccl_protobuff stops reading at 10
+        b'\x08' + varint(1, 10) + b'\x10\x01',
+        b'\x08' + varint(1, 11) + b'\x10\x01',
+        b'\x08' + b'\xff' * 12,
+        varint(0x08, 10) + b'\x01',
+        varint(0x08, 11) + b'\x01',
+        b'\x12\x07testing',
+        b'\x12\x02\xff\xfe',
+        b'\x1a\x03\x08\x96\x01',
+        b'\x1a\x08\x08\x01\x12\x04abcd',
+        b'\x21' + struct.pack('<d', 1.5) + b'\x29' + struct.pack('<q', -3) + b'\x35' + struct.pack('<i', -7),
+        b'\x3a' + varint(300) + bytes(300),
+        b'\x3a' + varint(2 ** 63 + 5),
+        b'\x3a' + varint(2 ** 70),
+        b'\x0b\x08\x01\x0c',
+        b'\x0e\x01\x02',
+        b'\x42\x06' + b''.join(varint(n) for n in (1, 300, 70000)),
+        b'\x4d' + struct.pack('<f', 2.5) + b'\x51' + struct.pack('<d', -0.25),
+    ]
+
+
+def inputs():
+    rnd = random.Random(1)
+    messages = fixed_messages() + [random_message(rnd) for _ in range(300)]
+    for message in messages:
+        yield message
+        for length in range(len(message)):
+            yield message[:length]
+    for _ in range(300):
+        mutated = bytearray(random_message(rnd))
+        for _ in range(rnd.randint(1, 3)):
+            if mutated:
+                mutated[rnd.randrange(len(mutated))] = rnd.getrandbits(8)
+        yield bytes(mutated)
+
+
+def test_read_varint():
+    assert protobuf_wire.read_varint(b'\x96\x01', 0) == (150, 2)
+    assert protobuf_wire.read_varint(b'\x00\x96\x01', 1, 2) == (None, 2)
+    assert protobuf_wire.read_varint(b'', 0) == (None, 0)
+    assert protobuf_wire.read_varint(varint(5, 10), 0, max_length=10) == (5, 10)
+    assert protobuf_wire.read_varint(varint(5, 11), 0, max_length=10) == (5, 10)
+    assert protobuf_wire.read_varint(varint(5, 11), 0) == (5, 11)
+    assert protobuf_wire.read_varint(b'\xff' * 9, 0, max_length=10) == (None, 9)
+    for value in (0, 1, 127, 128, 16383, 16384, 2 ** 63, 2 ** 64 - 1, 2 ** 90):
+        data = b'\x01' + varint(value) + b'\x02'
+        for buffer in (data, bytearray(data), memoryview(data)):
+            assert protobuf_wire.read_varint(buffer, 1) == (value, len(data) - 1)
+
+
+def test_retrieve_int_and_get_dynamic_wire_format():
+    rnd = random.Random(2)
+    data = b''.join(varint(rnd.choice([0, 127, 128, 2 ** 35, 2 ** 64 - 1, 2 ** 80]), rnd.choice([None, 3, 10, 11]))
+                    for _ in range(200))
+    for start in range(len(data) + 1):
+        for end in {start, start + 1, start + 2, start + 11, len(data)}:
+            assert outcome(parse3.RetrieveInt, data, start, end) == outcome(linear_retrieve_int, data, start, end)
+            assert outcome(parse3.GetDynamicWireFormat, data, start, end) == \
+                outcome(linear_get_dynamic_wire_format, data, start, end)
+
+
+def test_parse_data_as_before(monkeypatch):
+    data = list(inputs())
+    results = [parse3_result(message) for message in data]
+    monkeypatch.setattr(parse3, 'GetDynamicWireFormat', linear_get_dynamic_wire_format)
+    monkeypatch.setattr(parse3, 'RetrieveInt', linear_retrieve_int)
+    monkeypatch.setattr(parse3, 'read_fixed', linear_read_fixed)
+    for message, result in zip(data, results):
+        assert parse3_result(message) == result, message
+
+
+def test_read_protobuff_as_before():
+    new_mappings = mappings(ccl_protobuff.read_embedded_protobuf)
+    old_mappings = mappings(linear_read_embedded_protobuf)
+    raised = set()
+    for message in inputs():
+        for tag_mappings in ({}, new_mappings):
+            result = plain(outcome(ccl_protobuff.read_protobuff, io.BytesIO(message), tag_mappings))
+            expected = plain(outcome(linear_read_protobuff, io.BytesIO(message),
+                                     old_mappings if tag_mappings else {}))
+            assert result == expected, message
+            if isinstance(expected, tuple):
+                raised.add(expected[0])
+    # truncated and invalid input raise what the stream readers raised
+    assert {IndexError, TypeError, ValueError, UnicodeDecodeError} <= raised
+
+
+@pytest.mark.parametrize('message, exception', [
+    (b'\x08', IndexError),
+    (b'\x08\x96', IndexError),
+    (b'\x12', TypeError),
+    (b'\x12\x05abc', ValueError),
+    (b'\x3a' + varint(2 ** 63 + 5), OverflowError),
+    (b'\x0b', ValueError),
+    (b'\x21\x00\x00', struct.error),
+    (b'\x09\x00\x00', ValueError),
+])
+def test_read_protobuff_exceptions(message, exception):
+    tag_mappings = mappings(ccl_protobuff.read_embedded_protobuf)
+    with pytest.raises(exception):
+        ccl_protobuff.read_protobuff(io.BytesIO(message), tag_mappings)
+    with pytest.raises(exception):
+        linear_read_protobuff(io.BytesIO(message), mappings(linear_read_embedded_protobuf))
@@ -0,0 +1,201 @@
+import io
+import os
+import sqlite3
+import tarfile
+
+import pytest
+
+search_files = pytest.importorskip('scripts.search_files')
+
+
+@pytest.fixture(autouse=True)
+def no_log(monkeypatch):
+    monkeypatch.setattr(search_files, 'logfunc', lambda *args: None)
+
+
+def make_tar(path, files):
+    with tarfile.open(path, 'w:gz' if path.endswith('gz') else 'w') as tar:
+        for name, data in files:
+            member = tarfile.TarInfo(name)
+            member.size = len(data)
+            member.mtime = 1600000000
+            tar.addfile(member, io.BytesIO(data))
+
+
+@pytest.mark.parametrize('file_name', ['evidence.tar', 'evidence.tar.gz'])
+def test_tar_listing_cache(tmp_path, file_name):
+    files = {f'data/data/app{n}/databases/db{n}.db': os.urandom(n * 100) for n in range(20)}
+    tar_path = str(tmp_path / file_name)
+    make_tar(tar_path, files.items())
+    cache = search_files.ListingCache(str(tmp_path))
+
+    def search(run):
+        seeker = search_files.FileSeekerTar(tar_path, str(tmp_path / run), cache)
+        try:
+            found = seeker.search_many(['*/app1*/databases/*.db', '*/app7/*'])
+            return seeker, {pattern: sorted(os.path.relpath(path, str(tmp_path / run)) for path in paths)
+                            for pattern, paths in found.items()}
+        finally:
+            seeker.cleanup()
+
+    seeker, first = search('first')
+    assert seeker._members is None
+    seeker, second = search('second')
+    assert seeker._members is not None and len(seeker._members) == len(files)
+    assert first == second
+    assert len(first['*/app1*/databases/*.db']) == 11
+    for path in second['*/app1*/databases/*.db']:
+        with open(str(tmp_path / 'second' / path), 'rb') as extracted:
+            assert extracted.read() == files[path.replace(os.sep, '/')]
+
+    # a listing that isn't JSON is never decoded
+    with sqlite3.connect(cache.db_path) as db:
+        assert db.execute('SELECT count(*) FROM listings').fetchone()[0] == 1
+        db.execute("UPDATE listings SET data=x'80049500'")
+    assert cache.load('tar', tar_path) is None
+
+
+@pytest.mark.parametrize('file_name', ['evidence.tar', 'evidence.tar.gz'])
+@pytest.mark.parametrize('cached', [False, True])
+def test_tar_duplicate_members(tmp_path, file_name, cached):
+    # a member added again to an archive is extracted over the earlier one
+    tar_path = str(tmp_path / file_name)
+    make_tar(tar_path, [('data/a.db', b'first'), ('data/b.db', b'b'), ('data/a.db', b'second version')])
+    cache = search_files.ListingCache(str(tmp_path))
+    if cached:
+        listing_seeker = search_files.FileSeekerTar(tar_path, str(tmp_path / 'listing'), cache)
+        listing_seeker.search_many(['*/b.db'])
+        listing_seeker.cleanup()
+    seeker = search_files.FileSeekerTar(tar_path, str(tmp_path / 'out'), cache)
+    try:
+        assert (seeker._members is not None) == cached
+        a_path = str(tmp_path / 'out' / 'data' / 'a.db')
+        for found in (seeker.search('*/a.db'), seeker.search_many(['*/a.db', '*/b.db'])['*/a.db'],
+                      seeker.search('*/a.db')):
+            assert found == [a_path, a_path]
+            with open(a_path, 'rb') as extracted:
+                assert extracted.read() == b'second version'
+    finally:
+        seeker.cleanup()
+
+
+def test_dir_listing_cache(tmp_path):
+    evidence = tmp_path / 'evidence'
+    for n in range(10):
+        (evidence / 'data' / f'app{n}' / 'databases').mkdir(parents=True)
+        (evidence / 'data' / f'app{n}' / 'databases' / f'db{n}.db').write_bytes(b'x' * n)
+    cache = search_files.ListingCache(str(tmp_path))
+    patterns = ['*/app1*/databases/*.db', '*/databases']
+
+    first = search_files.FileSeekerDir(str(evidence), cache)
+    assert first._stale_stats is None
+    second = search_files.FileSeekerDir(str(evidence), cache)
+    assert second._stale_stats is not None
+    assert second._all_files == first._all_files
+    assert second.search_many(patterns) == first.search_many(patterns)
+
+    # a file rewritten in place doesn't modify its folder, stat() reads it again
+    db_path = str(evidence / 'data' / 'app3' / 'databases' / 'db3.db')
+    folder_mtime = os.stat(os.path.dirname(db_path)).st_mtime_ns
+    with open(db_path, 'wb') as db_file:
+        db_file.write(b'y' * 1000)
+    os.utime(db_path, (1600000000, 1600000000))
+    assert os.stat(os.path.dirname(db_path)).st_mtime_ns == folder_mtime
+    third = search_files.FileSeekerDir(str(evidence), cache)
+    assert third._stale_stats is not None
+    assert third.stat(db_path) == search_files.FileStat(1000, 1600000000.0, False)
+    assert third.stat(db_path) == search_files.FileStat(1000, 1600000000.0, False)
+
+    # an added file modifies its folder, so the listing is made again
+    new_path = evidence / 'data' / 'app3' / 'databases' / 'new.db'
+    new_path.write_bytes(b'')
+    os.utime(str(evidence / 'data' / 'app3' / 'databases'), (1700000000, 1700000000))
+    fourth = search_files.FileSeekerDir(str(evidence), cache)
+    assert fourth._stale_stats is None
+    assert str(new_path) in fourth.search('*/app3/databases/*.db')
+
+
+@pytest.mark.parametrize('pattern, hints', [
+    ('*/com.android.vending/databases/library.db',
+     [('equals', 'com.android.vending'), ('equals', 'databases'), ('equals', 'library.db')]),
+    ('*/app_webview/Default/Cookies*', [('equals', 'app_webview'), ('equals', 'Default'), ('startswith', 'Cookies')]),
+    ('*/ch.protonmail.android/databases/*-MessagesDatabase.db*',
+     [('equals', 'ch.protonmail.android'), ('equals', 'databases')]),
+    ('*/*.torrent', [('endswith', '.torrent')]),
+    ('*/user_de/*/com.android.settings/databases/battery-usage-db-v9',
+     [('equals', 'user_de'), ('equals', 'com.android.settings'), ('equals', 'databases'),
+      ('equals', 'battery-usage-db-v9')]),
+    ('*/mega.privacy.android.app/karere-*.db*', [('equals', 'mega.privacy.android.app'), ('startswith', 'karere-')]),
+    ('*/data/[abc]*/x?.db', [('equals', 'data'), ('startswith', 'x'), ('endswith', '.db')]),
+    ('*/data[/]x', []), # a set with a separator can't be split
+    ('*', []),
+])
+def test_glob_name_hints(pattern, hints):
+    assert search_files.glob_name_hints(pattern) == hints
+
+
+components = ['data', 'databases', 'db', 'a.db', 'ab.db-wal', 'app_x', 'x', 'com.app', 'com.app.db', 'ba', '.db']
+
+
+def random_paths(rnd, count):
+    return ['/'.join(rnd.choice(components) for _ in range(rnd.randint(1, 5))) for _ in range(count)]
+
+
+def random_pattern(rnd):
+    parts = []
+    for _ in range(rnd.randint(1, 4)):
+        part = rnd.choice(components + ['*', '*.db', 'a*', '*db*', 'x?', '?b.db', '[ab]*', '[!d]*', 'com.*', '*-wal'])
+        parts.append(part)
+    return rnd.choice(['*/', '', 'root/']) + '/'.join(parts) + rnd.choice(['', '*', '/*'])
+
+
+def test_glob_name_hints_hold_for_every_match():
+    import fnmatch
+    import random
+    rnd = random.Random(1)
+    paths = ['root/' + path for path in random_paths(rnd, 300)]
+    checked = 0
+    for _ in range(2000):
+        pattern = random_pattern(rnd)
+        hints = search_files.glob_name_hints(pattern)
+        for path in paths:
+            if fnmatch.fnmatchcase(path, pattern):
+                names = path.split('/')
+                for kind, text in hints:
+                    assert any(name == text if kind == 'equals' else getattr(name, kind)(text) for name in names), \
+                        (pattern, path, kind, text)
+                checked += 1
+    assert checked > 1000
+
+
+def linear_search(all_files, pattern, return_on_first_hit=False):
+    '''FileSeekerDir.search before the name index'''
+    pat = search_files._compile_pattern(search_files.normcase(pattern))
+    root = search_files.normcase('root/')
+    found = [item for item in all_files if pat(root + search_files.normcase(item)) is not None]
+    return found[:1] if return_on_first_hit else found
+
+
+def test_indexed_search_finds_what_the_linear_search_does(tmp_path):
+    import random
+    rnd = random.Random(2)
+    for path in random_paths(rnd, 400):
+        full_path = tmp_path / 'fs' / path
+        try:
+            full_path.parent.mkdir(parents=True, exist_ok=True)
+        except (FileExistsError, NotADirectoryError):
+            continue # a file already has the name of a folder
+        if not full_path.exists():
+            full_path.mkdir() if rnd.random() < 0.3 else full_path.write_bytes(b'')
+    seeker = search_files.FileSeekerDir(str(tmp_path / 'fs'))
+    assert sorted(seeker._all_files) == sorted(str(path) for path in (tmp_path / 'fs').rglob('*'))
+    assert len(seeker._all_files) > 300
+
+    patterns = [random_pattern(rnd) for _ in range(300)] + ['*/fs/*', '*/fs', '**', '*/data[/]x*', '*']
+    assert sum(1 for pattern in patterns if linear_search(seeker._all_files, pattern)) > 50
+    for pattern in patterns:
+        expected = linear_search(seeker._all_files, pattern)
+        assert seeker.search(pattern) == expected, pattern
+        assert seeker.search(pattern, return_on_first_hit=True) == expected[:1], pattern
+    found = seeker.search_many(patterns)
+    assert found == {pattern: linear_search(seeker._all_files, pattern) for pattern in patterns}
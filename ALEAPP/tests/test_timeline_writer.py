@@ -0,0 +1,37 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+ilapfuncs = pytest.importorskip('scripts.ilapfuncs')
+
+
+def test_rows_are_written_and_counted(tmp_path):
+    writer = ilapfuncs.TimelineWriter()
+    rows = [('2024-01-01 00:00:00', 'é', 3), ('2024-01-02 00:00:00', 'b', None)]
+    writer.write(str(tmp_path), 'Activité', iter(rows), ('Timestamp', 'Name', 'Count'))
+    writer.finish(str(tmp_path.parent))
+    writer.finish(str(tmp_path))
+    with sqlite3.connect(os.path.join(str(tmp_path), 'tl.db')) as db:
+        stored = db.execute('SELECT key, activity, datalist FROM data').fetchall()
+    assert [(key, activity, json.loads(datalist)) for key, activity, datalist in stored] == [
+        (str(row[0]), 'Activité', dict(zip(('Timestamp', 'Name', 'Count'), map(str, row)))) for row in rows]
+    stats = writer.stats()
+    assert stats['rows'] == 2
+    # bytes are the UTF-8 size of the key, activity and JSON of each row
+    assert stats['bytes'] == sum(len(value.encode('utf-8')) for row in stored for value in row)
+
+
+def test_time_in_the_row_generator_is_not_counted(tmp_path, monkeypatch):
+    clock = iter(range(1000))
+    monkeypatch.setattr(ilapfuncs, 'monotonic', lambda: next(clock))
+    def rows():
+        for minute in range(3):
+            next(clock) # a slow generator, advancing the clock by one between rows
+            yield (f'2024-01-01 00:0{minute}:00', minute)
+    writer = ilapfuncs.TimelineWriter()
+    writer.write(str(tmp_path), 'activity', rows(), ('Timestamp', 'Minute'))
+    writer.close()
+    # one insert and one commit, each one tick of the clock
+    assert writer.stats()['seconds'] == 2